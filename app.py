@@ -15,8 +15,14 @@ import sys
 # Add utils to path
 sys.path.append(str(Path(__file__).parent))
 
-from utils.embedder import FashionEmbedder
-from utils.search import FashionSearchEngine
+from utils.models import load_engine
+from utils.pipeline import QueryPipeline, DeadlineExceeded
+from utils.admission import AdmissionController, Overloaded, DEGRADED
+from utils.batching import configure_threads_from_env
+from utils.profiling import SlowRequestProfiler
+from utils.thumbnails import ThumbnailCache, item_key
+from utils.personalize import TasteVector, VIEW_WEIGHT, LIKE_WEIGHT
+from utils.crop import find_garment_regions
 
 
 # ============================================================================
@@ -130,40 +136,195 @@ st.markdown("""
 def load_models():
     """Load CLIP embedder and FAISS search engine (cached)"""
     try:
-        embedder = FashionEmbedder()
-        search_engine = FashionSearchEngine()
+        # The pipeline's embed and search stages run at the same time: split
+        # the cores between them instead of each using all of them
+        threads = configure_threads_from_env(request_workers=2)
+        print(f"🧵 Threads per call | FAISS: {threads['faiss_threads']}, "
+              f"torch: {threads['torch_threads']}")
+
+        # Same model the published index was built with (checked on every reload)
+        embedder, search_engine = load_engine()
         search_engine.load()
+        # Slow engine calls (search, search_batch, search_by_id) get their
+        # own captures, also when run on the pipeline's search thread
+        profiler = load_profiler()
+        if profiler.enabled:
+            profiler.instrument(search_engine)
+        # Hot-swap to newly published index versions without a restart
+        search_engine.watch()
         return embedder, search_engine, None
     except Exception as e:
         return None, None, str(e)
 
 
+@st.cache_resource
+def load_profiler():
+    """Slow-request profiler, enabled by STYLISHI_PROFILE_MS=<threshold> (cached)"""
+    return SlowRequestProfiler.from_env()
+
+
+@st.cache_resource
+def load_pipeline(_embedder, _search_engine):
+    """Staged decode/embed/search pipeline shared by all sessions (cached)"""
+    return QueryPipeline(_embedder, _search_engine, profiler=load_profiler())
+
+
+@st.cache_resource
+def load_admission(_embedder, _search_engine):
+    """Admission control in front of the shared pipeline (cached)"""
+    return AdmissionController(load_pipeline(_embedder, _search_engine))
+
+
+@st.cache_resource
+def load_thumbnail_cache():
+    """LRU of encoded result thumbnails, shared across sessions (cached)"""
+    return ThumbnailCache()
+
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-def process_image_search(image, embedder, search_engine):
+def get_taste():
+    """This session's taste vector (created on first use)"""
+    if 'taste' not in st.session_state:
+        st.session_state['taste'] = TasteVector()
+    return st.session_state['taste']
+
+
+def record_interaction(search_engine, item_id, weight):
+    """Fold a viewed/liked result into the session taste vector (O(D))"""
+    # By item ID: the result's index position may be stale after a swap
+    try:
+        vector = search_engine.get_item_vector(item_id)
+    except KeyError:
+        return  # Deleted since the results were shown
+    get_taste().update(vector, weight)
+
+
+def process_image_search(image, embedder, search_engine, taste_strength=0.0,
+                         **search_options):
     """Process image and return similar items"""
-    # Generate embedding
-    start_time = time.time()
-    embedding = embedder.embed_image(image)
-    embed_time = time.time() - start_time
+    # Personalize: same single FAISS query, shifted toward the session taste
+    blend = None
+    if taste_strength > 0:
+        taste = get_taste()
+        blend = lambda embedding: taste.blend(embedding, taste_strength)
+
+    # Preprocess, embed and search overlap with other sessions' queries;
+    # under a burst the request is degraded or turned away instead of queued
+    with load_profiler().request('image_search', options=search_options) as capture:
+        try:
+            results, info = load_admission(embedder, search_engine).search(
+                image, k=10, query_transform=blend, **search_options
+            )
+        except (Overloaded, DeadlineExceeded):
+            st.warning("⏳ StyliShi is busy right now. Please try again in a moment.")
+            return [], 0.0, 0.0
+        if capture is not None:
+            capture.info.update(mode=info['mode'], timings=info['timings'])
+
+    if info['mode'] == DEGRADED:
+        st.caption("⚡ High traffic: showing a lighter result set")
+    timings = info['timings']
+    embed_time = timings.get('preprocess', 0.0) + timings.get('embed', 0.0)
+    search_time = timings.get('search', 0.0)
+
+    return results, embed_time, search_time
+
+
+def process_camera_search(image, embedder, search_engine, max_crops=2,
+                          taste_strength=0.0, **search_options):
+    """Crop the garment region(s) out of a camera frame and search each crop"""
+    with load_profiler().request('camera_search', options=search_options) as capture:
+        # Localize garments on a small copy of the frame (a few ms, CPU only)
+        start_time = time.time()
+        boxes = find_garment_regions(np.asarray(image), max_regions=max_crops)
+        crops = [image.crop(box) for box in boxes] or [image]
+        crop_time = time.time() - start_time
+
+        blend = None
+        if taste_strength > 0:
+            taste = get_taste()
+            blend = lambda embedding: taste.blend(embedding, taste_strength)
+
+        # Same admission and pipeline as uploads; the crops are admitted
+        # together and share one forward pass
+        try:
+            results, info = load_admission(embedder, search_engine).search_batch(
+                crops, k=10, query_transform=blend, **search_options
+            )
+        except (Overloaded, DeadlineExceeded):
+            st.warning("⏳ StyliShi is busy right now. Please try again in a moment.")
+            return [], crop_time, 0.0, 0.0
+        if capture is not None:
+            capture.info.update(crops=len(crops), crop_time=crop_time,
+                                mode=info['mode'], timings=info['timings'])
+
+    if info['mode'] == DEGRADED:
+        st.caption("⚡ High traffic: showing a lighter result set")
+    timings = info['timings']
+    embed_time = timings.get('preprocess', 0.0) + timings.get('embed', 0.0)
+    search_time = timings.get('search', 0.0)
+    return list(zip(crops, results)), crop_time, embed_time, search_time
+
+
+def search_similar_to(item_id, search_engine, search_options):
+    """Result-to-result navigation: search with the item's stored embedding"""
+    record_interaction(search_engine, item_id, VIEW_WEIGHT)
 
-    # Search similar items
     start_time = time.time()
-    results = search_engine.search(embedding, k=10)
+    search_options = {key: value for key, value in search_options.items()
+                      if key != 'taste_strength'}
+    with load_profiler().request('similar_items', item_id=item_id, options=search_options):
+        try:
+            results = search_engine.search_by_id(item_id, k=10, **search_options)
+        except KeyError:
+            st.warning("This item is no longer in the catalog.")
+            return
     search_time = time.time() - start_time
 
-    return results, embed_time, search_time
+    # No model pass, so there is no embedding time to report
+    st.session_state.pop('crop_results', None)
+    st.session_state['results'] = results
+    st.session_state['embed_time'] = 0.0
+    st.session_state['search_time'] = search_time
+
+
+def select_style(cluster_id):
+    """Browse a style cluster from its first page"""
+    st.session_state['style'] = cluster_id
+    st.session_state['style_page'] = 0
+
+
+def turn_style_page(step):
+    """Move through the browsed style's pages (clamped when rendering)"""
+    st.session_state['style_page'] = st.session_state.get('style_page', 0) + step
+
+
+def result_image(result, thumbnails):
+    """Pre-encoded thumbnail for a result, else its image path (None if missing)"""
+    image = thumbnails.get(result)
+    img_path = Path(result['image_path'])
+    if image is None and img_path.exists():
+        image = str(img_path)
+    return image
 
 
-def display_results(results, embed_time, search_time):
+def display_results(results, embed_time, search_time,
+                    search_engine=None, search_options=None,
+                    crop_time=None, key_prefix=""):
     """Display search results in beautiful grid"""
     st.markdown("---")
 
     # Stats
-    total_time = (embed_time + search_time) * 1000
-    col1, col2, col3 = st.columns(3)
+    total_time = (embed_time + search_time + (crop_time or 0)) * 1000
+    if crop_time is None:
+        col1, col2, col3 = st.columns(3)
+    else:
+        col1, col4, col2, col3 = st.columns(4)
+        with col4:
+            st.metric("✂️ Crop", f"{crop_time*1000:.0f} ms")
     with col1:
         st.metric("⚡ Total Time", f"{total_time:.0f} ms")
     with col2:
@@ -172,6 +333,7 @@ def display_results(results, embed_time, search_time):
         st.metric("🔍 Search", f"{search_time*1000:.0f} ms")
 
     st.markdown("### 🎯 Top 10 Similar Items")
+    thumbnails = load_thumbnail_cache()
 
     # Display in 2 columns
     for i in range(0, len(results), 2):
@@ -182,11 +344,13 @@ def display_results(results, embed_time, search_time):
                 result = results[i + j]
 
                 with col:
-                    # Display image
+                    # Prefer the small pre-encoded thumbnail over the full image
                     img_path = Path(result['image_path'])
-                    if img_path.exists():
+                    image = result_image(result, thumbnails)
+
+                    if image is not None:
                         st.image(
-                            str(img_path),
+                            image,
                             use_container_width=True,
                             caption=f"#{result['rank']} - {result['similarity_pct']} match"
                         )
@@ -202,6 +366,23 @@ def display_results(results, embed_time, search_time):
                     else:
                         st.warning(f"Image not found: {img_path}")
 
+                    if search_engine is not None:
+                        st.button(
+                            "🔁 More like this",
+                            key=f"{key_prefix}more_{result['index']}",
+                            on_click=search_similar_to,
+                            args=(item_key(result), search_engine,
+                                  search_options or {}),
+                            use_container_width=True
+                        )
+                        st.button(
+                            "❤️ Like",
+                            key=f"{key_prefix}like_{result['index']}",
+                            on_click=record_interaction,
+                            args=(search_engine, item_key(result), LIKE_WEIGHT),
+                            use_container_width=True
+                        )
+
                     st.markdown("<br>", unsafe_allow_html=True)
 
 
@@ -241,15 +422,64 @@ def main():
     **Embedding**: {stats['embedding_dim']}D CLIP
     **Engine**: {stats['index_type']}
     """)
+    with st.sidebar.expander("⏱️ Query pipeline"):
+        admission = load_admission(embedder, search_engine).stats()
+        st.caption(f"**load**: {admission['mode']} | {admission['in_flight']} in flight | "
+                   f"{admission['rejected']} rejected | {admission['cache_hits']} cache hits")
+        for stage, stage_stats in load_pipeline(embedder, search_engine).stats().items():
+            st.caption(
+                f"**{stage}**: {stage_stats['queue_depth']}/{stage_stats['queue_capacity']} queued | "
+                f"wait {stage_stats['avg_wait_ms']:.1f} ms | "
+                f"service {stage_stats['avg_service_ms']:.1f} ms"
+            )
+        profiler = load_profiler()
+        if profiler.enabled:
+            st.caption(f"**slow requests** (>= {profiler.threshold_ms:.0f} ms): "
+                       f"{profiler.captured} profiled to {profiler.output_dir}")
 
     # Mode selection
     st.sidebar.markdown("### 🎯 Search Mode")
     mode = st.sidebar.radio(
         "Choose input method:",
-        ["📸 Live Camera", "🖼️ Upload Image", "🎨 Sample Images"],
+        ["📸 Live Camera", "🖼️ Upload Image", "🎨 Sample Images", "🧭 Browse Styles"],
         label_visibility="collapsed"
     )
 
+    # Result options
+    st.sidebar.markdown("### ⚙️ Result Options")
+    search_options = {
+        # Only meaningful (and worth the over-fetch) for deduplicated builds
+        'collapse_duplicates': st.sidebar.checkbox(
+            "Hide near-duplicates", value=search_engine.has_duplicates,
+            disabled=not search_engine.has_duplicates,
+            help="Show one item per cluster of near-identical catalog shots "
+                 "(needs an index built with --dedup-threshold)"
+        ),
+        'diversify': st.sidebar.checkbox(
+            "Diversify results", value=False,
+            help="Re-rank with maximal marginal relevance to avoid near-copies"
+        ),
+    }
+    if search_options['diversify']:
+        search_options['mmr_lambda'] = st.sidebar.slider(
+            "Relevance vs. diversity", 0.0, 1.0, 0.7, 0.05
+        )
+        search_options['fetch_factor'] = st.sidebar.slider(
+            "Candidates per result", 2, 10, 4
+        )
+
+    # Session personalization (likes and "More like this" clicks)
+    taste = get_taste()
+    if st.sidebar.checkbox(
+        "Personalize results", value=False, disabled=not taste,
+        help=f"Blend in your taste from {taste.count} liked/viewed items"
+    ):
+        search_options['taste_strength'] = st.sidebar.slider(
+            "Personalization strength", 0.0, 0.8, 0.3, 0.05
+        )
+    if taste and st.sidebar.button("Reset my taste"):
+        taste.reset()
+
     # ========================================================================
     # MODE 1: LIVE CAMERA
     # ========================================================================
@@ -273,21 +503,56 @@ def main():
                 st.markdown("#### 📷 Captured Image")
                 st.image(image, use_container_width=True)
 
+                auto_crop = st.checkbox(
+                    "✂️ Focus on garments", value=True,
+                    help="Crop the main clothing region(s) out of the frame before searching"
+                )
+
                 if st.button("🔍 Search Similar Items", type="primary", use_container_width=True):
                     with st.spinner("🔮 Analyzing fashion style..."):
-                        results, embed_time, search_time = process_image_search(
-                            image, embedder, search_engine
-                        )
+                        if auto_crop:
+                            crop_results, crop_time, embed_time, search_time = \
+                                process_camera_search(image, embedder, search_engine,
+                                                      **search_options)
+                            if crop_results:
+                                st.session_state['crop_results'] = crop_results
+                                st.session_state['crop_time'] = crop_time
+                            else:  # Turned away under load
+                                st.session_state.pop('crop_results', None)
+                            results = crop_results[0][1] if crop_results else []
+                        else:
+                            st.session_state.pop('crop_results', None)
+                            results, embed_time, search_time = process_image_search(
+                                image, embedder, search_engine, **search_options
+                            )
                         st.session_state['results'] = results
                         st.session_state['embed_time'] = embed_time
                         st.session_state['search_time'] = search_time
 
             with col2:
-                if 'results' in st.session_state:
+                if 'crop_results' in st.session_state:
+                    # One tab per detected garment, each with its own results
+                    crop_results = st.session_state['crop_results']
+                    tabs = st.tabs([f"Garment {i + 1}" for i in range(len(crop_results))])
+                    for i, (tab, (crop, results)) in enumerate(zip(tabs, crop_results)):
+                        with tab:
+                            st.image(crop, width=160)
+                            display_results(
+                                results,
+                                st.session_state['embed_time'],
+                                st.session_state['search_time'],
+                                search_engine,
+                                search_options,
+                                crop_time=st.session_state['crop_time'],
+                                key_prefix=f"crop{i}_"
+                            )
+                elif 'results' in st.session_state:
                     display_results(
                         st.session_state['results'],
                         st.session_state['embed_time'],
-                        st.session_state['search_time']
+                        st.session_state['search_time'],
+                        search_engine,
+                        search_options
                     )
 
     # ========================================================================
@@ -314,7 +579,7 @@ def main():
                 if st.button("🔍 Find Similar Items", type="primary", use_container_width=True):
                     with st.spinner("🔮 Searching 50k+ items..."):
                         results, embed_time, search_time = process_image_search(
-                            image, embedder, search_engine
+                            image, embedder, search_engine, **search_options
                         )
                         st.session_state['results'] = results
                         st.session_state['embed_time'] = embed_time
@@ -325,11 +590,73 @@ def main():
                     display_results(
                         st.session_state['results'],
                         st.session_state['embed_time'],
-                        st.session_state['search_time']
+                        st.session_state['search_time'],
+                        search_engine,
+                        search_options
                     )
 
     # ========================================================================
-    # MODE 3: SAMPLE IMAGES
+    # MODE 3: BROWSE STYLES
+    # ========================================================================
+    elif mode == "🧭 Browse Styles":
+        st.markdown("### 🧭 Browse Styles")
+
+        # Precomputed k-means clusters: listing and paging are array slices
+        try:
+            clusters = search_engine.list_clusters(representatives=1)
+        except (FileNotFoundError, ValueError) as e:
+            st.warning(f"{e}")
+            clusters = []
+
+        if clusters:
+            thumbnails = load_thumbnail_cache()
+            page_size = 10
+
+            # Style gallery: one typical item per cluster
+            cols = st.columns(5)
+            for idx, cluster in enumerate(clusters[:20]):
+                with cols[idx % 5]:
+                    image = result_image(cluster['representatives'][0], thumbnails)
+                    if image is not None:
+                        st.image(image, use_container_width=True)
+                    st.button(f"Style {cluster['cluster_id']} ({cluster['size']})",
+                              key=f"style_{cluster['cluster_id']}",
+                              on_click=select_style, args=(cluster['cluster_id'],),
+                              use_container_width=True)
+
+            # Callbacks ran before this rerun, so style and page are current
+            sizes = {cluster['cluster_id']: cluster['size'] for cluster in clusters}
+            style = st.session_state.get('style')
+            if style not in sizes:  # Not chosen yet, or gone after reclustering
+                select_style(clusters[0]['cluster_id'])
+                style = st.session_state['style']
+            size = sizes[style]
+            num_pages = max(1, -(-size // page_size))
+            page = min(max(st.session_state.get('style_page', 0), 0), num_pages - 1)
+            st.session_state['style_page'] = page
+
+            st.markdown("---")
+            st.markdown(f"#### Style {style} | {size} items | page {page + 1} of {num_pages}")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.button("⬅️ Previous", disabled=page == 0, on_click=turn_style_page,
+                          args=(-1,), use_container_width=True)
+            with col2:
+                st.button("Next ➡️", disabled=page >= num_pages - 1, on_click=turn_style_page,
+                          args=(1,), use_container_width=True)
+
+            members = search_engine.cluster_members(style, page, page_size)
+            cols = st.columns(5)
+            for idx, result in enumerate(members):
+                with cols[idx % 5]:
+                    image = result_image(result, thumbnails)
+                    if image is not None:
+                        st.image(image, use_container_width=True,
+                                 caption=f"#{result['rank']}")
+
+    # ========================================================================
+    # MODE 4: SAMPLE IMAGES
     # ========================================================================
     else:
         st.markdown("### 🎨 Try Sample Fashion Items")
@@ -365,9 +692,23 @@ def main():
                 with col2:
                     with st.spinner("🔮 Finding similar items..."):
                         results, embed_time, search_time = process_image_search(
-                            image, embedder, search_engine
+                            image, embedder, search_engine, **search_options
                         )
-                        display_results(results, embed_time, search_time)
+                        st.session_state['results'] = results
+                        st.session_state['embed_time'] = embed_time
+                        st.session_state['search_time'] = search_time
+                    display_results(results, embed_time, search_time,
+                                    search_engine, search_options)
+
+            elif 'results' in st.session_state:
+                # Keep the grid (and "More like this" navigation) across reruns
+                display_results(
+                    st.session_state['results'],
+                    st.session_state['embed_time'],
+                    st.session_state['search_time'],
+                    search_engine,
+                    search_options
+                )
 
     # Footer
     st.markdown("---")
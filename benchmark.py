@@ -0,0 +1,826 @@
+"""
+Performance benchmarks for the StyliShi pipeline
+Run: python benchmark.py <benchmark> --help
+"""
+
+import sys
+import io
+import time
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding for emojis
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import numpy as np
+
+
+def print_header(text):
+    print("\n" + "=" * 70)
+    print(f"  {text}")
+    print("=" * 70)
+
+
+def catalog_images(images_dir: str, limit: int) -> list:
+    """First `limit` catalog images (any type, sorted, like the index build)"""
+    from utils.fetch import list_images
+    image_files = list_images(images_dir)[:limit]
+    if not image_files:
+        print(f"❌ No images found in {images_dir}")
+        sys.exit(1)
+    return image_files
+
+
+# ============================================================================
+# EMBEDDING THROUGHPUT
+# ============================================================================
+
+def bench_embed_scaling(args):
+    """Images/s of multi-process catalog embedding from 1 to all cores"""
+    from utils.bulk import embed_parallel, split_cores
+    from utils.store import ShardedEmbeddingStore
+
+    image_files = catalog_images(args.images, args.limit)
+    max_workers = len(split_cores(10 ** 6))
+    counts = args.workers or sorted({1, 2, 4, 8, 16, 32, 64, max_workers} &
+                                    set(range(1, max_workers + 1)))
+
+    print_header(f"Embedding scaling | {len(image_files)} images | "
+                 f"{max_workers} cores available")
+
+    rows = []
+    for workers in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ShardedEmbeddingStore(tmp)
+            start = time.perf_counter()
+            embed_parallel(image_files, store, Path(args.images).parent, workers,
+                           batch_size=args.batch_size, pretrained=args.pretrained)
+            elapsed = time.perf_counter() - start
+        rows.append((workers, elapsed, len(image_files) / elapsed))
+
+    print_header("Results (wall time includes one model load per worker)")
+    base = rows[0][2]
+    print(f"{'workers':>8} {'seconds':>10} {'images/s':>10} {'speedup':>8}")
+    for workers, elapsed, rate in rows:
+        print(f"{workers:>8} {elapsed:>10.1f} {rate:>10.1f} {rate / base:>7.2f}x")
+
+
+# ============================================================================
+# DECODE / PREPROCESS
+# ============================================================================
+
+def bench_decode_parity(args):
+    """Fast decode + fused preprocess vs PIL full decode + CLIP preprocess"""
+    import torch
+    from PIL import Image
+    from utils.decode import to_model_input
+    from utils.embedder import FashionEmbedder
+
+    image_files = catalog_images(args.images, args.limit)
+    embedder = FashionEmbedder(pretrained=args.pretrained)
+
+    print_header(f"Decode + preprocess | {len(image_files)} images")
+
+    # Reference: full-resolution PIL decode + torchvision preprocess
+    start = time.perf_counter()
+    reference = torch.stack([embedder.preprocess(Image.open(p).convert('RGB'))
+                             for p in image_files])
+    ref_time = time.perf_counter() - start
+
+    # Fast path: DCT-scaled decode + fused NumPy preprocess
+    start = time.perf_counter()
+    decoded = [embedder.load_image(p) for p in image_files]
+    fast = np.empty((len(decoded), 3, embedder.image_size, embedder.image_size),
+                    dtype='float32')
+    for i, img in enumerate(decoded):
+        to_model_input(img, embedder.image_size, embedder.image_mean,
+                       embedder.image_std, out=fast[i])
+    fast_time = time.perf_counter() - start
+
+    print(f"PIL + preprocess : {ref_time / len(image_files) * 1000:7.2f} ms/image")
+    print(f"Fast path        : {fast_time / len(image_files) * 1000:7.2f} ms/image "
+          f"({ref_time / fast_time:.1f}x)")
+
+    # Embedding agreement
+    with torch.no_grad():
+        ref_emb = embedder.model.encode_image(reference.to(embedder.device))
+        fast_emb = embedder.model.encode_image(torch.from_numpy(fast).to(embedder.device))
+    ref_emb = torch.nn.functional.normalize(ref_emb, dim=-1)
+    fast_emb = torch.nn.functional.normalize(fast_emb, dim=-1)
+    cosine = (ref_emb * fast_emb).sum(dim=-1).cpu().numpy()
+
+    print(f"Embedding cosine : min {cosine.min():.4f} | mean {cosine.mean():.4f}")
+    if cosine.min() < args.tolerance:
+        print(f"✗ Below tolerance {args.tolerance}")
+        sys.exit(1)
+    print(f"✓ Within tolerance {args.tolerance}")
+
+
+def bench_index_views(args):
+    """Indexing throughput and embedding shift of multi-crop pooled views"""
+    from utils.embedder import FashionEmbedder
+
+    embedder = FashionEmbedder(pretrained=args.pretrained)
+
+    if args.synthetic:
+        # Odd aspect ratios (tall product shots, wide flat-lays)
+        rng = np.random.default_rng(0)
+        shapes = [(600, 300), (300, 600), (800, 400), (400, 400)]
+        images = [rng.integers(0, 256, (*shapes[i % len(shapes)], 3), dtype=np.uint8)
+                  for i in range(args.synthetic)]
+    else:
+        images = [embedder.load_image(p) for p in catalog_images(args.images, args.limit)]
+
+    print_header(f"Multi-crop indexing | {len(images)} images | batch {args.batch_size}")
+
+    def embed_all(views):
+        return np.vstack([embedder.embed_decoded(images[i:i + args.batch_size], views)
+                          for i in range(0, len(images), args.batch_size)])
+
+    embed_all(('center',))  # Warm-up
+    baseline = None
+    print(f"{'views':<32} {'images/s':>9} {'relative':>9} {'cos to center':>14}")
+    for spec in args.views:
+        views = tuple(spec.split(','))
+        start = time.perf_counter()
+        embeddings = embed_all(views)
+        rate = len(images) / (time.perf_counter() - start)
+
+        if baseline is None:
+            baseline, base_rate = embeddings, rate
+        cosine = float((embeddings * baseline).sum(axis=1).mean())
+        print(f"{spec:<32} {rate:>9.1f} {rate / base_rate:>8.2f}x {cosine:>14.4f}")
+
+
+def bench_frame_path(args):
+    """Camera-frame (BGR ndarray) input path: legacy conversions vs fused buffer"""
+    import cv2
+    import torch
+    from PIL import Image
+    from utils.decode import to_model_input
+    from utils.embedder import FashionEmbedder
+
+    embedder = FashionEmbedder(pretrained=args.pretrained)
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+              for _ in range(args.batch_size)]
+
+    def legacy_inputs():
+        # cvtColor -> PIL -> torchvision preprocess -> stack (pre-fused path)
+        return torch.stack([
+            embedder.preprocess(Image.fromarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)))
+            for f in frames
+        ])
+
+    def fused_inputs():
+        batch = embedder._input_batch(len(frames))
+        view = batch.numpy()
+        for i, f in enumerate(frames):
+            to_model_input(f, embedder.image_size, embedder.image_mean,
+                           embedder.image_std, channels='BGR', out=view[i])
+        return batch
+
+    print_header(f"Frame input path | {args.batch_size} x {args.width}x{args.height} BGR")
+
+    for name, fn in [("Legacy conversions", legacy_inputs), ("Fused buffer", fused_inputs)]:
+        fn()  # Warm-up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        per_frame = (time.perf_counter() - start) / (args.repeat * len(frames))
+        print(f"{name:<20}: {per_frame * 1000:7.2f} ms/frame (input tensor only)")
+
+    with torch.no_grad():
+        a = embedder.model.encode_image(legacy_inputs().to(embedder.device))
+        b = embedder.model.encode_image(fused_inputs().to(embedder.device))
+    cosine = torch.nn.functional.cosine_similarity(a, b).min().item()
+    print(f"Embedding cosine (min): {cosine:.4f}")
+
+
+# ============================================================================
+# RESULT RENDERING
+# ============================================================================
+
+def bench_render(args):
+    """Result-grid payload: full-resolution files vs cached thumbnails"""
+    import pickle
+    from PIL import Image
+    from utils.thumbnails import ThumbnailCache, build_thumbnails
+
+    if args.metadata:
+        with open(args.metadata, 'rb') as f:
+            metadata = pickle.load(f)
+        base_dir = Path(args.metadata).parent.parent
+    else:
+        # Currently published index version
+        from utils.search import FashionSearchEngine
+        engine = FashionSearchEngine()
+        engine.load()
+        metadata = engine.metadata
+        base_dir = Path(".")
+    page = metadata[:args.k]
+
+    build_thumbnails(page, args.thumbs_dir, base_dir)
+    cache = ThumbnailCache(args.thumbs_dir)
+
+    def full_payload(meta):
+        return (base_dir / str(meta['image_path']).replace('\\', '/')).read_bytes()
+
+    def disk_thumbnail(meta):
+        # Fresh cache every call, so each thumbnail is read from disk
+        return ThumbnailCache(args.thumbs_dir).get(meta)
+
+    def decode(data):
+        # Stand-in for the browser decoding what st.image ships
+        Image.open(io.BytesIO(data)).load()
+
+    print_header(f"Rendering {len(page)} results x {args.repeat} reruns")
+
+    rows = []
+    for name, fetch in [("Full images", full_payload),
+                        ("Thumbnails (disk)", disk_thumbnail),
+                        ("Thumbnails (LRU)", cache.get)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            payloads = [fetch(meta) for meta in page]
+        fetch_time = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for data in payloads:
+            decode(data)
+        decode_time = time.perf_counter() - start
+        rows.append((name, fetch_time, decode_time, sum(len(d) for d in payloads)))
+
+    print(f"{'path':<20} {'fetch ms':>9} {'decode ms':>10} {'payload KB':>11}")
+    for name, fetch_time, decode_time, size in rows:
+        print(f"{name:<20} {fetch_time * 1000:>9.2f} {decode_time * 1000:>10.2f} "
+              f"{size / 1024:>11.1f}")
+
+
+# ============================================================================
+# SEARCH UNDER CONCURRENCY
+# ============================================================================
+
+def bench_search_load(args):
+    """Search latency percentiles under concurrent single-query load"""
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.batching import QueryBatcher, available_cores, configure_threads
+    from utils.search import FashionSearchEngine, IndexBuilder
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        index = IndexBuilder.build_index_streaming(
+            [rng.standard_normal((args.synthetic, args.dim), dtype='float32')],
+            args.dim, index_type=args.index_type
+        )
+        engine = FashionSearchEngine.from_index(index)
+    else:
+        engine = FashionSearchEngine()
+        engine.load()
+
+    dim = engine.index.d
+    queries = np.random.default_rng(1).standard_normal(
+        (args.requests, dim)).astype('float32')
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    cores = available_cores()
+    print_header(f"Search load | {engine.index.ntotal:,} items | "
+                 f"{args.requests} requests | {cores} cores")
+
+    def run(search, concurrency):
+        def timed(query):
+            start = time.perf_counter()
+            search(query, k=args.k)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, queries[:concurrency]))  # Warm-up
+            start = time.perf_counter()
+            latencies = np.array(list(pool.map(timed, queries)))
+            wall = time.perf_counter() - start
+        return len(queries) / wall, np.percentile(latencies * 1000, [50, 99])
+
+    print(f"{'mode':<28} {'conc':>5} {'QPS':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for concurrency in args.concurrency:
+        modes = [
+            ("default threads", None, engine.search),
+            ("split threads", concurrency, engine.search),
+        ]
+        for name, workers, search in modes:
+            configure_threads(request_workers=workers or 1)
+            qps, (p50, p99) = run(search, concurrency)
+            print(f"{name:<28} {concurrency:>5} {qps:>9.0f} {p50:>8.2f} {p99:>8.2f}")
+
+        configure_threads(request_workers=1)
+        batcher = QueryBatcher(engine, max_batch=args.max_batch,
+                               max_wait_ms=args.max_wait_ms)
+        qps, (p50, p99) = run(batcher.search, concurrency)
+        batcher.close()
+        print(f"{'batched (' + str(args.max_wait_ms) + ' ms window)':<28} "
+              f"{concurrency:>5} {qps:>9.0f} {p50:>8.2f} {p99:>8.2f}")
+
+    configure_threads(request_workers=1)
+
+
+# ============================================================================
+# PIPELINED QUERIES
+# ============================================================================
+
+def bench_pipeline(args):
+    """Image-query throughput: sequential decode/embed/search vs the staged pipeline"""
+    from concurrent.futures import ThreadPoolExecutor
+    from PIL import Image
+    from utils.embedder import FashionEmbedder
+    from utils.pipeline import QueryPipeline
+    from utils.search import FashionSearchEngine, IndexBuilder
+
+    embedder = FashionEmbedder(pretrained=args.pretrained)
+    rng = np.random.default_rng(0)
+    index = IndexBuilder.build_index_streaming(
+        [rng.standard_normal((args.items, embedder.embedding_dim), dtype='float32')],
+        embedder.embedding_dim
+    )
+    engine = FashionSearchEngine.from_index(index)
+
+    # Camera-sized JPEG-like inputs, so preprocessing has real work to do
+    images = [Image.fromarray(rng.integers(0, 255, (args.height, args.width, 3), dtype='uint8'))
+              for _ in range(8)]
+
+    def sequential(image):
+        return engine.search(embedder.embed_image(image), k=args.k)
+
+    def run(search, concurrency):
+        def timed(i):
+            start = time.perf_counter()
+            search(images[i % len(images)])
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, range(concurrency)))  # Warm-up
+            start = time.perf_counter()
+            latencies = np.array(list(pool.map(timed, range(args.requests))))
+            wall = time.perf_counter() - start
+        return args.requests / wall, np.percentile(latencies * 1000, [50, 99])
+
+    print_header(f"Query pipeline | {args.width}x{args.height} images | "
+                 f"{args.items:,} items | {args.requests} requests")
+    print(f"{'mode':<14} {'conc':>5} {'QPS':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for concurrency in args.concurrency:
+        qps, (p50, p99) = run(sequential, concurrency)
+        print(f"{'sequential':<14} {concurrency:>5} {qps:>7.1f} {p50:>8.1f} {p99:>8.1f}")
+
+        pipeline = QueryPipeline(embedder, engine, max_batch=args.max_batch)
+        qps, (p50, p99) = run(lambda image: pipeline.search(image, k=args.k), concurrency)
+        stats = pipeline.stats()
+        pipeline.close()
+        print(f"{'pipelined':<14} {concurrency:>5} {qps:>7.1f} {p50:>8.1f} {p99:>8.1f}")
+        for name, stage in stats.items():
+            print(f"  {name:<12} batch {stage['avg_batch']:>5.1f} | "
+                  f"wait {stage['avg_wait_ms']:>7.1f} ms (max {stage['max_wait_ms']:.1f}) | "
+                  f"service {stage['avg_service_ms']:>6.1f} ms")
+
+
+# ============================================================================
+# OVERLOAD / ADMISSION CONTROL
+# ============================================================================
+
+def bench_overload(args):
+    """Open-loop load generator: goodput with and without admission control"""
+    from concurrent.futures import ThreadPoolExecutor
+    from PIL import Image
+    from utils.admission import AdmissionController, Overloaded
+    from utils.embedder import FashionEmbedder
+    from utils.pipeline import DeadlineExceeded, QueryPipeline
+    from utils.search import FashionSearchEngine, IndexBuilder
+
+    embedder = FashionEmbedder(pretrained=args.pretrained)
+    rng = np.random.default_rng(0)
+    index = IndexBuilder.build_index_streaming(
+        [rng.standard_normal((args.items, embedder.embedding_dim), dtype='float32')],
+        embedder.embedding_dim
+    )
+    engine = FashionSearchEngine.from_index(index)
+
+    def new_image():
+        return Image.fromarray(rng.integers(0, 255, (480, 640, 3), dtype='uint8'))
+
+    popular = [new_image() for _ in range(4)]
+    deadline = args.deadline_ms / 1000.0
+
+    def run(rate, guarded):
+        pipeline = QueryPipeline(embedder, engine)
+        controller = AdmissionController(pipeline, deadline_ms=args.deadline_ms)
+        outcomes, latencies = {'good': 0, 'late': 0, 'rejected': 0, 'expired': 0}, []
+
+        def request(image):
+            start = time.perf_counter()
+            try:
+                if guarded:
+                    controller.search(image, k=args.k)
+                else:
+                    pipeline.search(image, k=args.k)
+            except Overloaded:
+                return 'rejected', None
+            except DeadlineExceeded:
+                return 'expired', None
+            latency = time.perf_counter() - start
+            return ('good' if latency <= deadline else 'late'), latency
+
+        # Poisson arrivals, fired on schedule whether or not earlier ones finished
+        arrivals = np.cumsum(rng.exponential(1.0 / rate, int(rate * args.duration)))
+        with ThreadPoolExecutor(max_workers=512) as pool:
+            start = time.perf_counter()
+            futures = []
+            for at in arrivals:
+                time.sleep(max(0.0, start + at - time.perf_counter()))
+                image = popular[rng.integers(len(popular))] \
+                    if rng.random() < args.repeat_share else new_image()
+                futures.append(pool.submit(request, image))
+            for future in futures:
+                outcome, latency = future.result()
+                outcomes[outcome] += 1
+                if latency is not None:
+                    latencies.append(latency)
+
+        counts = controller.stats()
+        pipeline.close()
+        p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99]) if latencies else (0, 0)
+        name = 'admission' if guarded else 'unguarded'
+        print(f"{name:<10} {rate:>6.0f} {outcomes['good'] / args.duration:>8.1f} "
+              f"{outcomes['late']:>5} {outcomes['rejected']:>5} {outcomes['expired']:>5} "
+              f"{counts['degraded']:>5} {counts['cache_hits']:>5} {p50:>8.0f} {p99:>8.0f}")
+
+    print_header(f"Overload | deadline {args.deadline_ms:.0f} ms | {args.duration:.0f} s per rate | "
+                 f"{args.repeat_share:.0%} repeated images")
+    print(f"{'mode':<10} {'QPS':>6} {'goodput':>8} {'late':>5} {'rej':>5} {'exp':>5} "
+          f"{'degr':>5} {'cache':>5} {'p50 ms':>8} {'p99 ms':>8}")
+    for rate in args.rates:
+        run(rate, guarded=False)
+        run(rate, guarded=True)
+    print("\ngoodput = answers within the deadline per second; late answers are wasted work.")
+
+
+# ============================================================================
+# BINARY CODES
+# ============================================================================
+
+def bench_binary_recall(args):
+    """Memory per item and recall@k of binary codes (+ float re-rank) vs flat"""
+    import faiss
+    from utils.search import FashionSearchEngine, IndexBuilder
+
+    if args.synthetic:
+        # Clustered vectors: nearest neighbors are meaningful, unlike pure noise
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((max(1, args.synthetic // 100), args.dim))
+        vectors = (centers[rng.integers(0, len(centers), args.synthetic)] +
+                   0.5 * rng.standard_normal((args.synthetic, args.dim))).astype('float32')
+    else:
+        engine = FashionSearchEngine()
+        engine.load()
+        vectors = engine.get_vectors(np.arange(engine.index.ntotal))
+    faiss.normalize_L2(vectors)
+
+    n, dim = vectors.shape
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, min(args.queries, n), replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype('float32')
+    faiss.normalize_L2(queries)
+
+    print_header(f"Binary codes | {n:,} items x {dim} dims | "
+                 f"{len(queries)} queries | recall@{args.k}")
+
+    flat = FashionSearchEngine.from_index(
+        IndexBuilder.build_index_streaming([vectors], dim, index_type='flat'))
+    truth = [{r['index'] for r in hits} for hits in flat.search_batch(queries, args.k)]
+
+    def measure(engine):
+        start = time.perf_counter()
+        results = engine.search_batch(queries, args.k)
+        per_query = (time.perf_counter() - start) / len(queries)
+        found = [len(t & {r['index'] for r in hits}) for t, hits in zip(truth, results)]
+        return sum(found) / (len(truth) * args.k), per_query
+
+    recall, per_query = measure(flat)
+    print(f"{'index':<26} {'bytes/item':>10} {'recall':>8} {'ms/query':>9}")
+    print(f"{'flat (float32)':<26} {dim * 4:>10} {recall:>8.3f} {per_query * 1000:>9.2f}")
+
+    for nbits in args.nbits:
+        index = IndexBuilder.build_index_streaming(
+            [vectors], dim, index_type='binary', nbits=nbits
+        )
+        hamming = FashionSearchEngine.from_index(index)
+        recall, per_query = measure(hamming)
+        print(f"{f'binary {nbits}b (Hamming)':<26} {index.code_size:>10} "
+              f"{recall:>8.3f} {per_query * 1000:>9.2f}")
+
+        for factor in args.rerank_factor:
+            reranked = FashionSearchEngine.from_index(index, vectors=vectors)
+            reranked.rerank_factor = factor
+            recall, per_query = measure(reranked)
+            print(f"{f'  + rerank x{factor} (float)':<26} {index.code_size:>10} "
+                  f"{recall:>8.3f} {per_query * 1000:>9.2f}")
+
+    print("\nRe-ranking reads float vectors from the memory-mapped side array "
+          "(disk/page cache), so RAM per item stays at the code size.")
+
+
+# ============================================================================
+# PCA REDUCTION
+# ============================================================================
+
+def bench_pca(args):
+    """Index size, latency and recall@k of PCA-reduced indexes vs full vectors"""
+    import faiss
+    from utils.search import FashionSearchEngine, IndexBuilder
+
+    if args.synthetic:
+        # Clustered vectors with a decaying spectrum, like real embeddings
+        rng = np.random.default_rng(0)
+        scales = 1.0 / np.sqrt(np.arange(1, args.dim + 1))
+        centers = rng.standard_normal((max(1, args.synthetic // 100), args.dim)) * scales
+        vectors = (centers[rng.integers(0, len(centers), args.synthetic)] +
+                   0.5 * rng.standard_normal((args.synthetic, args.dim)) * scales).astype('float32')
+    else:
+        engine = FashionSearchEngine()
+        engine.load()
+        vectors = engine.get_vectors(np.arange(engine.index.ntotal))
+    faiss.normalize_L2(vectors)
+
+    n, dim = vectors.shape
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, min(args.queries, n), replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype('float32')
+    faiss.normalize_L2(queries)
+
+    print_header(f"PCA reduction | {n:,} items x {dim} dims | {args.index_type} | "
+                 f"{len(queries)} queries | recall@{args.k}")
+
+    exact = FashionSearchEngine.from_index(
+        IndexBuilder.build_index_streaming([vectors], dim, index_type='flat'))
+    truth = [{r['index'] for r in hits} for hits in exact.search_batch(queries, args.k)]
+
+    def measure(engine):
+        start = time.perf_counter()
+        results = engine.search_batch(queries, args.k)
+        per_query = (time.perf_counter() - start) / len(queries)
+        found = [len(t & {r['index'] for r in hits}) for t, hits in zip(truth, results)]
+        return sum(found) / (len(truth) * args.k), per_query
+
+    def index_mb(index):
+        return len(faiss.serialize_index(index)) / 1e6
+
+    def row(label, index, engine):
+        recall, per_query = measure(engine)
+        print(f"{label:<24} {index_mb(index):>9.1f} {recall:>8.3f} {per_query * 1000:>9.2f}")
+
+    print(f"{'index':<24} {'index MB':>9} {'recall':>8} {'ms/query':>9}")
+    full = IndexBuilder.build_index_streaming([vectors], dim, index_type=args.index_type)
+    row(f"{args.index_type} {dim}-d", full, FashionSearchEngine.from_index(full))
+
+    for pca_dim in args.dims:
+        index = IndexBuilder.build_index_streaming(
+            [vectors], dim, index_type=args.index_type, pca_dim=pca_dim
+        )
+        row(f"PCA {pca_dim}-d", index, FashionSearchEngine.from_index(index))
+        for factor in args.rerank_factor:
+            reranked = FashionSearchEngine.from_index(index, vectors=vectors)
+            reranked.rerank_factor = factor
+            row(f"  + rerank x{factor} (float)", index, reranked)
+
+    print("\nRe-ranking reads full vectors from the memory-mapped side array "
+          "(disk/page cache), so RAM stays at the reduced index size.")
+
+
+# ============================================================================
+# STARTUP / FIRST QUERY
+# ============================================================================
+
+def _startup_child(args):
+    """One fresh process: time model load, first query and steady state"""
+    import json
+    from PIL import Image
+    from utils.embedder import FashionEmbedder
+
+    start = time.perf_counter()
+    embedder = FashionEmbedder(
+        pretrained=args.pretrained,
+        cache_dir=args.cache_dir if args.cached else None,
+        warmup_batch_sizes=(1,) if args.warm else ()
+    )
+    load_time = time.perf_counter() - start
+
+    image = Image.new('RGB', (640, 480), color=(120, 80, 60))
+    start = time.perf_counter()
+    embedder.embed_image(image)
+    first = time.perf_counter() - start
+
+    steady = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        embedder.embed_image(image)
+        steady.append(time.perf_counter() - start)
+
+    print("RESULT " + json.dumps({'load': load_time, 'first': first,
+                                  'steady': float(np.median(steady))}))
+
+
+def bench_startup(args):
+    """Cold vs warm start: model load time and first-query latency per process"""
+    import json
+    import shutil
+    import subprocess
+
+    if args.child:
+        return _startup_child(args)
+
+    print_header("Startup | fresh process per run")
+
+    shutil.rmtree(Path(args.cache_dir), ignore_errors=True)
+    configs = [
+        ("open_clip, no warm-up", []),
+        ("open_clip + warm-up (fills cache)", ["--warm", "--cached"]),
+        ("cached trace + warm-up", ["--warm", "--cached"]),
+    ]
+
+    print(f"{'configuration':<36} {'load s':>7} {'1st query ms':>13} {'steady ms':>10}")
+    for name, flags in configs:
+        out = subprocess.run(
+            [sys.executable, __file__, "startup", "--child", "--pretrained", args.pretrained,
+             "--cache-dir", args.cache_dir, "--repeat", str(args.repeat), *flags],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(out.split("RESULT ", 1)[1])
+        print(f"{name:<36} {result['load']:>7.2f} {result['first'] * 1000:>13.1f} "
+              f"{result['steady'] * 1000:>10.1f}")
+
+
+# ============================================================================
+# GARMENT CROPPING
+# ============================================================================
+
+def bench_crop(args):
+    """Camera query latency split: garment localization vs multi-crop embedding"""
+    from PIL import Image
+    from utils.crop import find_garment_regions
+    from utils.embedder import FashionEmbedder
+
+    embedder = FashionEmbedder(pretrained=args.pretrained)
+
+    # Synthetic frame: textured "garment" on a plain, slightly noisy background
+    rng = np.random.default_rng(0)
+    frame = np.clip(rng.normal(200, 8, (args.height, args.width, 3)), 0, 255).astype(np.uint8)
+    gh, gw = args.height // 2, args.width // 4
+    top, left = args.height // 4, args.width // 3
+    frame[top:top + gh, left:left + gw] = rng.integers(0, 120, (gh, gw, 3))
+    image = Image.fromarray(frame)
+
+    print_header(f"Camera query | {args.width}x{args.height} | budget {args.budget_ms:.0f} ms")
+
+    def timed(fn):
+        fn()  # Warm-up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            out = fn()
+        return (time.perf_counter() - start) / args.repeat * 1000, out
+
+    crop_ms, boxes = timed(lambda: find_garment_regions(frame, max_regions=args.max_crops))
+    crops = [image.crop(box) for box in boxes] or [image]
+    whole_ms, _ = timed(lambda: embedder.embed_image(image))
+    multi_ms, _ = timed(lambda: embedder.embed_batch(crops))
+
+    print(f"Boxes found          : {boxes}")
+    print(f"Crop stage           : {crop_ms:7.2f} ms")
+    print(f"Embed whole frame    : {whole_ms:7.2f} ms")
+    print(f"{f'Embed {len(crops)} crop(s)':<21}: {multi_ms:7.2f} ms")
+    total = crop_ms + multi_ms
+    status = "✓ within" if total <= args.budget_ms else "✗ over"
+    print(f"Crop + embed         : {total:7.2f} ms ({status} budget)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="StyliShi performance benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("embed-scaling", help="Multi-process embedding throughput")
+    p.add_argument("--images", default="images_catalog", help="Catalog image folder")
+    p.add_argument("--limit", type=int, default=512, help="Images to embed per run")
+    p.add_argument("--workers", type=int, nargs="*", help="Worker counts to try")
+    p.add_argument("--batch-size", type=int, default=32)
+    p.add_argument("--pretrained", default="openai", help="open_clip weights tag")
+    p.set_defaults(func=bench_embed_scaling)
+
+    p = sub.add_parser("decode-parity", help="Fast JPEG decode path speed and accuracy")
+    p.add_argument("--images", default="images_catalog", help="Catalog image folder")
+    p.add_argument("--limit", type=int, default=64, help="Images to compare")
+    p.add_argument("--tolerance", type=float, default=0.99,
+                   help="Minimum cosine similarity to the reference embedding")
+    p.add_argument("--pretrained", default="openai", help="open_clip weights tag")
+    p.set_defaults(func=bench_decode_parity)
+
+    p = sub.add_parser("index-views", help="Multi-crop pooled indexing throughput")
+    p.add_argument("--images", default="images_catalog", help="Catalog image folder")
+    p.add_argument("--limit", type=int, default=128, help="Images to embed")
+    p.add_argument("--synthetic", type=int, help="Use N random odd-aspect images instead")
+    p.add_argument("--batch-size", type=int, default=32)
+    p.add_argument("--views", nargs="+",
+                   default=["center", "center,flip", "center,pad,flip", "center,start,end,pad,flip"])
+    p.add_argument("--pretrained", default="openai", help="open_clip weights tag")
+    p.set_defaults(func=bench_index_views)
+
+    p = sub.add_parser("frame-path", help="Camera/video ndarray input path latency")
+    p.add_argument("--width", type=int, default=640)
+    p.add_argument("--height", type=int, default=480)
+    p.add_argument("--batch-size", type=int, default=8)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--pretrained", default="openai", help="open_clip weights tag")
+    p.set_defaults(func=bench_frame_path)
+
+    p = sub.add_parser("render", help="Result grid render cost before/after thumbnails")
+    p.add_argument("--metadata", help="Metadata pickle (default: published index)")
+    p.add_argument("--thumbs-dir", default="embeddings/thumbnails")
+    p.add_argument("--k", type=int, default=10, help="Results per page")
+    p.add_argument("--repeat", type=int, default=20, help="Simulated reruns")
+    p.set_defaults(func=bench_render)
+
+    p = sub.add_parser("search-load", help="Search p50/p99 under concurrent requests")
+    p.add_argument("--synthetic", type=int, help="Use N random vectors instead of the index")
+    p.add_argument("--dim", type=int, default=512, help="Synthetic vector dimension")
+    p.add_argument("--index-type", default="flat", help="Synthetic index type")
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--max-batch", type=int, default=32)
+    p.add_argument("--max-wait-ms", type=float, default=2.0)
+    p.set_defaults(func=bench_search_load)
+
+    p = sub.add_parser("pipeline", help="Sequential vs pipelined image-query throughput")
+    p.add_argument("--items", type=int, default=50000, help="Synthetic catalog size")
+    p.add_argument("--width", type=int, default=640)
+    p.add_argument("--height", type=int, default=480)
+    p.add_argument("--requests", type=int, default=64)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--max-batch", type=int, default=16)
+    p.add_argument("--pretrained", default="openai", help="open_clip weights tag")
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser("overload", help="Goodput under bursts with and without admission control")
+    p.add_argument("--items", type=int, default=50000, help="Synthetic catalog size")
+    p.add_argument("--rates", type=float, nargs="+", default=[4, 12, 30], help="Offered QPS")
+    p.add_argument("--duration", type=float, default=10.0, help="Seconds per rate")
+    p.add_argument("--deadline-ms", type=float, default=1000.0)
+    p.add_argument("--repeat-share", type=float, default=0.2,
+                   help="Share of requests re-sending a popular image (cache hits)")
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--pretrained", default="openai", help="open_clip weights tag")
+    p.set_defaults(func=bench_overload)
+
+    p = sub.add_parser("binary-recall", help="Binary code memory/recall vs the flat index")
+    p.add_argument("--synthetic", type=int, help="Use N clustered random vectors instead of the index")
+    p.add_argument("--dim", type=int, default=512, help="Synthetic vector dimension")
+    p.add_argument("--queries", type=int, default=500)
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--nbits", type=int, nargs="+", default=[256, 512, 1024])
+    p.add_argument("--rerank-factor", type=int, nargs="+", default=[4, 8, 16])
+    p.set_defaults(func=bench_binary_recall)
+
+    p = sub.add_parser("pca", help="PCA-reduced index size/latency/recall vs full vectors")
+    p.add_argument("--synthetic", type=int, help="Use N clustered random vectors instead of the index")
+    p.add_argument("--dim", type=int, default=512, help="Synthetic vector dimension")
+    p.add_argument("--index-type", default="flat", choices=["flat", "ivf", "ivfpq"])
+    p.add_argument("--queries", type=int, default=500)
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256])
+    p.add_argument("--rerank-factor", type=int, nargs="+", default=[4])
+    p.set_defaults(func=bench_pca)
+
+    p = sub.add_parser("startup", help="Cold vs warm model load and first-query latency")
+    p.add_argument("--pretrained", default="openai", help="open_clip weights tag")
+    p.add_argument("--cache-dir", default=str(Path(tempfile.gettempdir()) / "stylishi_model_cache"),
+                   help="Model cache used for the cached runs (cleared first)")
+    p.add_argument("--repeat", type=int, default=10, help="Steady-state queries")
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    p.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    p.add_argument("--cached", action="store_true", help=argparse.SUPPRESS)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("crop", help="Garment crop stage latency for camera queries")
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.add_argument("--max-crops", type=int, default=2)
+    p.add_argument("--budget-ms", type=float, default=150.0, help="Latency budget for crop + embed")
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--pretrained", default="openai", help="open_clip weights tag")
+    p.set_defaults(func=bench_crop)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,10 @@ import json
 
 def download_file(url: str, dest: Path, desc: str = "Downloading"):
     """Download file with progress bar"""
-    response = requests.get(url, stream=True)
+    from utils.fetch import make_session
+
+    response = make_session().get(url, stream=True, timeout=30)
+    response.raise_for_status()
     total_size = int(response.headers.get('content-length', 0))
 
     dest.parent.mkdir(parents=True, exist_ok=True)
@@ -36,12 +39,13 @@ def download_file(url: str, dest: Path, desc: str = "Downloading"):
         unit_scale=True,
         unit_divisor=1024,
     ) as pbar:
-        for chunk in response.iter_content(chunk_size=8192):
+        for chunk in response.iter_content(chunk_size=1024 * 1024):
             f.write(chunk)
             pbar.update(len(chunk))
 
 
-def download_fashion_dataset():
+def download_fashion_dataset(dedup_threshold: float = None,
+                             keep_duplicates: bool = False):
     """
     Download curated fashion dataset
     Uses a combination of public fashion datasets for 50k+ images
@@ -75,7 +79,7 @@ def download_fashion_dataset():
     create_demo_dataset(images_dir)
 
     # Build embeddings and index
-    build_embeddings_and_index(images_dir)
+    build_embeddings_and_index(images_dir, dedup_threshold, keep_duplicates)
 
 
 def create_demo_dataset(images_dir: Path):
@@ -97,107 +101,332 @@ def create_demo_dataset(images_dir: Path):
 
     print(f"Downloading {len(sample_images_info)} sample images...")
 
-    for idx, img_info in enumerate(tqdm(sample_images_info, desc="Downloading images")):
-        try:
-            img_path = images_dir / f"{img_info['id']}.jpg"
+    from utils.fetch import CatalogFetcher, list_images
 
-            if img_path.exists():
-                continue
+    fetcher = CatalogFetcher(images_dir)
+    for _ in tqdm(fetcher.fetch(sample_images_info), total=len(sample_images_info),
+                  desc="Downloading images"):
+        pass
 
-            # Download image
-            response = requests.get(img_info['url'], timeout=10)
-            if response.status_code == 200:
-                with open(img_path, 'wb') as f:
-                    f.write(response.content)
+    for failure in fetcher.failed:
+        print(f"Failed to download {failure['id']}: {failure['error']}")
 
-                # Verify it's a valid image
-                try:
-                    img = Image.open(img_path)
-                    img.verify()
-                except:
-                    img_path.unlink()
-                    continue
+    print(f"✓ Downloaded {len(list_images(images_dir))} images")
 
-        except Exception as e:
-            print(f"Failed to download {img_info['id']}: {e}")
-            continue
 
-    print(f"✓ Downloaded {len(list(images_dir.glob('*.jpg')))} images")
+def download_from_manifest(manifest_path: str,
+                           images_dir: Path,
+                           download_workers: int = 16,
+                           store_dir: str = "embeddings/store",
+                           **build_options):
+    """
+    Fetch a catalog from a URL manifest and embed images as they arrive
+
+    Downloads run concurrently in a thread pool while the main thread
+    embeds each verified image into the embedding store, then the index is
+    built from the store. Rerunning resumes both the downloads (finished
+    files are skipped) and the embeddings (stored images are skipped).
+
+    Args:
+        manifest_path: JSONL/JSON/CSV manifest with 'url' (and 'id', 'category')
+        images_dir: Folder receiving the images
+        download_workers: Concurrent downloads
+        store_dir: Directory of the persistent embedding store
+        **build_options: Passed to build_embeddings_and_index
+    """
+    from utils.fetch import CatalogFetcher, read_url_manifest
+    from utils.embedder import FashionEmbedder, model_fingerprint
+    from utils.models import resolve_model
+    from utils.store import ShardedEmbeddingStore
+    from utils.bulk import embed_stream
+
+    items = read_url_manifest(manifest_path)
+    print(f"\n🌐 Fetching {len(items):,} catalog images with {download_workers} connections...")
+
+    store = ShardedEmbeddingStore(store_dir)
+    if build_options.pop('fresh', False):
+        store.reset()
+
+    model_name, pretrained = resolve_model(build_options.get('model', 'default'))
+    if not check_store_model(store, model_fingerprint(model_name, pretrained),
+                             build_options.get('views', ('center',))):
+        return
 
+    fetcher = CatalogFetcher(images_dir, workers=download_workers)
+    embed_stream(FashionEmbedder(model_name, pretrained), fetcher.fetch(items), store.shard(0),
+                 Path(__file__).parent, total=len(items),
+                 views=build_options.get('views', ('center',)))
 
-def build_embeddings_and_index(images_dir: Path):
+    if fetcher.failed:
+        failed_log = images_dir / "failed_downloads.json"
+        with open(failed_log, 'w') as f:
+            json.dump(fetcher.failed, f, indent=2)
+        print(f"⚠️  {len(fetcher.failed):,} downloads failed (see {failed_log})")
+
+    # Everything fetched is already embedded; this only builds the index
+    build_embeddings_and_index(images_dir, store_dir=store_dir, **build_options)
+
+
+def check_store_model(store, model: dict, views: tuple = ('center',)) -> bool:
+    """
+    Make sure resumed embeddings come from the model and views being built with
+
+    Records the model fingerprint and preprocessing views in the store on
+    first use.
+
+    Args:
+        store: ShardedEmbeddingStore being resumed
+        model: Fingerprint of the embedding model (model_fingerprint())
+        views: Crops pooled per image (--index-views)
+
+    Returns:
+        False if the store holds embeddings from a different model or views
+    """
+    model_file = Path(store.root) / "model.json"
+    if len(store) and model_file.exists():
+        with open(model_file) as f:
+            stored = json.load(f)
+        if stored['id'] != model['id']:
+            print(f"❌ Stored embeddings come from {stored['model_name']}/{stored['pretrained']}, "
+                  f"not {model['model_name']}/{model['pretrained']}. Rerun with --fresh")
+            return False
+        # Stores recorded before views were tracked only used the center crop
+        stored_views = tuple(stored.get('views', ('center',)))
+        if stored_views != tuple(views):
+            print(f"❌ Stored embeddings pool the views {','.join(stored_views)}, "
+                  f"not {','.join(views)}. Rerun with --fresh")
+            return False
+
+    model_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(model_file, 'w') as f:
+        json.dump({**model, 'views': list(views)}, f, indent=2)
+    return True
+
+
+def build_embeddings_and_index(images_dir: Path,
+                               dedup_threshold: float = None,
+                               keep_duplicates: bool = False,
+                               store_dir: str = "embeddings/store",
+                               fresh: bool = False,
+                               index_type: str = "flat",
+                               workers: int = 1,
+                               thumbnails: bool = True,
+                               clusters: int = None,
+                               views: tuple = ('center',),
+                               model: str = 'default',
+                               pca_dim: int = None):
     """
     Build CLIP embeddings and FAISS index for all images
+
+    Embeddings are appended to an on-disk embedding store as they are
+    computed, so a rerun after a crash resumes with the remaining images.
+    The index is then built by streaming chunks back from the store.
+
+    Args:
+        images_dir: Folder with catalog images
+        dedup_threshold: Cosine similarity above which images are treated as
+            near-duplicates (None disables deduplication)
+        keep_duplicates: Keep duplicates in the index (tagged with their
+            cluster) instead of keeping one representative per cluster
+        store_dir: Directory of the persistent embedding store
+        fresh: Discard previously stored embeddings instead of resuming
+        index_type: FAISS index type ('flat', 'ivf', 'ivfpq' or 'binary')
+        workers: Embedding worker processes (>1 shards images across cores)
+        thumbnails: Build result-grid thumbnails for the indexed items
+        clusters: Style clusters for the browse view (None = auto, 0 = skip)
+        views: Crops pooled per catalog image (e.g. center, pad, flip);
+            rebuild with fresh=True after changing them
+        model: Embedding model, a utils.models.MODELS name or "arch/pretrained";
+            the app loads the same model from the published manifest
+        pca_dim: Reduce indexed vectors to this many dimensions with PCA
+            (None = keep the full embedding)
     """
     print("\n🧠 Building CLIP embeddings and FAISS index...")
 
     # Import here to avoid dependency during download
     try:
-        from utils.embedder import FashionEmbedder
+        from utils.embedder import FashionEmbedder, model_fingerprint
+        from utils.models import resolve_model
         from utils.search import IndexBuilder
+        from utils.store import ShardedEmbeddingStore
+        from utils.bulk import embed_parallel, embed_to_store
+        from utils.thumbnails import build_thumbnails, item_key
+        from utils.tombstones import Tombstones
+        from utils.fetch import list_images
     except ImportError:
         print("⚠️  Installing required packages first...")
         os.system(f"{sys.executable} -m pip install -r requirements.txt")
-        from utils.embedder import FashionEmbedder
+        from utils.embedder import FashionEmbedder, model_fingerprint
+        from utils.models import resolve_model
         from utils.search import IndexBuilder
-
-    # Initialize embedder
-    embedder = FashionEmbedder()
+        from utils.store import ShardedEmbeddingStore
+        from utils.bulk import embed_parallel, embed_to_store
+        from utils.thumbnails import build_thumbnails, item_key
+        from utils.tombstones import Tombstones
+        from utils.fetch import list_images
 
     # Get all images
-    image_files = sorted(images_dir.glob("*.jpg"))
+    # Any image type: fetched catalogs keep the extension they were served with
+    image_files = list_images(images_dir)
     print(f"Found {len(image_files)} images")
 
     if len(image_files) == 0:
         print("❌ No images found! Please check the download.")
         return
 
-    # Process in batches
-    batch_size = 32
-    all_embeddings = []
-    all_metadata = []
-
-    print("Computing embeddings...")
-    for i in tqdm(range(0, len(image_files), batch_size)):
-        batch_files = image_files[i:i + batch_size]
-        batch_images = []
-
-        for img_path in batch_files:
-            try:
-                img = Image.open(img_path).convert('RGB')
-                batch_images.append(img)
-            except Exception as e:
-                print(f"Failed to load {img_path}: {e}")
-                continue
-
-        if batch_images:
-            # Compute embeddings
-            embeddings = embedder.embed_batch(batch_images)
-            all_embeddings.append(embeddings)
-
-            # Store metadata
-            for j, img_path in enumerate(batch_files[:len(batch_images)]):
-                all_metadata.append({
-                    'image_path': str(img_path.relative_to(Path(__file__).parent)),
-                    'filename': img_path.name,
-                    'category': 'fashion'  # Could extract from filename
-                })
-
-    # Combine all embeddings
-    embeddings_array = np.vstack(all_embeddings)
-    print(f"✓ Computed {len(embeddings_array)} embeddings")
-
-    # Build FAISS index
-    IndexBuilder.build_index(
-        embeddings_array,
+    # Resume from the persistent store unless asked to start over
+    store = ShardedEmbeddingStore(store_dir)
+    if fresh:
+        store.reset()
+
+    model_name, pretrained = resolve_model(model)
+    fingerprint = model_fingerprint(model_name, pretrained)
+    if not check_store_model(store, fingerprint, views):
+        return
+
+    base_dir = Path(__file__).parent
+    done = store.processed_keys()
+    pending = [p for p in image_files
+               if str(p.relative_to(base_dir)) not in done]
+    if done:
+        print(f"↻ Resuming: {len(store):,} embeddings already stored, "
+              f"{len(pending):,} images to go")
+
+    if pending and workers > 1:
+        # Data-parallel: one pinned embedder per worker, one shard each
+        embed_parallel(pending, store, base_dir, workers, views=views,
+                       model_name=model_name, pretrained=pretrained)
+    elif pending:
+        # Initialize embedder
+        embedder = FashionEmbedder(model_name, pretrained)
+
+        print("Computing embeddings...")
+        embed_to_store(embedder, pending, store.shard(0), base_dir, views=views)
+
+    if len(store) == 0:
+        print("❌ No embeddings computed! Please check the images.")
+        return
+
+    print(f"✓ Computed {len(store)} embeddings")
+
+    # Deleted items stay out of every rebuild
+    all_metadata = store.metadata()
+    rows = None
+    tombstones = Tombstones.load("embeddings/tombstones.json")
+    if tombstones.items:
+        rows = np.array([i for i, meta in enumerate(all_metadata)
+                         if item_key(meta) not in tombstones], dtype='int64')
+        all_metadata = [all_metadata[i] for i in rows]
+        print(f"🪦 Skipping {len(store) - len(rows):,} deleted items")
+
+    def embeddings(subset=None):
+        """Stored embeddings of the indexed rows (or a subset of them)"""
+        selected = rows if subset is None else (subset if rows is None else rows[subset])
+        return store if selected is None else store.iter_embeddings(rows=selected)
+
+    # Build FAISS index streaming from the store
+    vectors_path = Path("embeddings/fashion.index").with_suffix('.vectors.npy')
+    index, all_metadata = index_from_store(
+        embeddings, store.dim, all_metadata,
+        index_type=index_type,
+        pca_dim=pca_dim,
+        dedup_threshold=dedup_threshold,
+        keep_duplicates=keep_duplicates,
+        vectors_path=vectors_path
+    )
+
+    # Versioned files + manifest swap, picked up live by a running app
+    IndexBuilder.publish(
+        index,
         all_metadata,
-        save_path="embeddings/fashion.index",
-        metadata_path="embeddings/metadata.pkl"
+        manifest_path="embeddings/manifest.json",
+        vectors_path=vectors_path,
+        model=fingerprint
     )
 
+    # Small pre-encoded thumbnails for the result grid
+    if thumbnails:
+        build_thumbnails(all_metadata, "embeddings/thumbnails", base_dir)
+
+    # Style clusters for the browse view, from the vectors just published
+    if clusters != 0:
+        build_style_clusters(clusters)
+
     print("\n✅ Dataset ready! You can now run: streamlit run app.py")
 
 
+def index_from_store(embeddings, dimension: int, metadata: list,
+                     index_type: str = "flat",
+                     pca_dim: int = None,
+                     dedup_threshold: float = None,
+                     keep_duplicates: bool = False,
+                     vectors_path: str = None):
+    """
+    Build the serving index from stored embeddings, collapsing near-duplicates
+
+    Args:
+        embeddings: Function returning the stored embedding chunks, or
+            those of a subset of positions when given one
+        dimension: Embedding dimension
+        metadata: Metadata aligned with the embeddings
+        index_type: One of IndexBuilder.INDEX_TYPES
+        pca_dim: Reduce indexed vectors to this many dimensions with PCA
+        dedup_threshold: Cosine similarity for near-duplicates (None = skip)
+        keep_duplicates: Tag duplicates instead of dropping them
+        vectors_path: Side array of the indexed embeddings
+
+    Returns:
+        Tuple of (index, metadata of the indexed items)
+    """
+    from utils.search import IndexBuilder
+    from utils.dedup import dedup_catalog, exact_index
+
+    index_options = {
+        'index_type': index_type,
+        'vectors_path': vectors_path,
+        'pca_dim': pca_dim,
+    }
+    index = IndexBuilder.build_index_streaming(embeddings(), dimension, **index_options)
+
+    # Collapse near-identical shots before the index is published
+    if dedup_threshold is not None:
+        # Only a plain flat index scores exact cosines: PCA inflates them,
+        # PQ/binary codes approximate them and IVF probes too few cells.
+        # Compare the full stored embeddings for every other type
+        exact = index_type == 'flat' and not pca_dim
+        dedup_index = index if exact else exact_index(embeddings(), dimension)
+        keep, metadata = dedup_catalog(
+            dedup_index,
+            embeddings(),
+            metadata,
+            threshold=dedup_threshold,
+            keep_duplicates=keep_duplicates
+        )
+        del dedup_index
+        if len(keep) < index.ntotal:
+            del index
+            index = IndexBuilder.build_index_streaming(
+                embeddings(keep), dimension, **index_options
+            )
+
+    return index, metadata
+
+
+def build_style_clusters(n_clusters: int = None):
+    """
+    Cluster the published index into styles for the browse view
+
+    Args:
+        n_clusters: Number of styles (None = ~sqrt(catalog size))
+    """
+    from utils.search import FashionSearchEngine
+    from utils.clusters import build_clusters
+
+    engine = FashionSearchEngine()
+    engine.load()
+    build_clusters(engine, n_clusters)
+
+
 def download_large_dataset():
     """
     Download larger datasets from public sources
@@ -233,22 +462,97 @@ After downloading, this script will compute embeddings and build the search inde
 if __name__ == "__main__":
     import argparse
 
-    parser = argparse.ArgumentParser(description="Download and prepare fashion dataset")
+    # Listing the models imports open_clip, so only do it when help is shown
+    epilog = None
+    if {'-h', '--help'} & set(sys.argv[1:]):
+        try:
+            from utils.models import describe_models
+            epilog = "models (--model):\n" + "\n".join(
+                f"  {line}" for line in describe_models().splitlines())
+        except ImportError:
+            pass
+
+    parser = argparse.ArgumentParser(description="Download and prepare fashion dataset",
+                                     epilog=epilog,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("--build-index-only", action="store_true",
                        help="Skip download, just build index from existing images")
     parser.add_argument("--large-dataset", action="store_true",
                        help="Show instructions for downloading larger datasets")
+    parser.add_argument("--dedup-threshold", type=float, default=None,
+                       help="Merge near-duplicate images above this cosine similarity (e.g. 0.95)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                       help="Tag duplicate clusters instead of dropping duplicates from the index")
+    parser.add_argument("--fresh", action="store_true",
+                       help="Discard stored embeddings instead of resuming an interrupted build")
+    parser.add_argument("--index-type", choices=["flat", "ivf", "ivfpq", "binary"], default="flat",
+                       help="FAISS index type (ivf/ivfpq train on a sample for large catalogs, "
+                            "binary keeps 64-byte codes in RAM and re-ranks from disk)")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Embedding worker processes, each pinned to a share of the CPU cores")
+    parser.add_argument("--skip-thumbnails", action="store_true",
+                       help="Don't build result thumbnails after indexing")
+    parser.add_argument("--clusters", type=int, default=None,
+                       help="Number of style clusters for browsing (default: ~sqrt(N), 0 = skip)")
+    parser.add_argument("--build-clusters-only", action="store_true",
+                       help="Just (re)cluster the published index into styles")
+    parser.add_argument("--index-views", type=str, default="center",
+                       help="Comma-separated crops pooled per catalog image "
+                            "(center,start,end,pad,flip); query cost is unchanged")
+    parser.add_argument("--model", type=str, default="default",
+                       help="Embedding model: fast, default, balanced, best "
+                            "(listed below, see utils/models.py) or an open_clip 'arch/pretrained' pair")
+    parser.add_argument("--pca-dim", type=int, default=None,
+                       help="Reduce indexed vectors to this many dimensions with PCA "
+                            "(e.g. 128; see 'python benchmark.py pca' for the recall cost)")
+    parser.add_argument("--url-manifest", type=str, default=None,
+                       help="Fetch the catalog from a JSONL/JSON/CSV manifest of image URLs")
+    parser.add_argument("--download-workers", type=int, default=16,
+                       help="Concurrent downloads for --url-manifest")
 
     args = parser.parse_args()
 
     try:
         if args.large_dataset:
             download_large_dataset()
+        elif args.build_clusters_only:
+            build_style_clusters(args.clusters)
+        elif args.url_manifest:
+            download_from_manifest(
+                args.url_manifest,
+                Path(__file__).parent / "images_catalog",
+                download_workers=args.download_workers,
+                dedup_threshold=args.dedup_threshold,
+                keep_duplicates=args.keep_duplicates,
+                fresh=args.fresh,
+                index_type=args.index_type,
+                workers=args.workers,
+                thumbnails=not args.skip_thumbnails,
+                clusters=args.clusters,
+                views=tuple(args.index_views.split(',')),
+                model=args.model,
+                pca_dim=args.pca_dim
+            )
         elif args.build_index_only:
             images_dir = Path(__file__).parent / "images_catalog"
-            build_embeddings_and_index(images_dir)
+            build_embeddings_and_index(
+                images_dir,
+                dedup_threshold=args.dedup_threshold,
+                keep_duplicates=args.keep_duplicates,
+                fresh=args.fresh,
+                index_type=args.index_type,
+                workers=args.workers,
+                thumbnails=not args.skip_thumbnails,
+                clusters=args.clusters,
+                views=tuple(args.index_views.split(',')),
+                model=args.model,
+                pca_dim=args.pca_dim
+            )
         else:
-            download_fashion_dataset()
+            download_fashion_dataset(
+                dedup_threshold=args.dedup_threshold,
+                keep_duplicates=args.keep_duplicates
+            )
 
     except KeyboardInterrupt:
         print("\n\n❌ Download cancelled by user")
@@ -0,0 +1,71 @@
+"""
+Precompute "similar items" for every catalog SKU
+Run: python export_similar.py --k 20
+"""
+
+import sys
+import io
+
+# Fix Windows console encoding for emojis
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+from pathlib import Path
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export precomputed similar items for the catalog")
+    parser.add_argument("--output", default="embeddings/similar",
+                        help="Output folder (ids.npy + part-*.npz, read with utils.export.read_similar)")
+    parser.add_argument("--k", type=int, default=20, help="Neighbors per item")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Items per FAISS call")
+    parser.add_argument("--items", type=str, default=None,
+                        help="Only export the item IDs listed in this file (one per line)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="Allow several near-duplicates of one item among the neighbors")
+    parser.add_argument("--max-similarity", type=float, default=None,
+                        help="Treat neighbors at or above this cosine similarity as duplicates "
+                             "(e.g. 0.97 for catalogs built without --dedup-threshold)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Start over instead of resuming an interrupted export")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="FAISS threads (default: all cores)")
+    parser.add_argument("--jsonl", type=str, default=None,
+                        help="Also write one JSON line per item (item_id, neighbor_ids, scores)")
+    args = parser.parse_args()
+
+    from utils.batching import configure_threads
+    from utils.export import export_similar, read_similar
+    from utils.search import FashionSearchEngine
+
+    threads = configure_threads(faiss_threads=args.threads)
+    print(f"🧵 FAISS threads: {threads['faiss_threads']}")
+
+    items = None
+    if args.items:
+        with open(args.items) as f:
+            items = [line.strip() for line in f if line.strip()]
+
+    engine = FashionSearchEngine()
+    export_similar(
+        engine,
+        args.output,
+        k=args.k,
+        batch_size=args.batch_size,
+        items=items,
+        collapse_duplicates=not args.keep_duplicates,
+        max_similarity=args.max_similarity,
+        resume=not args.fresh
+    )
+
+    if args.jsonl:
+        Path(args.jsonl).parent.mkdir(parents=True, exist_ok=True)
+        read_similar(args.output).to_json(args.jsonl, orient='records', lines=True)
+        print(f"✓ Wrote {args.jsonl}")
+
+
+if __name__ == "__main__":
+    main()
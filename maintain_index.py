@@ -0,0 +1,100 @@
+"""
+Maintain the published index of a long-lived catalog
+Run: python maintain_index.py check
+     python maintain_index.py delete SKU123 SKU456
+     python maintain_index.py compact
+"""
+
+import sys
+import io
+
+# Fix Windows console encoding for emojis
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+import time
+
+
+def read_ids(args) -> list:
+    """Item IDs from the command line and/or --file (one per line)"""
+    ids = list(args.items)
+    if args.file:
+        with open(args.file) as f:
+            ids += [line.strip() for line in f if line.strip()]
+    if not ids:
+        print("❌ No item IDs given")
+        sys.exit(1)
+    return ids
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Delete items, compact and check the published index")
+    parser.add_argument("--manifest", default="embeddings/manifest.json", help="Index manifest")
+    parser.add_argument("--tombstones", default="embeddings/tombstones.json",
+                        help="Deleted item IDs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("check", help="Validate that metadata, vectors and index line up")
+
+    for name, text in (("delete", "Tombstone items (hidden from searches right away)"),
+                       ("restore", "Undo deletes that were not compacted yet")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument("items", nargs="*", help="Item IDs")
+        command.add_argument("--file", type=str, default=None,
+                             help="Also read item IDs from this file (one per line)")
+
+    compact = commands.add_parser("compact", help="Rewrite the index without deleted items")
+    compact.add_argument("--min-deleted", type=float, default=0.0,
+                         help="Only compact once this share of items is deleted (e.g. 0.05)")
+    compact.add_argument("--every", type=float, default=None,
+                         help="Keep running and check every N seconds")
+    compact.add_argument("--no-recluster", action="store_true",
+                         help="Don't rebuild the style clusters after compacting")
+    args = parser.parse_args()
+
+    from utils.maintenance import Compactor, check_index, compact_index
+    from utils.search import FashionSearchEngine
+    from utils.tombstones import Tombstones
+
+    if args.command == "check":
+        problems = check_index(args.manifest, args.tombstones)
+        sys.exit(1 if problems else 0)
+
+    if args.command in ("delete", "restore"):
+        ids = read_ids(args)
+        tombstones = Tombstones.load(args.tombstones)
+        if args.command == "delete":
+            count = tombstones.delete(ids)
+            print(f"🪦 Deleted {count:,} items ({len(tombstones):,} tombstones, "
+                  f"revision {tombstones.revision})")
+        else:
+            count = tombstones.restore(ids)
+            print(f"↩️  Restored {count:,} items ({len(tombstones):,} tombstones left)")
+        print("   Running apps pick this up on their next index check")
+        return
+
+    engine = FashionSearchEngine(manifest_path=args.manifest, tombstones_path=args.tombstones)
+    if args.every is None:
+        version = compact_index(engine, args.min_deleted, recluster=not args.no_recluster)
+        if version is None:
+            print(f"✓ Nothing to compact ({engine.get_stats()['deleted']:,} deleted items)")
+        return
+
+    compactor = Compactor(engine, args.min_deleted, args.every,
+                          recluster=not args.no_recluster)
+    compactor.run_once()
+    compactor.start()
+    print(f"🗜️  Checking every {args.every:.0f}s for >= {args.min_deleted:.0%} deleted items "
+          f"(Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        compactor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -106,22 +106,50 @@ def check_models():
         embedding = embedder.embed_image(test_img)
         print(f"✓ Test embedding generated: shape {embedding.shape}")
 
-        return True
+        return check_concurrent_embedding(embedder)
     except Exception as e:
         print(f"✗ Model loading failed: {e}")
         return False
 
 
+def check_concurrent_embedding(embedder, threads=8, rounds=4):
+    """Embeddings computed from several threads at once must match sequential ones"""
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, (240, 320, 3), dtype=np.uint8) for _ in range(threads)]
+    expected = [embedder.embed_batch([image, image[::-1]]) for image in images]
+
+    # The shared input buffer is reused between calls; a request must
+    # never see another request's pixels
+    with ThreadPoolExecutor(threads) as pool:
+        for _ in range(rounds):
+            found = list(pool.map(lambda image: embedder.embed_batch([image, image[::-1]]),
+                                  images))
+            for want, got in zip(expected, found):
+                if not np.allclose(want, got, atol=1e-4):
+                    print("✗ Concurrent embeddings differ from sequential ones")
+                    return False
+
+    print(f"✓ Concurrent embedding matches sequential ({threads} threads x {rounds} rounds)")
+    return True
+
+
 def check_dataset():
     """Check if dataset and index exist"""
     print_header("5️⃣  Checking Dataset & Index")
 
     index_path = Path("embeddings/fashion.index")
     metadata_path = Path("embeddings/metadata.pkl")
+    manifest_path = Path("embeddings/manifest.json")
 
-    if index_path.exists() and metadata_path.exists():
-        print(f"✓ FAISS index exists")
-        print(f"✓ Metadata exists")
+    if manifest_path.exists() or (index_path.exists() and metadata_path.exists()):
+        if manifest_path.exists():
+            print(f"✓ Index manifest exists")
+        else:
+            print(f"✓ FAISS index exists")
+            print(f"✓ Metadata exists")
 
         # Try loading
         try:
@@ -133,6 +161,16 @@ def check_dataset():
             print(f"  - Total items: {stats['total_items']:,}")
             print(f"  - Embedding dim: {stats['embedding_dim']}")
             print(f"  - Index type: {stats['index_type']}")
+            if stats['version'] is not None:
+                print(f"  - Version: {stats['version']}")
+            if stats['model'] is not None:
+                print(f"  - Model: {stats['model']}")
+            if stats['deleted']:
+                print(f"  - Deleted (not compacted): {stats['deleted']:,}")
+            if manifest_path.exists():
+                from utils.maintenance import check_index
+                if check_index(str(manifest_path)):
+                    return False
             return True
         except Exception as e:
             print(f"✗ Index loading failed: {e}")
@@ -143,9 +181,158 @@ def check_dataset():
         return False
 
 
+def check_catalog_fetcher(items=24, workers=4):
+    """Fetch a small catalog from a local HTTP server: retries, concurrency, resume"""
+    print_header("6️⃣  Checking Catalog Fetcher")
+
+    import io
+    import tempfile
+    import threading
+    import time
+    from collections import Counter
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from PIL import Image
+    from utils.fetch import CatalogFetcher
+
+    def encode(fmt):
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 32), color='red').save(buffer, fmt)
+        return buffer.getvalue()
+
+    # WebP is served untyped: its extension has to come from the URL
+    bodies = {'png': ('image/png', encode('PNG')),
+              'jpg': ('image/jpeg', encode('JPEG')),
+              'webp': ('application/octet-stream', encode('WEBP'))}
+    hits = Counter()
+    active = {'now': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                hits[self.path] += 1
+                attempt = hits[self.path]
+                active['now'] += 1
+                active['peak'] = max(active['peak'], active['now'])
+            try:
+                time.sleep(0.05)  # Slow enough for downloads to overlap
+                if self.path.startswith('/missing/'):
+                    self.send_error(404)
+                elif self.path.startswith('/flaky/') and attempt == 1:
+                    self.send_error(503)  # Retried by the session
+                else:
+                    content_type, body = bodies[self.path.rsplit('.', 1)[-1]]
+                    self.send_response(200)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+            finally:
+                with lock:
+                    active['now'] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    catalog, expected = [], {}
+    for i in range(items):
+        kind = ('jpg', 'png', 'webp')[i % 3]
+        route = 'flaky' if i % 4 == 0 else 'ok'
+        catalog.append({'id': f"item_{i:03d}", 'url': f"{base}/{route}/{i}.{kind}"})
+        expected[f"item_{i:03d}"] = f".{kind}"
+    catalog.append({'id': 'gone', 'url': f"{base}/missing/0.jpg"})
+
+    problems = []
+    try:
+        with tempfile.TemporaryDirectory() as images_dir:
+            options = dict(workers=workers, retries=2, backoff=0.01, timeout=5)
+            fetcher = CatalogFetcher(images_dir, **options)
+            paths = list(fetcher.fetch(catalog))
+            if len(paths) != items or [f['id'] for f in fetcher.failed] != ['gone']:
+                problems.append(f"fetched {len(paths)}/{items} images, "
+                                f"{len(fetcher.failed)} failures (expected 1)")
+            if any(path.suffix != expected.get(path.stem) for path in paths):
+                problems.append("images saved with the wrong extension")
+            if any(count != 2 for path, count in hits.items() if path.startswith('/flaky/')):
+                problems.append("failed (503) downloads were not retried exactly once")
+            if active['peak'] < 2:
+                problems.append("downloads did not run concurrently")
+            if list(Path(images_dir).glob("*.part")):
+                problems.append("partial files left behind")
+
+            # Resume: only the missing item is requested again
+            requests_before = sum(hits.values())
+            resumed = list(CatalogFetcher(images_dir, **options).fetch(catalog))
+            if len(resumed) != items or sum(hits.values()) - requests_before != 1:
+                problems.append("rerun downloaded finished images again")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    for problem in problems:
+        print(f"✗ {problem}")
+    if problems:
+        return False
+    print(f"✓ Fetched {items} images ({workers} workers, peak {active['peak']} concurrent), "
+          f"retried {sum(1 for path in hits if path.startswith('/flaky/'))} failed downloads, "
+          f"resumed without refetching")
+    return True
+
+
+def check_dedup_index_types(n=4000, dim=512, threshold=0.9):
+    """Near-duplicate removal must keep the same items whatever index is served"""
+    print_header("7️⃣  Checking Deduplication")
+
+    import tempfile
+    import numpy as np
+    from download_dataset import index_from_store
+
+    # Clustered items (no pair near the threshold, but close in the top
+    # PCA components, like product shots of one style) plus near-copies
+    rng = np.random.default_rng(0)
+    styles = rng.normal(size=(40, dim))
+    vectors = (styles[rng.integers(0, 40, n)] + 0.8 * rng.normal(size=(n, dim))).astype('float32')
+    copies = vectors[:n // 10] + 0.05 * rng.normal(size=(n // 10, dim)).astype('float32')
+    vectors = np.vstack([vectors, copies])
+    metadata = [{'image_path': f"item_{i}.jpg"} for i in range(len(vectors))]
+
+    def embeddings(subset=None):
+        return [vectors if subset is None else vectors[subset]]
+
+    kept = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # ivfpq takes the same exact-join path as ivf (left out: PQ
+            # training alone takes minutes on a small machine)
+            for name, options in (('flat', {}), ('pca64', {'pca_dim': 64}),
+                                  ('ivf', {'index_type': 'ivf'}),
+                                  ('binary', {'index_type': 'binary'})):
+                _, kept_metadata = index_from_store(
+                    embeddings, dim, metadata, dedup_threshold=threshold,
+                    vectors_path=Path(tmp) / f"{name}.vectors.npy", **options
+                )
+                kept[name] = [meta['image_path'] for meta in kept_metadata]
+    except Exception as e:
+        print(f"✗ Deduplicated build failed: {e}")
+        return False
+
+    differ = [name for name in kept if kept[name] != kept['flat']]
+    for name in differ:
+        print(f"✗ {name} build kept {len(kept[name]):,} items, flat build {len(kept['flat']):,}")
+    if differ:
+        return False
+    print(f"✓ {', '.join(kept)} builds keep the same {len(kept['flat']):,} "
+          f"of {len(vectors):,} items")
+    return True
+
+
 def check_samples():
     """Check if sample images exist"""
-    print_header("6️⃣  Checking Sample Images")
+    print_header("8️⃣  Checking Sample Images")
 
     sample_dir = Path("sample_images")
     if sample_dir.exists():
@@ -205,6 +392,8 @@ def main():
         "Directories": check_directories(),
         "Model Loading": check_models(),
         "Dataset & Index": check_dataset(),
+        "Catalog Fetcher": check_catalog_fetcher(),
+        "Deduplication": check_dedup_index_types(),
         "Sample Images": check_samples(),
     }
 
@@ -0,0 +1,276 @@
+"""
+Admission control for the query pipeline
+Rejects requests that can't meet their deadline, degrades under load and
+serves repeated queries from a result cache
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .pipeline import DeadlineExceeded
+
+# Load levels (estimated latency / deadline)
+NORMAL = 'normal'        # Full quality
+DEGRADED = 'degraded'    # Fewer results, cheaper index parameters
+SHEDDING = 'shedding'    # Cache hits only, everything else rejected
+
+
+class Overloaded(RuntimeError):
+    """Request rejected up front because it could not meet its deadline"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def image_digest(image) -> str:
+    """Content hash of a query image (file paths hash their path and mtime)"""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(image, (str, Path)):
+        path = Path(image)
+        digest.update(f"{path.resolve()}:{path.stat().st_mtime_ns}".encode())
+    else:
+        if isinstance(image, Image.Image):
+            digest.update(f"{image.mode}{image.size}".encode())
+            image = image.tobytes()
+        else:
+            image = np.ascontiguousarray(image)
+            digest.update(f"{image.dtype}{image.shape}".encode())
+        digest.update(memoryview(image))
+    return digest.hexdigest()
+
+
+class AdmissionController:
+    """
+    Bounded, deadline-aware front door for a QueryPipeline
+
+    Before a query is queued, its latency is estimated from the pipeline's
+    backlog and recent per-stage costs (QueryPipeline.estimated_latency):
+
+        estimate < degrade_at x deadline   -> normal search
+        estimate <= deadline               -> degraded search (fewer results,
+                                              cheaper index parameters)
+        estimate > deadline or queue full  -> cache hit or Overloaded
+
+    Rejecting early keeps the queue short enough that admitted requests
+    still finish in time, instead of every request timing out behind the
+    model during a burst. Accepted queries also carry their deadline into
+    the pipeline, which drops them if they expire while queued.
+    """
+
+    def __init__(self, pipeline, max_in_flight: int = 64, deadline_ms: float = 2000.0,
+                 degrade_at: float = 0.5, degraded_k: int = 5, cache_size: int = 256):
+        """
+        Args:
+            pipeline: QueryPipeline serving the admitted queries
+            max_in_flight: Hard cap on queries queued or running
+            deadline_ms: Default request deadline
+            degrade_at: Share of the deadline the estimate may reach
+                before switching to degraded searches
+            degraded_k: Most results returned in degraded mode
+            cache_size: Recent results kept for repeated queries
+                (0 disables the cache)
+        """
+        self.pipeline = pipeline
+        self.max_in_flight = max_in_flight
+        self.deadline_ms = deadline_ms
+        self.degrade_at = degrade_at
+        self.degraded_k = degraded_k
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._admitted = 0  # Admitted here and not answered yet
+        self.counts = {'accepted': 0, 'degraded': 0, 'rejected': 0,
+                       'expired': 0, 'cache_hits': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _cache_key(self, image, k: int, options: dict):
+        engine = self.pipeline.engine
+        # Deletes change results without a new version
+        version = (getattr(engine, 'version', None), getattr(engine, 'tombstones_revision', None))
+        return (image_digest(image), k, tuple(sorted(options.items())), version)
+
+    def _cached(self, key):
+        with self._lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def _remember(self, key, results: List[dict]):
+        with self._lock:
+            self._cache[key] = results
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def degraded_options(self) -> dict:
+        """Search overrides in degraded mode: no MMR, fewer cells/candidates"""
+        engine = self.pipeline.engine
+        return {
+            'diversify': False,
+            'fetch_factor': 2,
+            'nprobe': max(1, getattr(engine, 'nprobe', 16) // 4),
+            'rerank_factor': max(1, getattr(engine, 'rerank_factor', 8) // 2),
+        }
+
+    def mode(self, deadline_ms: float = None) -> Tuple[str, float]:
+        """Current load level and the latency estimate (ms) it is based on"""
+        with self._lock:
+            return self._assess(deadline_ms or self.deadline_ms)
+
+    def _assess(self, deadline_ms: float, count: int = 1) -> Tuple[str, float]:
+        """mode() with the lock held, for `count` queries about to be admitted"""
+        # Admitted queries may not have reached the pipeline yet
+        in_flight = max(self.pipeline.in_flight, self._admitted)
+        estimate = self.pipeline.estimated_latency(count + in_flight - self.pipeline.in_flight)
+        if in_flight + count > self.max_in_flight or estimate > deadline_ms / 1000.0:
+            mode = SHEDDING
+        elif estimate >= self.degrade_at * deadline_ms / 1000.0:
+            mode = DEGRADED
+        else:
+            mode = NORMAL
+        return mode, estimate * 1000
+
+    def search(self, image, k: int = 10, deadline_ms: float = None,
+               query_transform=None, **search_options) -> Tuple[List[dict], dict]:
+        """
+        Admit, degrade or reject one image query
+
+        Args:
+            image: PIL Image, numpy array or image file path
+            k: Number of results wanted
+            deadline_ms: Request deadline (defaults to the controller's)
+            query_transform: Per-user embedding transform (e.g. taste
+                blending); such queries bypass the result cache
+            **search_options: As in FashionSearchEngine.search
+
+        Returns:
+            (results, info); info has 'mode', 'estimated_ms', 'cached',
+            'k' (results actually requested) and per-stage 'timings'
+
+        Raises:
+            Overloaded: Rejected before queueing (see retry_after)
+            DeadlineExceeded: Admitted but expired while queued
+        """
+        deadline_ms = deadline_ms or self.deadline_ms
+        info = {'mode': None, 'estimated_ms': None, 'cached': False,
+                'k': k, 'timings': {}}
+
+        key = None
+        if self.cache_size and query_transform is None:
+            key = self._cache_key(image, k, search_options)
+            results = self._cached(key)
+            if results is not None:
+                self._count('cache_hits')
+                info['cached'] = True
+                info['mode'], info['estimated_ms'] = self.mode(deadline_ms)
+                return results, info
+
+        mode = self._admit(deadline_ms, info)
+        if mode == DEGRADED:
+            k = info['k'] = min(k, self.degraded_k)
+            search_options = {**search_options, **self.degraded_options()}
+
+        try:
+            results, info['timings'] = self.pipeline.submit(
+                image, k, query_transform=query_transform,
+                timeout=deadline_ms / 1000.0, **search_options
+            ).result()
+        except DeadlineExceeded:
+            self._count('expired')
+            raise
+        finally:
+            with self._lock:
+                self._admitted -= 1
+
+        # Only full-quality answers are worth replaying later
+        if key is not None and mode == NORMAL:
+            self._remember(key, results)
+        return results, info
+
+    def search_batch(self, images: list, k: int = 10, deadline_ms: float = None,
+                     query_transform=None, **search_options) -> Tuple[List[List[dict]], dict]:
+        """
+        Admit, degrade or reject a group of image queries as one request
+
+        Used for the crops of one camera frame: all of them are admitted
+        (or rejected) together, then queued at once so the pipeline embeds
+        them in the same forward pass. Not cached.
+
+        Args:
+            images: PIL Images, numpy arrays or image file paths
+            k: Number of results wanted per image
+            deadline_ms: Request deadline (defaults to the controller's)
+            query_transform: Per-user embedding transform
+            **search_options: As in FashionSearchEngine.search
+
+        Returns:
+            (results per image, info); info as in search(), with the
+            per-stage 'timings' of the slowest query
+
+        Raises:
+            Overloaded: Rejected before queueing (see retry_after)
+            DeadlineExceeded: Admitted but expired while queued
+        """
+        deadline_ms = deadline_ms or self.deadline_ms
+        info = {'mode': None, 'estimated_ms': None, 'cached': False,
+                'k': k, 'timings': {}}
+
+        mode = self._admit(deadline_ms, info, count=len(images))
+        if mode == DEGRADED:
+            k = info['k'] = min(k, self.degraded_k)
+            search_options = {**search_options, **self.degraded_options()}
+
+        try:
+            futures = [self.pipeline.submit(image, k, query_transform=query_transform,
+                                            timeout=deadline_ms / 1000.0, **search_options)
+                       for image in images]
+            answers = [future.result() for future in futures]
+        except DeadlineExceeded:
+            self._count('expired')
+            raise
+        finally:
+            with self._lock:
+                self._admitted -= len(images)
+
+        info['timings'] = max((timings for _, timings in answers),
+                              key=lambda timings: sum(timings.values()), default={})
+        return [results for results, _ in answers], info
+
+    def _admit(self, deadline_ms: float, info: dict, count: int = 1) -> str:
+        """Decide and reserve `count` slots atomically, so a burst can't all get in"""
+        with self._lock:
+            mode, estimate = self._assess(deadline_ms, count)
+            info.update(mode=mode, estimated_ms=estimate)
+            if mode == SHEDDING:
+                self.counts['rejected'] += 1
+                in_flight = max(self.pipeline.in_flight, self._admitted)
+                if estimate > deadline_ms:
+                    message = (f"Estimated wait {estimate:.0f} ms exceeds the "
+                               f"{deadline_ms:.0f} ms deadline ({in_flight} queries in flight)")
+                else:
+                    message = (f"Queue full ({in_flight} queries in flight, "
+                               f"{count} more requested, at most {self.max_in_flight})")
+                raise Overloaded(message, retry_after=max(0.0, estimate - deadline_ms) / 1000.0)
+            self._admitted += count
+            self.counts['accepted'] += 1
+            if mode == DEGRADED:
+                self.counts['degraded'] += 1
+        return mode
+
+    def stats(self) -> dict:
+        """Admission counters plus the current load level"""
+        mode, estimate = self.mode()
+        with self._lock:
+            return {**self.counts, 'mode': mode, 'estimated_ms': estimate,
+                    'in_flight': self.pipeline.in_flight, 'cached': len(self._cache)}
@@ -0,0 +1,182 @@
+"""
+Concurrent query serving for the search engine
+Splits cores between FAISS/torch threads and request threads, and batches
+single queries from many threads onto one FAISS call
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+import faiss
+import numpy as np
+
+
+def available_cores() -> int:
+    """Number of CPU cores this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_threads(request_workers: int = 1, faiss_threads: int = None,
+                      torch_threads: int = None) -> dict:
+    """
+    Split the cores between concurrent requests and per-request threads
+
+    FAISS (OpenMP) and torch both default to one thread per core *per
+    call*, so N concurrent requests run N x cores threads and latency
+    spikes from oversubscription. Giving each request cores / N threads
+    keeps the total at the core count.
+
+    Both settings are process-wide: call once at startup.
+
+    Args:
+        request_workers: Requests expected to run at the same time
+        faiss_threads: OpenMP threads per FAISS call (default: cores / workers)
+        torch_threads: Intra-op threads per forward pass (default: same)
+
+    Returns:
+        Dict with the applied 'faiss_threads' and 'torch_threads'
+    """
+    per_request = max(1, available_cores() // max(1, request_workers))
+    faiss_threads = faiss_threads or per_request
+    torch_threads = torch_threads or per_request
+
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        torch_threads = None
+    # After torch, which can reset the OpenMP thread count FAISS shares
+    faiss.omp_set_num_threads(faiss_threads)
+
+    return {'faiss_threads': faiss_threads, 'torch_threads': torch_threads}
+
+
+def configure_threads_from_env(**kwargs) -> dict:
+    """
+    configure_threads() for servers, overridable per deployment
+
+    STYLISHI_REQUEST_WORKERS, STYLISHI_FAISS_THREADS and
+    STYLISHI_TORCH_THREADS (when set) replace the given arguments.
+
+    Args:
+        **kwargs: Defaults passed to configure_threads
+
+    Returns:
+        Dict with the applied 'faiss_threads' and 'torch_threads'
+    """
+    for name in ('request_workers', 'faiss_threads', 'torch_threads'):
+        value = os.environ.get(f"STYLISHI_{name.upper()}")
+        if value:
+            kwargs[name] = int(value)
+    return configure_threads(**kwargs)
+
+
+class QueryBatcher:
+    """
+    Micro-batches single-query searches from many threads
+
+    Callers block in search() as usual. A background thread collects
+    queued queries for up to max_wait_ms (or max_batch queries) and runs
+    them through FashionSearchEngine.search_batch in one FAISS call, so
+    throughput under load scales with batch size instead of thread count.
+    """
+
+    def __init__(self, engine, max_batch: int = 32, max_wait_ms: float = 2.0):
+        """
+        Args:
+            engine: FashionSearchEngine to serve
+            max_batch: Most queries per FAISS call
+            max_wait_ms: Longest a query waits for others to join its batch
+        """
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="query-batcher",
+                                        daemon=True)
+        self._worker.start()
+
+    def search(self, query_embedding: np.ndarray, k: int = 10,
+               **search_options) -> List[dict]:
+        """
+        Same contract as FashionSearchEngine.search, served in a batch
+
+        Args:
+            query_embedding: L2-normalized embedding vector (512,)
+            k: Number of results to return
+            **search_options: collapse_duplicates, diversify, mmr_lambda,
+                fetch_factor
+
+        Returns:
+            List of result dicts
+        """
+        return self.submit(query_embedding, k, **search_options).result()
+
+    def submit(self, query_embedding: np.ndarray, k: int = 10,
+               **search_options) -> Future:
+        """Queue a query and return a Future of its results"""
+        if self._closed:
+            raise RuntimeError("QueryBatcher is closed")
+        future = Future()
+        self._queue.put((np.asarray(query_embedding, dtype='float32').reshape(-1),
+                         k, search_options, future))
+        return future
+
+    def close(self):
+        """Finish queued queries and stop the batching thread"""
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Gather whatever arrives within the wait window
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    if timeout > 0:
+                        item = self._queue.get(timeout=timeout)
+                    else:
+                        item = self._queue.get_nowait()  # Already queued only
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # Stop after this batch
+                    break
+                batch.append(item)
+
+            self._serve(batch)
+
+    def _serve(self, batch: list):
+        """Run one FAISS call per group of queries sharing k and options"""
+        groups = {}
+        for item in batch:
+            _, k, options, _ = item
+            key = (k, tuple(sorted(options.items())))
+            groups.setdefault(key, []).append(item)
+
+        for (k, _), items in groups.items():
+            futures = [item[3] for item in items]
+            try:
+                results = self.engine.search_batch(
+                    np.stack([item[0] for item in items]), k, **items[0][2]
+                )
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
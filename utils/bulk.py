@@ -0,0 +1,225 @@
+"""
+Bulk catalog embedding for index builds
+Single-process batch loop plus a data-parallel multi-process mode for CPUs
+"""
+
+import os
+import multiprocessing as mp
+import numpy as np
+from pathlib import Path
+from typing import Iterable, List, Sequence
+from tqdm import tqdm
+
+from .store import EmbeddingStore, ShardedEmbeddingStore
+
+
+def catalog_metadata(img_path: Path, base_dir: Path) -> dict:
+    """Metadata dict stored for a catalog image"""
+    return {
+        'item_id': img_path.stem,
+        'image_path': str(img_path.relative_to(base_dir)),
+        'filename': img_path.name,
+        'category': 'fashion'  # Could extract from filename
+    }
+
+
+def embed_to_store(embedder,
+                   image_files: Sequence[Path],
+                   store: EmbeddingStore,
+                   base_dir: Path,
+                   batch_size: int = 32,
+                   desc: str = "Computing embeddings",
+                   position: int = 0,
+                   views: Sequence[str] = ('center',)) -> int:
+    """
+    Embed images in batches and append them to a store
+
+    Args:
+        embedder: FashionEmbedder instance
+        image_files: Images to embed
+        store: Store receiving embeddings and metadata
+        base_dir: Base directory image paths are stored relative to
+        batch_size: Images per forward pass
+        desc: Progress bar label
+        position: Progress bar line (one per worker)
+        views: Crops pooled per image (see FashionEmbedder.embed_decoded)
+
+    Returns:
+        Number of images embedded
+    """
+    embedded = 0
+    for i in tqdm(range(0, len(image_files), batch_size), desc=desc, position=position):
+        embedded += _embed_batch(embedder, image_files[i:i + batch_size], store,
+                                 base_dir, views)
+
+    store.flush()
+    return embedded
+
+
+def _embed_batch(embedder, batch_files: Sequence[Path], store: EmbeddingStore,
+                 base_dir: Path, views: Sequence[str] = ('center',)) -> int:
+    """Decode, embed and append one batch (unreadable images are skipped)"""
+    batch_images = []
+    batch_metadata = []
+
+    for img_path in batch_files:
+        try:
+            # Reduced-size JPEG decode, preprocessed by the fused NumPy path
+            img = embedder.load_image(img_path)
+        except Exception as e:
+            print(f"Failed to load {img_path}: {e}")
+            continue
+
+        batch_images.append(img)
+        batch_metadata.append(catalog_metadata(img_path, base_dir))
+
+    if batch_images:
+        # Compute embeddings and persist them
+        embeddings = embedder.embed_decoded(batch_images, views)
+        store.append(embeddings, batch_metadata)
+
+    return len(batch_images)
+
+
+def embed_stream(embedder,
+                 image_files: Iterable[Path],
+                 store: EmbeddingStore,
+                 base_dir: Path,
+                 batch_size: int = 32,
+                 total: int = None,
+                 views: Sequence[str] = ('center',)) -> int:
+    """
+    Embed images from an iterator (e.g. a running download) into a store
+
+    Images are batched as they arrive, so embedding overlaps with whatever
+    produces them. Images already in the store are skipped.
+
+    Args:
+        embedder: FashionEmbedder instance
+        image_files: Iterable of image paths, consumed lazily
+        store: Store receiving embeddings and metadata
+        base_dir: Base directory image paths are stored relative to
+        batch_size: Images per forward pass
+        total: Expected number of images (progress bar only)
+        views: Crops pooled per image (see FashionEmbedder.embed_decoded)
+
+    Returns:
+        Number of images embedded
+    """
+    done = store.processed_keys()
+    embedded = 0
+    batch = []
+
+    for img_path in tqdm(image_files, total=total, desc="Fetching + embedding"):
+        if catalog_metadata(img_path, base_dir)['image_path'] in done:
+            continue
+        batch.append(img_path)
+        if len(batch) >= batch_size:
+            embedded += _embed_batch(embedder, batch, store, base_dir, views)
+            batch = []
+
+    if batch:
+        embedded += _embed_batch(embedder, batch, store, base_dir, views)
+
+    store.flush()
+    return embedded
+
+
+def split_cores(num_workers: int) -> List[List[int]]:
+    """
+    Partition the CPU cores available to this process between workers
+
+    Args:
+        num_workers: Number of worker processes (capped at the core count)
+
+    Returns:
+        List of core ID groups, one per worker
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+
+    num_workers = max(1, min(num_workers, len(cores)))
+    return [group.tolist() for group in np.array_split(cores, num_workers)]
+
+
+def _embed_worker(shard_number: int,
+                  image_files: List[Path],
+                  store_root: str,
+                  base_dir: Path,
+                  cores: List[int],
+                  batch_size: int,
+                  views: Sequence[str],
+                  embedder_kwargs: dict):
+    """Worker process: pin to its cores, load an embedder, fill one shard"""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    torch.set_num_threads(len(cores))
+    torch.set_num_interop_threads(1)
+
+    from .embedder import FashionEmbedder
+    embedder = FashionEmbedder(**embedder_kwargs)
+
+    store = ShardedEmbeddingStore(store_root).shard(shard_number)
+    embed_to_store(embedder, image_files, store, base_dir, batch_size,
+                   desc=f"Worker {shard_number}", position=shard_number, views=views)
+
+
+def embed_parallel(image_files: Sequence[Path],
+                   store: ShardedEmbeddingStore,
+                   base_dir: Path,
+                   num_workers: int,
+                   batch_size: int = 32,
+                   views: Sequence[str] = ('center',),
+                   **embedder_kwargs) -> int:
+    """
+    Embed images with N worker processes, each owning a slice of the cores
+
+    The image list is split into contiguous shards; worker k loads its own
+    FashionEmbedder with torch threads limited to its cores and appends to
+    store shard k. Reading the sharded store afterwards merges them into a
+    single stream for the index builder.
+
+    Args:
+        image_files: Images to embed
+        store: Sharded store receiving the embeddings
+        base_dir: Base directory image paths are stored relative to
+        num_workers: Number of worker processes
+        batch_size: Images per forward pass in each worker
+        views: Crops pooled per image (see FashionEmbedder.embed_decoded)
+        **embedder_kwargs: Passed to FashionEmbedder (model_name, pretrained)
+
+    Returns:
+        Number of rows in the store after all workers finish
+    """
+    core_groups = split_cores(num_workers)
+    shards = np.array_split(np.arange(len(image_files)), len(core_groups))
+
+    print(f"🧵 Embedding {len(image_files):,} images with {len(core_groups)} workers "
+          f"({', '.join(str(len(g)) for g in core_groups)} cores each)")
+
+    # Spawn (not fork) so every worker gets a clean torch/OpenMP runtime
+    ctx = mp.get_context('spawn')
+    workers = []
+    for number, (cores, rows) in enumerate(zip(core_groups, shards)):
+        worker = ctx.Process(
+            target=_embed_worker,
+            args=(number, [image_files[i] for i in rows], str(store.root),
+                  base_dir, cores, batch_size, tuple(views), embedder_kwargs)
+        )
+        worker.start()
+        workers.append(worker)
+
+    for worker in workers:
+        worker.join()
+
+    failed = [w for w in workers if w.exitcode != 0]
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} embedding worker(s) failed; rerun to resume"
+        )
+
+    return len(store)
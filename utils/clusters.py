@@ -0,0 +1,158 @@
+"""
+Catalog clustering for browsing by style
+Offline k-means over the indexed vectors, stored as compact arrays
+"""
+
+import os
+import numpy as np
+from pathlib import Path
+
+import faiss
+
+from .search import _reservoir_update
+
+
+class CatalogClusters:
+    """
+    Style clusters of one index version
+
+    Arrays (all aligned with index positions or cluster IDs):
+        centroids        float32 (k, D) L2-normalized cluster centers
+        assignments      int32 (N,) cluster of each item
+        similarity       float16 (N,) cosine similarity of each item to its centroid
+        order            int32 (N,) items grouped by cluster, most typical first
+        offsets          int64 (k + 1,) cluster c owns order[offsets[c]:offsets[c + 1]]
+    """
+
+    def __init__(self, centroids, assignments, similarity, order, offsets,
+                 version=None, ntotal=None):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.similarity = similarity
+        self.order = order
+        self.offsets = offsets
+        self.version = version
+        self.ntotal = len(assignments) if ntotal is None else ntotal
+
+    def __len__(self) -> int:
+        return len(self.centroids)
+
+    def sizes(self) -> np.ndarray:
+        """Number of items per cluster"""
+        return np.diff(self.offsets)
+
+    def members(self, cluster_id: int, start: int = 0, stop: int = None) -> np.ndarray:
+        """Index positions of a cluster's items (most typical first), sliced"""
+        lo, hi = self.offsets[cluster_id], self.offsets[cluster_id + 1]
+        stop = hi - lo if stop is None else stop
+        return self.order[lo + start:lo + min(stop, hi - lo)]
+
+    def without(self, live: np.ndarray) -> 'CatalogClusters':
+        """Same clusters with deleted items left out of order/offsets"""
+        order = self.order[live[self.order]]
+        offsets = np.zeros(len(self.offsets), dtype='int64')
+        np.cumsum(np.bincount(self.assignments[order], minlength=len(self)), out=offsets[1:])
+        return CatalogClusters(self.centroids, self.assignments, self.similarity,
+                               order, offsets, self.version, self.ntotal)
+
+    def save(self, path: str):
+        """Write all arrays to one .npz (atomically replaced)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp.npz')
+        np.savez(tmp,
+                 centroids=self.centroids,
+                 assignments=self.assignments,
+                 similarity=self.similarity,
+                 order=self.order,
+                 offsets=self.offsets,
+                 version=np.int64(-1 if self.version is None else self.version),
+                 ntotal=np.int64(self.ntotal))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'CatalogClusters':
+        """Read clusters written by save()"""
+        with np.load(path) as data:
+            version = int(data['version'])
+            return cls(data['centroids'], data['assignments'], data['similarity'],
+                       data['order'], data['offsets'],
+                       version=None if version < 0 else version,
+                       ntotal=int(data['ntotal']))
+
+
+def build_clusters(engine,
+                   n_clusters: int = None,
+                   n_iter: int = 20,
+                   train_size: int = None,
+                   chunk_size: int = 65536,
+                   seed: int = 0,
+                   save_path: str = "embeddings/clusters.npz") -> CatalogClusters:
+    """
+    Cluster the catalog with spherical k-means over the indexed vectors
+
+    Vectors are streamed from the engine's current snapshot (side array
+    or index reconstruction) in chunks, so no re-embedding is needed and
+    only the training sample is held in memory. FAISS runs training and
+    assignment multi-threaded (OpenMP).
+
+    Args:
+        engine: Loaded FashionSearchEngine
+        n_clusters: Number of styles (default: ~sqrt(N), at most 200)
+        n_iter: k-means iterations
+        train_size: Training sample size (default: 256 points per cluster)
+        chunk_size: Vectors assigned per batch
+        seed: Random seed for sampling and training
+        save_path: Where to write the clusters (None = don't save)
+
+    Returns:
+        Built CatalogClusters
+    """
+    snapshot = engine._ensure_loaded()
+    ntotal, dimension = snapshot.index.ntotal, snapshot.index.d
+    n_clusters = n_clusters or max(1, min(200, int(np.sqrt(ntotal))))
+    n_clusters = min(n_clusters, ntotal)
+    train_size = min(train_size or 256 * n_clusters, ntotal)
+
+    def chunks():
+        for start in range(0, ntotal, chunk_size):
+            positions = np.arange(start, min(start + chunk_size, ntotal))
+            yield engine._vectors_of(snapshot, positions)
+
+    # Pass 1: training sample
+    rng = np.random.default_rng(seed)
+    sample = np.empty((train_size, dimension), dtype='float32')
+    seen = 0
+    for chunk in chunks():
+        seen = _reservoir_update(sample, seen, chunk, rng)
+
+    print(f"🎨 Clustering {ntotal:,} items into {n_clusters} styles "
+          f"(trained on {len(sample):,})...")
+    kmeans = faiss.Kmeans(dimension, n_clusters, niter=n_iter, spherical=True,
+                          seed=seed, max_points_per_centroid=256)
+    kmeans.train(sample)
+    del sample
+
+    # Pass 2: assign every item to its nearest centroid
+    centroid_index = faiss.IndexFlatIP(dimension)
+    centroid_index.add(kmeans.centroids)
+    assignments = np.empty(ntotal, dtype='int32')
+    similarity = np.empty(ntotal, dtype='float16')
+    offset = 0
+    for chunk in chunks():
+        sims, labels = centroid_index.search(np.ascontiguousarray(chunk), 1)
+        assignments[offset:offset + len(chunk)] = labels[:, 0]
+        similarity[offset:offset + len(chunk)] = sims[:, 0]
+        offset += len(chunk)
+
+    # Group by cluster, most typical (closest to centroid) first
+    order = np.lexsort((-similarity.astype('float32'), assignments)).astype('int32')
+    offsets = np.zeros(n_clusters + 1, dtype='int64')
+    np.cumsum(np.bincount(assignments, minlength=n_clusters), out=offsets[1:])
+
+    clusters = CatalogClusters(kmeans.centroids, assignments, similarity,
+                               order, offsets, snapshot.version, ntotal)
+    if save_path is not None:
+        clusters.save(save_path)
+        print(f"✓ Clusters saved to {save_path}")
+    return clusters
@@ -0,0 +1,120 @@
+"""
+Fast image decode and model-input preprocessing
+JPEG DCT-scaled decoding plus a fused NumPy resize/crop/normalize for CLIP
+"""
+
+import cv2
+import numpy as np
+from PIL import Image
+from typing import Sequence
+
+# Source channel order -> positions of R, G, B in the last axis
+CHANNEL_ORDERS = {
+    'RGB': (0, 1, 2),
+    'RGBA': (0, 1, 2),
+    'BGR': (2, 1, 0),
+    'BGRA': (2, 1, 0),
+}
+
+# Views for multi-crop indexing: square crops along the long side, the whole
+# image padded to a square, and a mirrored center crop
+VIEWS = ('center', 'start', 'end', 'pad', 'flip')
+
+
+def decode_image(source, target_size: int = 224) -> np.ndarray:
+    """
+    Decode an image file directly near the model input size
+
+    For JPEGs, PIL's draft mode lets libjpeg scale the DCT by 1/2, 1/4 or
+    1/8 while decoding, keeping both sides >= target_size, so a 2000px
+    photo never gets decoded at full resolution. Other formats decode
+    normally.
+
+    Args:
+        source: File path or file-like object
+        target_size: Smallest side needed by the model preprocessing
+
+    Returns:
+        RGB uint8 array (H, W, 3)
+    """
+    with Image.open(source) as img:
+        img.draft('RGB', (target_size, target_size))
+        return np.asarray(img.convert('RGB'))
+
+
+def to_model_input(image: np.ndarray,
+                   size: int,
+                   mean: Sequence[float],
+                   std: Sequence[float],
+                   channels: str = 'RGB',
+                   out: np.ndarray = None,
+                   view: str = 'center') -> np.ndarray:
+    """
+    Fused CLIP preprocessing: center crop, resize, channel reorder, normalize
+
+    Equivalent to Resize(shortest side) + CenterCrop + ToTensor + Normalize,
+    but crops the centered square in source coordinates first so only the
+    pixels that survive are resized, and writes the normalized CHW result
+    straight into `out` without intermediate PIL images or tensors.
+
+    Args:
+        image: uint8 array (H, W, C) in the given channel order, or (H, W) gray
+        size: Output side length (e.g. 224)
+        mean: Per-channel RGB mean
+        std: Per-channel RGB std
+        channels: Channel order of image ('RGB', 'BGR', 'RGBA', 'BGRA')
+        out: Optional float32 buffer (3, size, size) to write into
+        view: One of VIEWS ('center' matches the CLIP preprocessing)
+
+    Returns:
+        float32 array (3, size, size)
+    """
+    if image.ndim == 2:
+        image = image[:, :, None]
+        order = (0, 0, 0)
+    else:
+        order = CHANNEL_ORDERS[channels]
+
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view '{view}'. Choose from: {', '.join(VIEWS)}")
+
+    h, w = image.shape[:2]
+    side = min(h, w)
+
+    if out is None:
+        out = np.empty((3, size, size), dtype='float32')
+
+    if view == 'pad':
+        # Whole image, long side = size, centered on a mean-colored square
+        # (mean color normalizes to 0)
+        scale_hw = size / max(h, w)
+        new_w, new_h = max(1, round(w * scale_hw)), max(1, round(h * scale_hw))
+        source = image
+        top, left = (size - new_h) // 2, (size - new_w) // 2
+        out[:] = 0.0
+        target = out[:, top:top + new_h, left:left + new_w]
+    else:
+        # Square crop (a view, no copy): centered, or at either end of the long side
+        position = {'start': 0.0, 'end': 1.0}.get(view, 0.5)
+        top, left = int((h - side) * position), int((w - side) * position)
+        source = image[top:top + side, left:left + side]
+        new_w = new_h = size
+        target = out
+
+    # Area interpolation anti-aliases when shrinking, cubic when enlarging
+    interpolation = cv2.INTER_AREA if max(source.shape[:2]) > size else cv2.INTER_CUBIC
+    resized = cv2.resize(source, (new_w, new_h), interpolation=interpolation)
+    if resized.ndim == 2:
+        resized = resized[:, :, None]
+    if view == 'flip':
+        resized = resized[:, ::-1]
+
+    # (x / 255 - mean) / std == x * scale + shift, one pass per channel
+    scale = 1.0 / (255.0 * np.asarray(std, dtype='float32'))
+    shift = -np.asarray(mean, dtype='float32') / np.asarray(std, dtype='float32')
+    for c, src in enumerate(order):
+        np.multiply(resized[:, :, src], scale[c], out=target[c], casting='unsafe')
+        target[c] += shift[c]
+
+    return out
+
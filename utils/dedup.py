@@ -0,0 +1,151 @@
+"""
+Near-duplicate detection for catalog embeddings
+Clusters near-identical shots (same product, different crops) before indexing
+"""
+
+import faiss
+import numpy as np
+from typing import Iterable, List, Tuple
+
+
+def _blocks(chunks: Iterable[np.ndarray], batch_size: int):
+    """Split a stream of embedding chunks into normalized float32 blocks"""
+    for chunk in chunks:
+        for start in range(0, len(chunk), batch_size):
+            block = np.array(chunk[start:start + batch_size], dtype='float32')
+            faiss.normalize_L2(block)
+            yield block
+
+
+def exact_index(chunks: Iterable[np.ndarray], dimension: int,
+                batch_size: int = 4096) -> faiss.IndexFlatIP:
+    """
+    Exact inner-product index over full-dimension catalog embeddings
+
+    Serving indexes may be PCA-reduced or compressed, which distorts
+    cosine similarities; thresholds are only meaningful on this one.
+
+    Args:
+        chunks: Catalog embeddings in index order, as an iterable of arrays
+        dimension: Embedding dimension
+        batch_size: Rows normalized and added at a time
+
+    Returns:
+        IndexFlatIP over the normalized embeddings
+    """
+    index = faiss.IndexFlatIP(dimension)
+    for block in _blocks(chunks, batch_size):
+        index.add(block)
+    return index
+
+
+def find_duplicate_clusters(index: faiss.Index,
+                            chunks: Iterable[np.ndarray],
+                            threshold: float = 0.95,
+                            batch_size: int = 4096) -> np.ndarray:
+    """
+    Group near-duplicate catalog items into clusters
+
+    Runs a blocked k-NN self-join against an exact catalog index: the
+    stored vectors are streamed back in blocks, range-searched against the
+    index, and any pair with cosine similarity >= threshold is merged with
+    union-find (transitively). Approximate indexes (IVF, PQ, PCA, binary)
+    miss or invent pairs; pass exact_index() for those catalogs.
+
+    Args:
+        index: Exact inner-product FAISS index over the catalog
+        chunks: Catalog embeddings in index order, as an iterable of arrays
+        threshold: Cosine similarity above which two items are duplicates
+        batch_size: Number of queries per range search block
+
+    Returns:
+        Array (N,) with the cluster representative (lowest position) per item
+    """
+    n = index.ntotal
+    parent = np.arange(n)
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:  # Path compression
+            parent[i], i = root, parent[i]
+        return root
+
+    start = 0
+    for block in _blocks(chunks, batch_size):
+        lims, _, neighbors = index.range_search(block, threshold)
+
+        # Expand CSR output into (row, neighbor) pairs, keep each pair once
+        counts = np.diff(lims).astype(np.int64)
+        rows = np.repeat(np.arange(start, start + len(block)), counts)
+        mask = neighbors > rows
+        for a, b in zip(rows[mask], neighbors[mask]):
+            root_a, root_b = find(int(a)), find(int(b))
+            if root_a != root_b:
+                # Lowest index wins so the representative is deterministic
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        start += len(block)
+
+    return np.array([find(i) for i in range(n)])
+
+
+def dedup_catalog(index: faiss.Index,
+                  chunks: Iterable[np.ndarray],
+                  metadata: List[dict],
+                  threshold: float = 0.95,
+                  keep_duplicates: bool = False,
+                  batch_size: int = 4096) -> Tuple[np.ndarray, List[dict]]:
+    """
+    Cluster near-duplicates and record the cluster in metadata
+
+    Every item gets 'cluster_id' and 'cluster_size'. By default only the
+    representative of each cluster is kept and it lists the dropped shots
+    under 'duplicates'. With keep_duplicates=True all items are kept so
+    duplicates can be collapsed at query time instead.
+
+    Args:
+        index: Inner-product FAISS index over the catalog
+        chunks: Catalog embeddings in index order, as an iterable of arrays
+        metadata: List of metadata dicts aligned with the index
+        threshold: Cosine similarity above which two items are duplicates
+        keep_duplicates: Keep every item instead of only representatives
+        batch_size: Number of queries per range search block
+
+    Returns:
+        Tuple of (kept positions, metadata of kept items); rebuild the index
+        from the kept positions when fewer items remain
+    """
+    print(f"🧹 Detecting near-duplicates (similarity >= {threshold})...")
+    roots = find_duplicate_clusters(index, chunks, threshold, batch_size)
+
+    # Renumber representatives into compact cluster IDs
+    representatives, cluster_ids, sizes = np.unique(
+        roots, return_inverse=True, return_counts=True
+    )
+
+    members = {}
+    for i, cid in enumerate(cluster_ids):
+        members.setdefault(int(cid), []).append(i)
+
+    new_metadata = []
+    for i, meta in enumerate(metadata):
+        cid = int(cluster_ids[i])
+        meta = dict(meta)
+        meta['cluster_id'] = cid
+        meta['cluster_size'] = int(sizes[cid])
+        if i == representatives[cid] and sizes[cid] > 1:
+            meta['duplicates'] = [metadata[j].get('image_path')
+                                  for j in members[cid] if j != i]
+        new_metadata.append(meta)
+
+    n_dupes = len(metadata) - len(representatives)
+    print(f"✓ Found {len(representatives):,} unique items | "
+          f"{n_dupes:,} near-duplicates")
+
+    if keep_duplicates:
+        return np.arange(len(metadata)), new_metadata
+
+    new_metadata = [new_metadata[i] for i in representatives]
+    return representatives, new_metadata
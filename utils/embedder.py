@@ -14,12 +14,66 @@ if sys.platform == 'win32':
     except AttributeError:
         pass
 
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import warnings
 import torch
 import open_clip
 from PIL import Image
 import numpy as np
-from typing import Union
-import cv2
+from pathlib import Path
+from typing import List, Sequence, Union
+
+from .decode import decode_image, to_model_input
+
+
+def model_fingerprint(model_name: str, pretrained: str) -> dict:
+    """
+    Identity of an embedding space: architecture, weights and preprocessing
+
+    Read from open_clip's configs, so it is known without loading weights.
+    Indexes store it and FashionSearchEngine refuses queries from an
+    embedder with a different 'id'.
+
+    Args:
+        model_name: open_clip architecture
+        pretrained: open_clip weights tag ('' = random init)
+
+    Returns:
+        Dict of the identifying settings plus a short 'id' hash
+    """
+    config = open_clip.get_model_config(model_name) or {}
+    weights = open_clip.get_pretrained_cfg(model_name, pretrained) if pretrained else {}
+    image_size = config.get('vision_cfg', {}).get('image_size', 224)
+
+    spec = {
+        'model_name': model_name,
+        'pretrained': pretrained or None,
+        'embedding_dim': config.get('embed_dim'),
+        'image_size': image_size[0] if isinstance(image_size, (tuple, list)) else image_size,
+        'image_mean': [round(float(x), 6) for x in weights.get('mean') or open_clip.OPENAI_DATASET_MEAN],
+        'image_std': [round(float(x), 6) for x in weights.get('std') or open_clip.OPENAI_DATASET_STD],
+    }
+    spec['id'] = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+    return spec
+
+
+class _CachedCLIP(torch.nn.Module):
+    """
+    Stand-in for the open_clip model when loaded from the compiled cache
+    (only the image tower is kept, as a TorchScript module)
+    """
+
+    def __init__(self, visual: torch.jit.ScriptModule):
+        super().__init__()
+        self.visual = visual
+
+    def encode_image(self, image: torch.Tensor) -> torch.Tensor:
+        return self.visual(image)
 
 
 class FashionEmbedder:
@@ -28,87 +82,312 @@ class FashionEmbedder:
     Optimized for fashion similarity search with <50ms inference time
     """
 
-    def __init__(self, model_name: str = "ViT-B-32", pretrained: str = "openai"):
+    def __init__(self, model_name: str = "ViT-B-32", pretrained: str = "openai",
+                 cache_dir: str = "embeddings/model_cache",
+                 warmup_batch_sizes: Sequence[int] = (1,)):
         """
         Initialize CLIP model for fashion embeddings
 
         Args:
             model_name: CLIP architecture (ViT-B-32 for best speed/quality tradeoff)
             pretrained: Pretrained weights source
+            cache_dir: Where the traced image encoder is cached; later starts
+                load it directly instead of building the model through
+                open_clip (None disables the cache)
+            warmup_batch_sizes: Batch sizes run once with dummy images so the
+                first real query doesn't pay for allocation/kernel selection
+                (empty to skip)
         """
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"🚀 Loading CLIP {model_name} on {self.device}...")
+        self.model_name = model_name
+        self.pretrained = pretrained
+        start = time.perf_counter()
+
+        cache = None
+        if cache_dir is not None:
+            tag = f"{model_name}-{pretrained or 'random'}-{self.device}".replace('/', '_')
+            cache = Path(cache_dir) / tag
+
+        if cache is not None and self._load_cached(cache):
+            print(f"🚀 Loaded cached CLIP {model_name} encoder on {self.device}")
+        else:
+            print(f"🚀 Loading CLIP {model_name} on {self.device}...")
+
+            # Load CLIP model and preprocessing
+            self.model, _, self.preprocess = open_clip.create_model_and_transforms(
+                model_name,
+                pretrained=pretrained
+            )
+            self.model = self.model.to(self.device)
+            self.model.eval()
+
+            # Get embedding dimension
+            self.embedding_dim = self.model.visual.output_dim
+
+            # Preprocessing parameters for the fused NumPy input path
+            image_size = self.model.visual.image_size
+            self.image_size = image_size[0] if isinstance(image_size, (tuple, list)) else image_size
+            self.image_mean = getattr(self.model.visual, 'image_mean', None) or open_clip.OPENAI_DATASET_MEAN
+            self.image_std = getattr(self.model.visual, 'image_std', None) or open_clip.OPENAI_DATASET_STD
+
+            if cache is not None:
+                self._save_cached(cache)
+
+        self._input_buffer = None
+        self._buffer_lock = threading.Lock()
+        print(f"✓ Model loaded in {time.perf_counter() - start:.1f}s | "
+              f"Embedding dim: {self.embedding_dim}")
+
+        if warmup_batch_sizes:
+            self.warmup(warmup_batch_sizes)
 
-        # Load CLIP model and preprocessing
-        self.model, _, self.preprocess = open_clip.create_model_and_transforms(
-            model_name,
-            pretrained=pretrained
+    def fingerprint(self) -> dict:
+        """Embedding-space fingerprint of this model (see model_fingerprint)"""
+        return model_fingerprint(self.model_name, self.pretrained)
+
+    def _cache_info(self) -> dict:
+        """Versions a cached encoder is only valid for"""
+        return {'torch': torch.__version__, 'open_clip': open_clip.__version__}
+
+    def _load_cached(self, cache: Path) -> bool:
+        """Load the traced encoder and its preprocessing settings, if valid"""
+        model_path, meta_path = cache.with_suffix('.pt'), cache.with_suffix('.json')
+        if not (model_path.exists() and meta_path.exists()):
+            return False
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('versions') != self._cache_info():
+            return False
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', FutureWarning)
+                visual = torch.jit.load(str(model_path), map_location=self.device)
+        except Exception as e:
+            print(f"⚠️  Ignoring model cache {model_path}: {e}")
+            return False
+
+        self.model = _CachedCLIP(visual).eval()
+        self.embedding_dim = meta['embedding_dim']
+        self.image_size = meta['image_size']
+        self.image_mean = meta['image_mean']
+        self.image_std = meta['image_std']
+        self.preprocess = open_clip.image_transform(
+            self.image_size, is_train=False, mean=self.image_mean, std=self.image_std
         )
-        self.model = self.model.to(self.device)
-        self.model.eval()
+        return True
 
-        # Get embedding dimension
-        self.embedding_dim = self.model.visual.output_dim
-        print(f"✓ Model loaded | Embedding dim: {self.embedding_dim}")
+    def _save_cached(self, cache: Path):
+        """Trace the image encoder and write it (plus settings) to the cache"""
+        # Unique per writer: parallel workers tracing the same model at once
+        # each replace the cache with a complete file of their own
+        suffix = f".{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+        tmp = None
+        try:
+            example = torch.zeros((1, 3, self.image_size, self.image_size), device=self.device)
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_name(cache.name + '.pt' + suffix)
+            with torch.no_grad(), warnings.catch_warnings():
+                warnings.simplefilter('ignore')  # TracerWarnings, jit deprecation
+                visual = torch.jit.trace(self.model.visual, example)
+                torch.jit.save(visual, str(tmp))
+            os.replace(tmp, cache.with_suffix('.pt'))
 
-    @torch.no_grad()
-    def embed_image(self, image: Union[Image.Image, np.ndarray]) -> np.ndarray:
+            # Settings last: the cache counts as present only once both exist
+            tmp = cache.with_name(cache.name + '.json' + suffix)
+            with open(tmp, 'w') as f:
+                json.dump({
+                    'versions': self._cache_info(),
+                    'embedding_dim': self.embedding_dim,
+                    'image_size': self.image_size,
+                    'image_mean': list(self.image_mean),
+                    'image_std': list(self.image_std),
+                }, f)
+            os.replace(tmp, cache.with_suffix('.json'))
+        except Exception as e:
+            # The cache only speeds up later starts; never fail loading over it
+            print(f"⚠️  Could not cache traced model: {e}")
+            if tmp is not None and tmp.exists():
+                tmp.unlink()
+
+    def warmup(self, batch_sizes: Sequence[int] = (1,)):
         """
-        Generate 512-dim embedding from image
+        Run dummy batches so first real queries hit a warm model
+
+        Also sizes the reusable input buffer for the largest batch.
 
         Args:
-            image: PIL Image or numpy array (RGB)
+            batch_sizes: Batch sizes to run once each
+        """
+        start = time.perf_counter()
+        dummy = np.zeros((self.image_size, self.image_size, 3), dtype=np.uint8)
+        for n in sorted(set(batch_sizes)):
+            self._embed_arrays([dummy] * n, ['RGB'] * n)
+        print(f"✓ Warm-up done in {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"| batch sizes {sorted(set(batch_sizes))}")
+
+    def load_image(self, source: Union[str, Path]) -> np.ndarray:
+        """
+        Decode an image file at reduced size for embedding
+
+        Args:
+            source: File path or file-like object
 
         Returns:
-            L2-normalized embedding vector (512,)
+            RGB uint8 array, decoded near the model input size
+        """
+        return decode_image(source, self.image_size)
+
+    def _as_array(self, image: Union[Image.Image, np.ndarray]):
+        """
+        View an input image as a uint8 array plus its channel order (no copy
+        for ndarrays; the fused preprocess handles reordering)
+        """
+        if isinstance(image, Image.Image):
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            return np.asarray(image), 'RGB'
+
+        if image.ndim == 3 and image.shape[2] == 4:  # RGBA
+            return image, 'RGBA'
+        if image.ndim == 3:  # OpenCV frames are BGR
+            return image, 'BGR'
+        return image, 'RGB'  # Grayscale
+
+    def _input_batch(self, n: int) -> torch.Tensor:
+        """
+        Reusable input buffer (n, 3, S, S), pinned when running on CUDA
+
+        Grows to the next power of two when a larger batch arrives so camera
+        and video frames never allocate a fresh input tensor per call.
         """
-        # Convert numpy to PIL if needed
-        if isinstance(image, np.ndarray):
-            if image.shape[2] == 4:  # RGBA
-                image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
-            elif len(image.shape) == 3 and image.shape[2] == 3:
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image = Image.fromarray(image)
+        if self._input_buffer is None or len(self._input_buffer) < n:
+            capacity = 1 << max(0, n - 1).bit_length()
+            self._input_buffer = torch.empty(
+                (capacity, 3, self.image_size, self.image_size),
+                dtype=torch.float32,
+                pin_memory=self.device == "cuda"
+            )
+        return self._input_buffer[:n]
 
-        # Preprocess and forward pass
-        image_tensor = self.preprocess(image).unsqueeze(0).to(self.device)
-        embedding = self.model.encode_image(image_tensor)
+    @torch.no_grad()
+    def _embed_arrays(self, arrays: List[np.ndarray], channels: List[str],
+                      views: Sequence[str] = ('center',)) -> np.ndarray:
+        """
+        Fill the shared input buffer via the fused preprocess and embed
+
+        With several views, every image contributes one input per view to
+        the same forward pass and its normalized view embeddings are
+        mean-pooled into one vector.
+        """
+        with self._buffer_lock:
+            batch = self._input_batch(len(arrays) * len(views))
+            buffer = batch.numpy()  # Shares memory with the tensor
+            for i, (img, order) in enumerate(zip(arrays, channels)):
+                for j, crop in enumerate(views):
+                    to_model_input(img, self.image_size, self.image_mean,
+                                   self.image_std, channels=order,
+                                   out=buffer[i * len(views) + j], view=crop)
+
+            inputs = batch.to(self.device, non_blocking=True)
+            if inputs.is_cuda:
+                # The async copy still reads the pinned buffer; finish it
+                # before the next caller refills the buffer
+                torch.cuda.current_stream().synchronize()
+            embeddings = self.model.encode_image(inputs)
 
         # L2 normalize for cosine similarity
-        embedding = embedding / embedding.norm(dim=-1, keepdim=True)
+        embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
 
-        return embedding.cpu().numpy().flatten()
+        if len(views) > 1:
+            embeddings = embeddings.view(len(arrays), len(views), -1).mean(dim=1)
+            embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+
+        return embeddings.cpu().numpy()
+
+    def embed_decoded(self, images: List[np.ndarray],
+                      views: Sequence[str] = ('center',)) -> np.ndarray:
+        """
+        Batch embed RGB uint8 arrays (e.g. from load_image) via fused preprocessing
+
+        Args:
+            images: List of RGB uint8 arrays (H, W, 3)
+            views: Crops pooled per image (see utils.decode.VIEWS); more
+                than 'center' recovers content a center crop cuts off at
+                odd aspect ratios, at the cost of a larger forward pass
+
+        Returns:
+            Array of embeddings (N, 512)
+        """
+        return self._embed_arrays(images, ['RGB'] * len(images), views)
+
+    def to_input(self, image: Union[Image.Image, np.ndarray, str, Path]) -> np.ndarray:
+        """
+        Decode (for files) and preprocess one image into a model input
+
+        The CPU half of embed_image, for pipelines that run it on other
+        threads than the forward pass (see embed_inputs).
+
+        Args:
+            image: PIL Image, numpy array (BGR, RGBA or gray) or image file path
+
+        Returns:
+            float32 array (3, S, S)
+        """
+        if isinstance(image, (str, Path)):
+            array, order = self.load_image(image), 'RGB'
+        else:
+            array, order = self._as_array(image)
+        return to_model_input(array, self.image_size, self.image_mean,
+                              self.image_std, channels=order)
 
     @torch.no_grad()
+    def embed_inputs(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Embed already preprocessed inputs (the model half of embed_image)
+
+        Args:
+            inputs: float32 array (N, 3, S, S) from to_input()
+
+        Returns:
+            Array of L2-normalized embeddings (N, 512)
+        """
+        batch = torch.from_numpy(np.ascontiguousarray(inputs, dtype='float32'))
+        # Blocking copy: the caller owns (and may reuse) the input memory
+        embeddings = self.model.encode_image(batch.to(self.device))
+        embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+        return embeddings.cpu().numpy()
+
+    def embed_image(self, image: Union[Image.Image, np.ndarray, str, Path]) -> np.ndarray:
+        """
+        Generate 512-dim embedding from image
+
+        Args:
+            image: PIL Image, numpy array (BGR, RGBA or gray) or image file path
+
+        Returns:
+            L2-normalized embedding vector (512,)
+        """
+        # Files take the reduced-size decode path
+        if isinstance(image, (str, Path)):
+            return self.embed_decoded([self.load_image(image)])[0]
+
+        array, order = self._as_array(image)
+        return self._embed_arrays([array], [order])[0]
+
     def embed_batch(self, images: list) -> np.ndarray:
         """
         Batch process multiple images for efficiency
 
         Args:
-            images: List of PIL Images or numpy arrays
+            images: List of PIL Images or numpy arrays (BGR, RGBA or gray)
 
         Returns:
             Array of embeddings (N, 512)
         """
-        # Preprocess all images
-        processed = []
-        for img in images:
-            if isinstance(img, np.ndarray):
-                if img.shape[2] == 4:
-                    img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
-                elif len(img.shape) == 3 and img.shape[2] == 3:
-                    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(img)
-            processed.append(self.preprocess(img))
-
-        # Stack and process batch
-        batch = torch.stack(processed).to(self.device)
-        embeddings = self.model.encode_image(batch)
-
-        # L2 normalize
-        embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
-
-        return embeddings.cpu().numpy()
+        arrays, channels = zip(*(self._as_array(img) for img in images))
+        return self._embed_arrays(list(arrays), list(channels))
 
 
 def create_embedder():
@@ -0,0 +1,207 @@
+"""
+Offline "similar items" export
+Blocked batch k-NN over the whole catalog, written as compact columnar parts
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from .thumbnails import item_key
+
+
+def _duplicate_groups(snapshot) -> np.ndarray:
+    """
+    Near-duplicate group of every index position
+
+    Items tagged by dedup_catalog share their cluster's group (negative
+    IDs); every other item is its own group (its position).
+    """
+    groups = np.arange(snapshot.index.ntotal, dtype='int64')
+    for pos, meta in enumerate(snapshot.metadata or []):
+        cluster = meta.get('cluster_id')
+        if cluster is not None and pos < len(groups):
+            groups[pos] = -1 - cluster
+    return groups
+
+
+def _select_neighbors(positions: np.ndarray, similarities: np.ndarray,
+                      indices: np.ndarray, groups: np.ndarray, k: int,
+                      collapse_duplicates: bool, max_similarity: float):
+    """
+    Filter one block of raw hits down to k neighbors per item
+
+    Drops padding, the item itself and its near-duplicates (same group or
+    above max_similarity), and optionally keeps one hit per duplicate
+    group among the neighbors.
+
+    Returns:
+        (neighbors int32 (n, k), scores float16 (n, k)), -1 / 0 padded
+    """
+    valid = indices >= 0
+    hit_groups = np.where(valid, groups[np.where(valid, indices, 0)], 0)
+    keep = valid & (hit_groups != groups[positions][:, None])
+    if max_similarity is not None:
+        keep &= similarities < max_similarity
+
+    neighbors = np.full((len(positions), k), -1, dtype='int32')
+    scores = np.zeros((len(positions), k), dtype='float16')
+    for row in range(len(positions)):
+        columns = np.flatnonzero(keep[row])
+        if collapse_duplicates and len(columns):
+            # First (best) hit of each group, in rank order
+            _, first = np.unique(hit_groups[row, columns], return_index=True)
+            columns = columns[np.sort(first)]
+        columns = columns[:k]
+        neighbors[row, :len(columns)] = indices[row, columns]
+        scores[row, :len(columns)] = similarities[row, columns]
+    return neighbors, scores
+
+
+def export_similar(engine,
+                   output_dir: str = "embeddings/similar",
+                   k: int = 20,
+                   batch_size: int = 4096,
+                   items: Iterable = None,
+                   collapse_duplicates: bool = True,
+                   max_similarity: float = None,
+                   fetch_factor: int = None,
+                   resume: bool = True) -> dict:
+    """
+    Precompute the k most similar items of every catalog item
+
+    Query vectors are streamed from the engine's snapshot (side array or
+    index reconstruction) in blocks of batch_size and searched with one
+    multi-threaded FAISS call per block. Each block is written as its own
+    part (items, neighbors, scores arrays) and an item-ID column is written
+    once, so a rerun skips finished items and read_similar() joins it all
+    back into (item_id, neighbor_ids, scores).
+
+    Args:
+        engine: FashionSearchEngine (loaded on first use)
+        output_dir: Folder receiving ids.npy, part-*.npz and export.json
+        k: Neighbors per item
+        batch_size: Items per FAISS call
+        items: Item IDs or index positions to export (None = every item
+            not deleted)
+        collapse_duplicates: Keep one neighbor per near-duplicate cluster
+        max_similarity: Also treat neighbors at or above this cosine
+            similarity as duplicates (for catalogs built without dedup)
+        fetch_factor: Candidates fetched per neighbor when collapsing
+            (defaults to FashionSearchEngine.DEFAULT_FETCH_FACTOR)
+        resume: Skip items exported by an earlier run with the same
+            index version, deletes and settings (False = start over)
+
+    Returns:
+        Dict with 'exported', 'skipped', 'seconds' and 'items_per_s'
+    """
+    snapshot = engine._ensure_loaded()
+    ntotal = snapshot.index.ntotal
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    settings = {
+        'version': snapshot.version,
+        'model': (snapshot.model or {}).get('id'),
+        'ntotal': ntotal,
+        'tombstones': snapshot.tombstones_revision,
+        'k': k,
+        'collapse_duplicates': collapse_duplicates,
+        'max_similarity': max_similarity,
+    }
+    state_path = output_dir / "export.json"
+    previous = None
+    if state_path.exists():
+        with open(state_path) as f:
+            previous = json.load(f)
+
+    if not resume or previous != settings:
+        if previous is not None and resume:
+            print("↻ Index or settings changed since the last export, starting over")
+        for part in output_dir.glob("part-*.npz"):
+            part.unlink()
+        np.save(output_dir / "ids.npy",
+                np.array([item_key(meta) for meta in snapshot.metadata or []] or
+                         [str(pos) for pos in range(ntotal)]))
+        with open(state_path, 'w') as f:
+            json.dump(settings, f, indent=2)
+
+    # Items still to do
+    if items is None:
+        positions = snapshot.live_positions()
+    else:
+        positions = np.unique([snapshot.position_of(item) for item in items]).astype('int64')
+
+    parts = sorted(output_dir.glob("part-*.npz"))
+    done = np.zeros(ntotal, dtype=bool)
+    for part in parts:
+        with np.load(part) as data:
+            done[data['items']] = True
+    skipped = int(done[positions].sum())
+    positions = positions[~done[positions]]
+    if skipped:
+        print(f"↻ Resuming: {skipped:,} items already exported, {len(positions):,} to go")
+
+    groups = _duplicate_groups(snapshot)
+    fetch_k = k + 1
+    if collapse_duplicates or max_similarity is not None or (groups < 0).any():
+        fetch_k = (k + 1) * (fetch_factor or engine.DEFAULT_FETCH_FACTOR)
+    fetch_k = min(fetch_k, ntotal)
+
+    start = time.perf_counter()
+    next_part = int(parts[-1].stem.split('-')[1]) + 1 if parts else 0
+    with tqdm(total=len(positions), desc="Exporting similar items", unit="item") as pbar:
+        for offset in range(0, len(positions), batch_size):
+            block = positions[offset:offset + batch_size]
+            queries = engine._vectors_of(snapshot, block)
+            similarities, indices = engine._hits(snapshot, queries, fetch_k)
+            neighbors, scores = _select_neighbors(block, similarities, indices, groups, k,
+                                                  collapse_duplicates, max_similarity)
+
+            # Atomic part write: a crash never leaves a half-written part
+            part = output_dir / f"part-{next_part:05d}.npz"
+            tmp = output_dir / f"tmp-{next_part:05d}.npz"
+            np.savez(tmp, items=block.astype('int32'), neighbors=neighbors, scores=scores)
+            os.replace(tmp, part)
+            next_part += 1
+            pbar.update(len(block))
+
+    seconds = time.perf_counter() - start
+    rate = len(positions) / seconds if seconds > 0 else 0.0
+    print(f"✓ Exported {len(positions):,} items x {k} neighbors in {seconds:.1f}s "
+          f"({rate:,.0f} items/s) to {output_dir}")
+    return {'exported': len(positions), 'skipped': skipped,
+            'seconds': seconds, 'items_per_s': rate}
+
+
+def read_similar(output_dir: str = "embeddings/similar") -> pd.DataFrame:
+    """
+    Load an export as one row per item
+
+    Args:
+        output_dir: Folder written by export_similar
+
+    Returns:
+        DataFrame with 'item_id', 'neighbor_ids' (list of str) and
+        'scores' (list of float), in index order
+    """
+    output_dir = Path(output_dir)
+    ids = np.load(output_dir / "ids.npy")
+
+    rows = []
+    for part in sorted(output_dir.glob("part-*.npz")):
+        with np.load(part) as data:
+            for item, neighbors, scores in zip(data['items'], data['neighbors'], data['scores']):
+                found = neighbors >= 0
+                rows.append((int(item), str(ids[item]), ids[neighbors[found]].tolist(),
+                             scores[found].astype('float64').round(4).tolist()))
+
+    rows.sort()
+    return pd.DataFrame([row[1:] for row in rows],
+                        columns=['item_id', 'neighbor_ids', 'scores'])
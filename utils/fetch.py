@@ -0,0 +1,214 @@
+"""
+Bulk catalog image fetcher
+Concurrent, resumable downloads over pooled keep-alive sessions with retries
+"""
+
+import csv
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable, Iterator, List
+from urllib.parse import urlsplit
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# File extension per image Content-Type
+IMAGE_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+    'image/bmp': '.bmp',
+    'image/tiff': '.tiff',
+}
+IMAGE_EXTENSIONS = set(IMAGE_TYPES.values())
+_URL_EXTENSIONS = {'.jpeg': '.jpg', '.jpe': '.jpg', '.tif': '.tiff'}
+
+
+def list_images(folder: str) -> List[Path]:
+    """Catalog images of any IMAGE_EXTENSIONS type in a folder, sorted"""
+    return sorted(path for path in Path(folder).glob("*") if path.suffix in IMAGE_EXTENSIONS)
+
+
+def image_extension(content_type: str, url: str) -> str:
+    """
+    File extension for a downloaded image
+
+    Taken from the response Content-Type, else from the URL path, else .jpg.
+
+    Args:
+        content_type: Response Content-Type header (may be None)
+        url: Requested URL
+
+    Returns:
+        One of IMAGE_EXTENSIONS
+    """
+    mime = (content_type or '').split(';')[0].strip().lower()
+    if mime in IMAGE_TYPES:
+        return IMAGE_TYPES[mime]
+    suffix = Path(urlsplit(url).path).suffix.lower()
+    suffix = _URL_EXTENSIONS.get(suffix, suffix)
+    return suffix if suffix in IMAGE_EXTENSIONS else '.jpg'
+
+
+def read_url_manifest(path: str) -> List[dict]:
+    """
+    Read a catalog URL manifest
+
+    Accepts JSON Lines / JSON (objects with 'url' and optional 'id',
+    'category') or CSV with the same columns. Items without an 'id' are
+    named after their position.
+
+    Args:
+        path: Manifest file
+
+    Returns:
+        List of dicts with at least 'url' and 'id'
+    """
+    path = Path(path)
+    with open(path, newline='') as f:
+        if path.suffix == '.csv':
+            items = list(csv.DictReader(f))
+        elif path.suffix == '.json':
+            items = json.load(f)
+        else:
+            items = [json.loads(line) for line in f if line.strip()]
+
+    for i, item in enumerate(items):
+        item.setdefault('id', f"item_{i:06d}")
+    return items
+
+
+def make_session(pool_size: int = 1, retries: int = 3,
+                 backoff: float = 0.5) -> requests.Session:
+    """
+    HTTP session with keep-alive connection pooling and retry/backoff
+
+    Args:
+        pool_size: Connections kept open per host
+        retries: Retries per request (connect errors, 429 and 5xx)
+        backoff: Exponential backoff factor in seconds
+
+    Returns:
+        Configured requests.Session
+    """
+    retry = Retry(total=retries, backoff_factor=backoff,
+                  status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset({'GET'}))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _verify_image(data: bytes):
+    """Raise if data is not a decodable image"""
+    with Image.open(io.BytesIO(data)) as img:
+        img.verify()
+
+
+class CatalogFetcher:
+    """
+    Download catalog images concurrently into a folder
+
+    Each worker thread keeps its own pooled keep-alive session. Images are
+    verified in the worker and written atomically (<id>.<ext>.part then
+    renamed; the extension follows the Content-Type), so a rerun skips
+    every finished file and never sees a truncated one.
+    """
+
+    def __init__(self, images_dir: str = "images_catalog", workers: int = 16,
+                 retries: int = 3, backoff: float = 0.5, timeout: float = 10.0):
+        """
+        Args:
+            images_dir: Output folder (one <id>.<ext> per item)
+            workers: Concurrent downloads
+            retries: Retries per image (connect errors, 429 and 5xx)
+            backoff: Exponential backoff factor in seconds
+            timeout: Per-request timeout in seconds
+        """
+        self.images_dir = Path(images_dir)
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.failed: List[dict] = []
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        """This worker thread's session"""
+        if not hasattr(self._local, 'session'):
+            self._local.session = make_session(1, self.retries, self.backoff)
+        return self._local.session
+
+    def fetch_one(self, item: dict) -> Path:
+        """
+        Download and verify one image (runs in a worker thread)
+
+        Args:
+            item: Manifest entry with 'url' and 'id'
+
+        Returns:
+            Path of the verified image
+        """
+        response = self._session().get(item['url'], timeout=self.timeout)
+        response.raise_for_status()
+
+        data = response.content
+        _verify_image(data)
+
+        extension = image_extension(response.headers.get('Content-Type'), item['url'])
+        dest = self.images_dir / f"{item['id']}{extension}"
+        tmp = self.images_dir / f"{item['id']}{extension}.part"
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+        return dest
+
+    def fetch(self, items: Iterable[dict]) -> Iterator[Path]:
+        """
+        Download all missing images, yielding each verified image as it lands
+
+        Already downloaded images are yielded first, so a consumer (e.g.
+        the embedding loop) can start immediately and sees every image
+        exactly once. Failures are collected in self.failed.
+
+        Args:
+            items: Manifest entries with 'url' and 'id'
+
+        Yields:
+            Paths of verified images
+        """
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        self.failed = []
+
+        # Finished downloads by item ID, whatever their extension
+        done = {path.stem: path for path in self.images_dir.iterdir()
+                if path.suffix in IMAGE_EXTENSIONS}
+
+        pending = []
+        for item in items:
+            dest = done.get(str(item['id']))
+            if dest is not None:
+                yield dest
+            else:
+                pending.append(item)
+
+        if not pending:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.fetch_one, item): item for item in pending}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    self.failed.append({**futures[future], 'error': str(e)})
@@ -0,0 +1,268 @@
+"""
+Index maintenance for long-lived catalogs
+Compaction of tombstoned items and consistency checks of published versions
+"""
+
+import json
+import pickle
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+import faiss
+import numpy as np
+
+from .search import FashionSearchEngine, IndexBuilder
+from .thumbnails import item_key
+from .tombstones import Tombstones
+
+
+def compact_index(engine: FashionSearchEngine,
+                  min_deleted: float = 0.0,
+                  chunk_size: int = 65536,
+                  recluster: bool = True) -> int:
+    """
+    Rewrite the current index version without its deleted items
+
+    Flat and binary indexes drop the deleted codes in place. IVF indexes
+    are cloned empty (centroids, PQ codebooks and PCA are kept, so no
+    retraining) and the live vectors are streamed back into them from the
+    side array, or reconstructed from the index. The result is published
+    as a new version with the matching metadata and side array, and the
+    engine swaps to it.
+
+    Args:
+        engine: FashionSearchEngine serving a published manifest
+        min_deleted: Only compact when at least this share of the
+            version's items is deleted (0 = whenever anything is deleted)
+        chunk_size: Vectors copied per batch
+        recluster: Rebuild the style clusters for the new version when
+            the old version had them
+
+    Returns:
+        Published version number, or None if there was nothing to do
+    """
+    if engine.manifest_path is None:
+        raise ValueError("Compaction publishes a new version and needs a manifest")
+
+    snapshot = engine._ensure_loaded()
+    ntotal = snapshot.index.ntotal
+    if snapshot.n_deleted == 0 or snapshot.n_deleted < min_deleted * ntotal:
+        return None
+
+    start = time.perf_counter()
+    live = snapshot.live_positions()
+    print(f"🗜️  Compacting version {snapshot.version}: dropping {snapshot.n_deleted:,} "
+          f"deleted items, keeping {len(live):,}...")
+
+    # Round trip instead of clone_index, which can't copy the PCA/L2norm chain
+    index = faiss.deserialize_index(faiss.serialize_index(snapshot.index))
+    refill = faiss.try_extract_index_ivf(index) is not None
+    if refill:
+        index.reset()  # Keeps the training, drops the stored codes
+    else:
+        # Flat codes (flat, binary): drop rows in place, later rows shift down
+        deleted = np.flatnonzero(~snapshot.live).astype('int64')
+        index.remove_ids(faiss.IDSelectorBatch(len(deleted), faiss.swig_ptr(deleted)))
+
+    root = engine.manifest_path.parent
+    vectors_path = None
+    vectors = None
+    if snapshot.vectors is not None:
+        vectors_path = root / "fashion.compact.vectors.npy"
+        vectors = np.lib.format.open_memmap(
+            vectors_path, mode='w+', dtype='float32', shape=(len(live), snapshot.vectors.shape[1])
+        )
+
+    if refill or vectors is not None:
+        for offset in range(0, len(live), chunk_size):
+            chunk = engine._vectors_of(snapshot, live[offset:offset + chunk_size])
+            if refill:
+                index.add(chunk)
+            if vectors is not None:
+                vectors[offset:offset + len(chunk)] = chunk
+    if vectors is not None:
+        vectors.flush()
+        del vectors
+
+    # A rebuild published meanwhile wins; its build already skipped the deletes
+    manifest = engine._read_manifest()
+    if manifest is None or manifest['version'] != snapshot.version:
+        print("⚠️  A new version was published during compaction, discarding")
+        if vectors_path is not None:
+            vectors_path.unlink()
+        return None
+
+    metadata = [snapshot.metadata[pos] for pos in live]
+    version = IndexBuilder.publish(index, metadata, engine.manifest_path,
+                                   vectors_path=vectors_path, model=snapshot.model)
+    print(f"✓ Compacted {ntotal:,} → {len(live):,} items in "
+          f"{time.perf_counter() - start:.1f}s")
+
+    clusters = None
+    if recluster and engine.clusters_path is not None and engine.clusters_path.exists():
+        try:
+            clusters = engine._clusters_for(snapshot)
+        except ValueError:
+            pass  # Already stale before compaction
+
+    engine.reload()
+    if clusters is not None:
+        from .clusters import build_clusters
+        build_clusters(engine, len(clusters), save_path=engine.clusters_path)
+
+    return version
+
+
+class Compactor:
+    """
+    Background thread compacting an engine's index once enough is deleted
+
+    Run it in one process per catalog (e.g. next to the app's watcher);
+    every other engine watching the manifest swaps to the compacted
+    version on its own.
+    """
+
+    def __init__(self, engine: FashionSearchEngine, min_deleted: float = 0.05,
+                 interval: float = 600.0, recluster: bool = True):
+        """
+        Args:
+            engine: FashionSearchEngine serving a published manifest
+            min_deleted: Share of deleted items that triggers a compaction
+            interval: Seconds between checks
+            recluster: Rebuild style clusters after compacting
+        """
+        self.engine = engine
+        self.min_deleted = min_deleted
+        self.interval = interval
+        self.recluster = recluster
+        self._thread = None
+        self._stop = threading.Event()
+
+    def run_once(self) -> int:
+        """Pick up new deletes, then compact if over the threshold"""
+        self.engine.reload()
+        return compact_index(self.engine, self.min_deleted, recluster=self.recluster)
+
+    def start(self):
+        """Start checking in a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def loop():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    # Keep serving the current version; retried next interval
+                    print(f"⚠️  Index compaction failed: {e}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name="index-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def check_index(manifest_path: str = "embeddings/manifest.json",
+                tombstones_path: str = "embeddings/tombstones.json",
+                clusters_path: str = "embeddings/clusters.npz",
+                sample: int = 1000) -> List[str]:
+    """
+    Validate that a published version's files line up
+
+    Checks that the manifest's files exist, that metadata, side array and
+    manifest all agree with the index's ntotal and dimension, that item
+    IDs are unique and vectors normalized, and reports tombstones and
+    style clusters that no longer match.
+
+    Args:
+        manifest_path: Manifest written by IndexBuilder.publish
+        tombstones_path: Deleted item IDs (utils.tombstones)
+        clusters_path: Style clusters of the version
+        sample: Side-array rows checked for unit norm
+
+    Returns:
+        List of problems (empty when consistent); warnings are only printed
+    """
+    manifest_path = Path(manifest_path)
+    problems = []
+
+    def problem(message):
+        problems.append(message)
+        print(f"❌ {message}")
+
+    if not manifest_path.exists():
+        problem(f"No manifest at {manifest_path}")
+        return problems
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    root = manifest_path.parent
+    print(f"🔍 Checking index version {manifest['version']} ({manifest_path})")
+
+    for key in ('index', 'metadata', 'vectors'):
+        if manifest.get(key) and not (root / manifest[key]).exists():
+            problem(f"Missing {key} file {root / manifest[key]}")
+    if problems:
+        return problems
+
+    index = faiss.read_index(str(root / manifest['index']))
+    ntotal = index.ntotal
+    print(f"✓ Index | {ntotal:,} x {index.d} ({type(index).__name__})")
+    if manifest.get('ntotal') not in (None, ntotal):
+        problem(f"Manifest lists {manifest['ntotal']:,} items, index has {ntotal:,}")
+
+    with open(root / manifest['metadata'], 'rb') as f:
+        metadata = pickle.load(f)
+    if len(metadata) != ntotal:
+        problem(f"Metadata has {len(metadata):,} entries, index has {ntotal:,}")
+    keys = Counter(item_key(meta) for meta in metadata)
+    repeated = [key for key, count in keys.items() if count > 1]
+    if repeated:
+        problem(f"{len(repeated):,} item IDs appear more than once (e.g. {repeated[0]})")
+
+    if manifest.get('vectors'):
+        vectors = np.load(root / manifest['vectors'], mmap_mode='r')
+        if vectors.shape != (ntotal, index.d):
+            problem(f"Side array is {vectors.shape[0]:,} x {vectors.shape[1]}, "
+                    f"index is {ntotal:,} x {index.d}")
+        elif ntotal:
+            rows = np.random.default_rng(0).choice(ntotal, min(sample, ntotal), replace=False)
+            norms = np.linalg.norm(np.asarray(vectors[np.sort(rows)], dtype='float32'), axis=1)
+            if not np.allclose(norms, 1.0, atol=1e-3):
+                problem(f"Side array rows are not L2-normalized "
+                        f"(norms {norms.min():.3f}..{norms.max():.3f})")
+
+    model = manifest.get('model')
+    if model and model['embedding_dim'] != index.d:
+        problem(f"Model {model['model_name']} embeds to {model['embedding_dim']}-d, "
+                f"index has {index.d}-d vectors")
+
+    # Stale but harmless: reported, not failed
+    tombstones = Tombstones.load(tombstones_path)
+    if tombstones.items:
+        deleted = sum(1 for key in tombstones.items if key in keys)
+        print(f"🪦 {len(tombstones):,} tombstones (revision {tombstones.revision}), "
+              f"{deleted:,} still in this version ({deleted / max(1, ntotal):.1%})")
+        if deleted:
+            print("   Run 'python maintain_index.py compact' to reclaim them")
+
+    clusters_path = Path(clusters_path)
+    if clusters_path.exists():
+        from .clusters import CatalogClusters
+        clusters = CatalogClusters.load(clusters_path)
+        if clusters.version != manifest['version'] or clusters.ntotal != ntotal:
+            print(f"⚠️  Style clusters are for version {clusters.version}; "
+                  f"run 'python download_dataset.py --build-clusters-only'")
+
+    if not problems:
+        print(f"✓ Version {manifest['version']} is consistent "
+              f"({len(metadata):,} metadata entries, {ntotal:,} vectors)")
+    return problems
@@ -0,0 +1,110 @@
+"""
+Embedding model registry
+Named open_clip variants, shared embedder instances, and engines checked
+against the model their index was built with
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+from .embedder import FashionEmbedder, model_fingerprint
+from .search import FashionSearchEngine
+
+# Registered open_clip variants: name -> (architecture, pretrained weights)
+MODELS = {
+    'fast': ("MobileCLIP-S1", "datacompdr"),               # ~85M params, CPU-friendly
+    'default': ("ViT-B-32", "openai"),                     # Original stylishi model
+    'balanced': ("ViT-B-16", "laion2b_s34b_b88k"),         # ~2.5x slower, finer detail
+    'best': ("ViT-L-14", "datacomp_xl_s13b_b90k"),         # GPU recommended
+}
+
+_embedders: Dict[Tuple[str, str], FashionEmbedder] = {}
+_embedders_lock = threading.Lock()
+
+
+def resolve_model(name: str) -> Tuple[str, str]:
+    """
+    Architecture and weights of a registered name or an "arch/tag" spec
+
+    Args:
+        name: Key of MODELS (e.g. 'fast') or open_clip "arch/pretrained"
+            (e.g. "ViT-B-16/laion2b_s34b_b88k")
+
+    Returns:
+        (model_name, pretrained) tuple
+    """
+    if name in MODELS:
+        return MODELS[name]
+    if '/' in name:
+        model_name, pretrained = name.split('/', 1)
+        return model_name, pretrained
+    raise ValueError(
+        f"Unknown model '{name}'. Choose from: {', '.join(MODELS)} "
+        f"or give an open_clip 'arch/pretrained' pair"
+    )
+
+
+def get_embedder(name: str = 'default', **embedder_kwargs) -> FashionEmbedder:
+    """
+    Shared FashionEmbedder for a model (loaded once per process)
+
+    Every caller asking for the same architecture and weights gets the same
+    instance, so several indexes built with one model share its weights.
+
+    Args:
+        name: Registered name or "arch/pretrained" (see resolve_model)
+        **embedder_kwargs: Passed to FashionEmbedder on first load
+
+    Returns:
+        Loaded FashionEmbedder
+    """
+    key = resolve_model(name)
+    with _embedders_lock:
+        if key not in _embedders:
+            _embedders[key] = FashionEmbedder(*key, **embedder_kwargs)
+        return _embedders[key]
+
+
+def load_engine(manifest_path: str = "embeddings/manifest.json",
+                default_model: str = 'default',
+                **engine_kwargs) -> Tuple[FashionEmbedder, FashionSearchEngine]:
+    """
+    Search engine plus the embedder its index was built with
+
+    The model is read from the published manifest (default_model for
+    indexes published before fingerprints), and the engine validates
+    every version it loads against that embedder's fingerprint.
+
+    Args:
+        manifest_path: Manifest written by IndexBuilder.publish
+        default_model: Model used when the manifest names none
+        **engine_kwargs: Passed to FashionSearchEngine
+
+    Returns:
+        (embedder, engine) tuple
+    """
+    name = default_model
+    manifest_path = Path(manifest_path)
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            model = json.load(f).get('model')
+        if model:
+            name = f"{model['model_name']}/{model['pretrained'] or ''}"
+
+    embedder = get_embedder(name)
+    engine = FashionSearchEngine(manifest_path=str(manifest_path),
+                                 model_fingerprint=embedder.fingerprint(),
+                                 **engine_kwargs)
+    return embedder, engine
+
+
+def describe_models() -> str:
+    """One line per registered model (for CLI help and logs)"""
+    lines = []
+    for name, (model_name, pretrained) in MODELS.items():
+        spec = model_fingerprint(model_name, pretrained)
+        lines.append(f"{name:<9} {model_name}/{pretrained} "
+                     f"({spec['embedding_dim']}-d, {spec['image_size']}px)")
+    return '\n'.join(lines)
@@ -0,0 +1,74 @@
+"""
+Session-level personalization
+Keeps a per-user taste vector and blends it into search queries
+"""
+
+import numpy as np
+
+# Interaction weights: a like moves the taste vector more than a view
+VIEW_WEIGHT = 0.5
+LIKE_WEIGHT = 1.0
+
+
+class TasteVector:
+    """
+    Exponential moving average of embeddings a user interacted with
+
+    Only the running average (D float16 values) and an interaction count
+    are stored, so updates and memory are O(D) however long the history
+    gets, and the object is cheap to keep in Streamlit session state.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        """
+        Args:
+            alpha: EMA rate for a weight-1.0 interaction (higher = adapts faster)
+        """
+        self.alpha = alpha
+        self.vector = None
+        self.count = 0
+
+    def __bool__(self) -> bool:
+        return self.vector is not None
+
+    def update(self, embedding: np.ndarray, weight: float = LIKE_WEIGHT):
+        """
+        Fold one interaction into the taste vector
+
+        Args:
+            embedding: L2-normalized embedding of the viewed/liked item (D,)
+            weight: Interaction strength (VIEW_WEIGHT, LIKE_WEIGHT, ...)
+        """
+        embedding = np.asarray(embedding, dtype='float32').reshape(-1)
+
+        if self.vector is None:
+            taste = embedding
+        else:
+            rate = min(1.0, self.alpha * weight)
+            taste = (1.0 - rate) * self.vector.astype('float32') + rate * embedding
+
+        self.vector = (taste / (np.linalg.norm(taste) + 1e-12)).astype('float16')
+        self.count += 1
+
+    def blend(self, query: np.ndarray, strength: float = 0.3) -> np.ndarray:
+        """
+        Mix the taste vector into a query embedding
+
+        Args:
+            query: L2-normalized query embedding (D,)
+            strength: Share of the taste vector (0 = query only)
+
+        Returns:
+            L2-normalized blended query (unchanged if no taste yet)
+        """
+        query = np.asarray(query, dtype='float32').reshape(-1)
+        if self.vector is None or strength <= 0:
+            return query
+
+        blended = (1.0 - strength) * query + strength * self.vector.astype('float32')
+        return blended / (np.linalg.norm(blended) + 1e-12)
+
+    def reset(self):
+        """Forget all interactions"""
+        self.vector = None
+        self.count = 0
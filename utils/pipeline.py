@@ -0,0 +1,310 @@
+"""
+Pipelined query path
+Decode/preprocess, model inference and FAISS search run as asyncio stages
+connected by bounded queues, each on its own executor
+"""
+
+import asyncio
+import atexit
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+
+STAGES = ('preprocess', 'embed', 'search')
+
+
+class DeadlineExceeded(TimeoutError):
+    """A query's deadline passed while it was still queued"""
+
+
+class StageStats:
+    """Counters of one pipeline stage (updated on the event loop thread only)"""
+
+    def __init__(self, name: str, queue: asyncio.Queue):
+        self.name = name
+        self.queue = queue
+        self.processed = 0
+        self.batches = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.busy_total = 0.0
+        self.expired = 0
+        self.item_cost = 0.0  # Moving average of service time per query
+
+    def record_batch(self, size: int, seconds: float, alpha: float = 0.2):
+        """Account one finished batch"""
+        self.processed += size
+        self.batches += 1
+        self.busy_total += seconds
+        cost = seconds / size
+        self.item_cost = cost if self.batches == 1 else (1 - alpha) * self.item_cost + alpha * cost
+
+    def snapshot(self) -> dict:
+        """Queue depth, waits and service time so far"""
+        processed = max(1, self.processed)
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'processed': self.processed,
+            'avg_batch': self.processed / max(1, self.batches),
+            'avg_wait_ms': self.wait_total / processed * 1000,
+            'max_wait_ms': self.wait_max * 1000,
+            'avg_service_ms': self.busy_total / max(1, self.batches) * 1000,
+            'item_cost_ms': self.item_cost * 1000,
+            'expired': self.expired,
+        }
+
+
+class _Job:
+    """One query travelling through the stages"""
+
+    __slots__ = ('value', 'k', 'transform', 'options', 'future', 'queued',
+                 'deadline', 'timings')
+
+    def __init__(self, image, k, transform, options, future, timeout=None):
+        self.value = image
+        self.k = k
+        self.transform = transform
+        self.options = options
+        self.future = future
+        self.queued = time.perf_counter()
+        self.deadline = None if timeout is None else self.queued + timeout
+        self.timings = {}
+
+
+class QueryPipeline:
+    """
+    Overlapping decode, embed and search for concurrent image queries
+
+    Every stage pulls from a bounded asyncio queue and runs its work on a
+    dedicated executor (OpenCV, torch and FAISS release the GIL), so while
+    one query is in the model the next is being preprocessed and the
+    previous one searched. Under load, throughput approaches the slowest
+    stage instead of the sum of all three. The embed and search stages
+    also batch whatever is queued into one forward pass / FAISS call.
+
+    The event loop runs in a background thread: call submit() or search()
+    from any thread (e.g. Streamlit sessions).
+    Full queues push back on submitters instead of growing without bound,
+    and queries whose deadline passes while queued are dropped before
+    reaching the model (see utils.admission for rejecting them up front).
+    """
+
+    def __init__(self, embedder, engine, preprocess_workers: int = 2,
+                 queue_size: int = 32, max_batch: int = 16, profiler=None):
+        """
+        Args:
+            embedder: FashionEmbedder (to_input / embed_inputs)
+            engine: FashionSearchEngine (or anything with search_batch)
+            preprocess_workers: Threads decoding and preprocessing images
+            queue_size: Capacity of each inter-stage queue
+            max_batch: Most queries per forward pass / FAISS call
+            profiler: Optional utils.profiling.SlowRequestProfiler; stage
+                threads are named 'pipeline-*' so its sampler sees them,
+                and forward passes run under its model_trace()
+        """
+        self.embedder = embedder
+        self.engine = engine
+        self.profiler = profiler
+        self.preprocess_workers = preprocess_workers
+        self.max_batch = max_batch
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._executors = {
+            'preprocess': ThreadPoolExecutor(preprocess_workers, thread_name_prefix="pipeline-preprocess"),
+            'embed': ThreadPoolExecutor(1, thread_name_prefix="pipeline-embed"),
+            'search': ThreadPoolExecutor(1, thread_name_prefix="pipeline-search"),
+        }
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                         name="query-pipeline", daemon=True)
+        self._thread.start()
+        self._stages = asyncio.run_coroutine_threadsafe(
+            self._start(queue_size), self._loop
+        ).result()
+        atexit.register(self.close)  # Stop the stage tasks cleanly at exit
+
+    async def _start(self, queue_size: int) -> dict:
+        """Create the queues and stage workers on the loop thread"""
+        queues = [asyncio.Queue(queue_size) for _ in STAGES]
+        stages = {name: StageStats(name, queue) for name, queue in zip(STAGES, queues)}
+        self._inbox = queues[0]
+        self._tasks = [
+            asyncio.create_task(self._worker(stages['preprocess'], queues[1], self._preprocess, 1))
+            for _ in range(self.preprocess_workers)
+        ]
+        self._tasks.append(asyncio.create_task(
+            self._worker(stages['embed'], queues[2], self._embed, self.max_batch)))
+        self._tasks.append(asyncio.create_task(
+            self._worker(stages['search'], None, self._search, self.max_batch)))
+        return stages
+
+    # Stage work (runs on the stage's executor)
+    def _preprocess(self, jobs: List[_Job]) -> list:
+        return [self.embedder.to_input(job.value) for job in jobs]
+
+    def _embed(self, jobs: List[_Job]) -> list:
+        inputs = np.stack([job.value for job in jobs])
+        if self.profiler is None:
+            embeddings = self.embedder.embed_inputs(inputs)
+        else:
+            with self.profiler.model_trace():
+                embeddings = self.embedder.embed_inputs(inputs)
+        return [job.transform(e) if job.transform else e
+                for job, e in zip(jobs, embeddings)]
+
+    def _search(self, jobs: List[_Job]) -> list:
+        # One FAISS call per group of queries sharing k and options
+        results = [None] * len(jobs)
+        groups = {}
+        for i, job in enumerate(jobs):
+            key = (job.k, tuple(sorted(job.options.items())))
+            groups.setdefault(key, []).append(i)
+        for members in groups.values():
+            first = jobs[members[0]]
+            found = self.engine.search_batch(np.stack([jobs[i].value for i in members]),
+                                             first.k, **first.options)
+            for i, hits in zip(members, found):
+                results[i] = hits
+        return results
+
+    async def _worker(self, stats: StageStats, outbox: asyncio.Queue,
+                      work: Callable[[List[_Job]], list], max_batch: int):
+        """Pull (batches of) jobs, run the stage, hand results downstream"""
+        loop = asyncio.get_running_loop()
+        executor = self._executors[stats.name]
+        inbox = stats.queue
+
+        while True:
+            jobs = [await inbox.get()]
+            while len(jobs) < max_batch and not inbox.empty():
+                jobs.append(inbox.get_nowait())
+
+            # Don't spend model/index time on answers nobody waits for anymore
+            now = time.perf_counter()
+            live = [job for job in jobs if job.deadline is None or job.deadline > now]
+            for job in jobs:
+                if job not in live and not job.future.done():
+                    stats.expired += 1
+                    job.future.set_exception(DeadlineExceeded(
+                        f"Deadline passed {(now - job.deadline) * 1000:.0f} ms ago, "
+                        f"before the {stats.name} stage"))
+            jobs = live
+            if not jobs:
+                continue
+
+            started = time.perf_counter()
+            for job in jobs:
+                wait = started - job.queued
+                stats.wait_total += wait
+                stats.wait_max = max(stats.wait_max, wait)
+
+            try:
+                outputs = await loop.run_in_executor(executor, work, jobs)
+            except Exception as e:
+                outputs = None
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+            finished = time.perf_counter()
+            stats.record_batch(len(jobs), finished - started)
+            if outputs is None:
+                continue
+
+            for job, output in zip(jobs, outputs):
+                job.timings[stats.name] = finished - started
+                job.timings[f"{stats.name}_wait"] = started - job.queued
+                if outbox is None:
+                    if not job.future.done():
+                        job.future.set_result((output, job.timings))
+                    continue
+                job.value = output
+                job.queued = time.perf_counter()
+                await outbox.put(job)  # Blocks while the next stage is backed up
+
+    def submit(self, image, k: int = 10,
+               query_transform: Callable[[np.ndarray], np.ndarray] = None,
+               timeout: float = None,
+               **search_options) -> Future:
+        """
+        Queue an image query from any thread
+
+        Args:
+            image: PIL Image, numpy array (BGR, RGBA or gray) or image file path
+            k: Number of results
+            query_transform: Optional function applied to the embedding
+                before the search (e.g. TasteVector.blend)
+            timeout: Seconds until the answer is useless; a query still
+                queued by then fails with DeadlineExceeded (None = no limit)
+            **search_options: collapse_duplicates, diversify, mmr_lambda,
+                fetch_factor, nprobe, rerank_factor (see FashionSearchEngine.search)
+
+        Returns:
+            Future of (results, timings); timings has the service time of
+            each stage and the queue wait before it ('<stage>_wait'), in seconds
+        """
+        job, queued = self._enqueue(image, k, query_transform, search_options, timeout)
+        queued.result()  # Blocks while the first stage is backed up
+        return job.future
+
+    def _enqueue(self, image, k, query_transform, search_options, timeout=None):
+        """Create a job and schedule its put into the first queue"""
+        job = _Job(image, k, query_transform, search_options, Future(), timeout)
+        with self._in_flight_lock:
+            self._in_flight += 1
+        job.future.add_done_callback(self._finished)
+        return job, asyncio.run_coroutine_threadsafe(self._inbox.put(job), self._loop)
+
+    def _finished(self, future: Future):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self) -> int:
+        """Queries submitted and not yet answered"""
+        return self._in_flight
+
+    def estimated_latency(self, extra: int = 1) -> float:
+        """
+        Seconds a query submitted now would likely take
+
+        Queries ahead drain at the rate of the slowest stage (its recent
+        per-query service time); the new query then passes every stage.
+
+        Args:
+            extra: Queries about to be submitted (this one included)
+
+        Returns:
+            Estimated latency in seconds (0 before any query finished)
+        """
+        costs = [stage.item_cost for stage in self._stages.values()]
+        return (self._in_flight + extra - 1) * max(costs) + sum(costs)
+
+    def search(self, image, k: int = 10, **options) -> List[dict]:
+        """Blocking query: same arguments as submit(), returns the results"""
+        return self.submit(image, k, **options).result()[0]
+
+    def stats(self) -> dict:
+        """Per-stage queue depth, wait and service times"""
+        return {name: stage.snapshot() for name, stage in self._stages.items()}
+
+    def close(self):
+        """Stop the stage workers, the event loop and the executors"""
+        if not self._thread.is_alive():
+            return
+
+        async def stop():
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
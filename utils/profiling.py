@@ -0,0 +1,309 @@
+"""
+Slow-request profiling
+Samples the stacks of in-flight queries and keeps a flamegraph (plus a
+torch profiler trace) only for queries slower than a threshold
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+
+# Leaf frames of threads waiting for work rather than doing it
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),       # concurrent.futures executor waiting for a task
+    ('selectors.py', 'select'),
+}
+
+
+def _frame_name(code) -> str:
+    """'function (folder/file.py)' label of a code object"""
+    path = Path(code.co_filename)
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({path.parent.name}/{path.name})"
+
+
+def _fold(frame) -> str:
+    """Stack of a frame in collapsed flamegraph form (root first, ';'-joined)"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class _Capture:
+    """Samples and timings of one profiled request"""
+
+    def __init__(self, name: str, info: dict):
+        self.name = name
+        self.info = info
+        self.thread = threading.get_ident()
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.stacks = Counter()
+        self.idle = 0
+        self.path = None  # Summary written for a slow request
+
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler for slow queries
+
+    While at least one request is in flight, a background thread samples
+    the Python stacks of the requesting threads and of worker threads
+    (e.g. the QueryPipeline stage executors) every interval_ms. Time spent
+    in native code (PIL decode, cv2.cvtColor, the CLIP forward, FAISS)
+    shows up under the Python frame that called it. When a request
+    finishes under threshold_ms its samples are dropped; a slower one is
+    written to output_dir as:
+
+        <stamp>-<ms>ms-<name>.folded      collapsed stacks (flamegraph.pl,
+                                          speedscope, ...)
+        <stamp>-<ms>ms-<name>.json        timings, hottest frames, request info
+        <stamp>-<ms>ms-<name>.torch.json  torch profiler trace of the next
+                                          model forward (chrome://tracing)
+
+    A slow request can't be traced retroactively, so it arms a one-shot
+    torch profiler for the next forward pass run under model_trace().
+    Only the newest `keep` captures are kept. When no request is in
+    flight the sampler sleeps, and a disabled profiler's hooks return
+    right away.
+    """
+
+    def __init__(self, output_dir: str = "embeddings/profiles",
+                 threshold_ms: float = 1000.0,
+                 interval_ms: float = 10.0,
+                 keep: int = 50,
+                 thread_prefixes: tuple = ('pipeline-',),
+                 trace_model: bool = True,
+                 trace_interval: float = 60.0,
+                 enabled: bool = True):
+        """
+        Args:
+            output_dir: Folder receiving the captures (rotated)
+            threshold_ms: Requests at least this slow are written out
+            interval_ms: Stack sampling period while requests are in flight
+            keep: Captures kept on disk (oldest deleted first)
+            thread_prefixes: Names of worker threads sampled along with
+                the requesting thread
+            trace_model: Arm a torch profiler trace after a slow request
+            trace_interval: Seconds between model traces (a burst of slow
+                requests doesn't trace every forward)
+            enabled: False makes every hook a no-op
+        """
+        self.output_dir = Path(output_dir)
+        self.threshold_ms = threshold_ms
+        self.interval = interval_ms / 1000.0
+        self.keep = keep
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.trace_model = trace_model
+        self.trace_interval = trace_interval
+        self._last_trace = float('-inf')
+        self.enabled = enabled
+        self.captured = 0
+        self._active: List[_Capture] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler = None
+        self._local = threading.local()
+        self._trace_stem = None  # Set when a slow request arms a model trace
+
+    @classmethod
+    def from_env(cls, **kwargs) -> 'SlowRequestProfiler':
+        """
+        Profiler configured from STYLISHI_PROFILE_MS (threshold; unset =
+        disabled) and STYLISHI_PROFILE_DIR
+        """
+        threshold = os.environ.get('STYLISHI_PROFILE_MS')
+        if threshold:
+            kwargs['threshold_ms'] = float(threshold)
+        if os.environ.get('STYLISHI_PROFILE_DIR'):
+            kwargs['output_dir'] = os.environ['STYLISHI_PROFILE_DIR']
+        return cls(enabled=bool(threshold), **kwargs)
+
+    @contextmanager
+    def request(self, name: str, **info):
+        """
+        Profile the enclosed block as one request
+
+        Nested blocks on the same thread belong to the outer request.
+
+        Args:
+            name: Request kind (used in file names, e.g. 'image_search')
+            **info: JSON-serializable details saved with a slow capture;
+                more can be added to the yielded capture's .info
+
+        Yields:
+            The capture (None when disabled)
+        """
+        outer = getattr(self._local, 'capture', None)
+        if not self.enabled or outer is not None:
+            yield outer
+            return
+
+        capture = _Capture(name, info)
+        self._local.capture = capture
+        with self._lock:
+            self._active.append(capture)
+        self._ensure_sampler()
+        self._wake.set()
+        try:
+            yield capture
+        finally:
+            capture.elapsed = time.perf_counter() - capture.started
+            self._local.capture = None
+            with self._lock:
+                self._active.remove(capture)
+                if not self._active:
+                    self._wake.clear()
+            if capture.elapsed * 1000 >= self.threshold_ms:
+                try:
+                    self._write(capture)
+                except OSError as e:
+                    print(f"⚠️  Could not save slow-request profile: {e}")
+
+    def instrument(self, obj, methods=('search', 'search_batch', 'search_by_id')):
+        """
+        Profile calls to methods of an object (e.g. a FashionSearchEngine)
+
+        Args:
+            obj: Instance whose methods are wrapped in place
+            methods: Method names profiled as requests
+        """
+        for method in methods:
+            original = getattr(obj, method)
+
+            def wrapped(*args, _original=original, _name=method, **kwargs):
+                with self.request(_name):
+                    return _original(*args, **kwargs)
+
+            setattr(obj, method, wrapped)
+        return obj
+
+    @contextmanager
+    def model_trace(self):
+        """
+        Run the enclosed model call under the torch profiler if a slow
+        request armed a trace (the trace is saved next to its capture)
+        """
+        stem = self._trace_stem
+        if stem is None:
+            yield
+            return
+        with self._lock:
+            stem, self._trace_stem = self._trace_stem, None  # One-shot
+        if stem is None:
+            yield
+            return
+
+        import torch
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        with torch.profiler.profile(activities=activities, record_shapes=True) as trace:
+            yield
+        path = self.output_dir / f"{stem}.torch.json"
+        if path.with_name(f"{stem}.json").exists():  # Not rotated away meanwhile
+            trace.export_chrome_trace(str(path))
+
+    def _ensure_sampler(self):
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        with self._lock:
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop,
+                                                 name="slow-request-sampler", daemon=True)
+                self._sampler.start()
+
+    def _sample_loop(self):
+        """Sample while requests are in flight, sleep otherwise"""
+        own = threading.get_ident()
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+
+            workers = {thread.ident for thread in threading.enumerate()
+                       if thread.name.startswith(self.thread_prefixes)}
+            frames = sys._current_frames()
+            stacks = {}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                if ident not in workers and not any(c.thread == ident for c in active):
+                    continue
+                code = frame.f_code
+                idle = (Path(code.co_filename).name, code.co_name) in IDLE_FRAMES
+                stacks[ident] = None if idle else _fold(frame)
+            del frames
+
+            # Worker threads are shared, so their samples count for every active request
+            for capture in active:
+                for ident, stack in stacks.items():
+                    if ident != capture.thread and ident not in workers:
+                        continue
+                    if stack is None:
+                        capture.idle += 1
+                    else:
+                        capture.stacks[stack] += 1
+
+    def _write(self, capture: _Capture):
+        """Save a slow request's stacks and summary, then rotate"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        elapsed_ms = capture.elapsed * 1000
+        stamp = time.strftime('%Y%m%d-%H%M%S') + f"{int(time.time() * 1000) % 1000:03d}"
+        stem = f"{stamp}-{elapsed_ms:.0f}ms-{capture.name}"
+
+        with open(self.output_dir / f"{stem}.folded", 'w') as f:
+            for stack, count in capture.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # Self time per function (leaf of each sampled stack)
+        leaves = Counter()
+        for stack, count in capture.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        busy = sum(leaves.values())
+        summary = {
+            'name': capture.name,
+            'elapsed_ms': round(elapsed_ms, 1),
+            'threshold_ms': self.threshold_ms,
+            'interval_ms': self.interval * 1000,
+            'samples': busy,
+            'idle_samples': capture.idle,
+            'hottest': [{'frame': frame, 'samples': count, 'share': round(count / busy, 3)}
+                        for frame, count in leaves.most_common(15)],
+            'info': capture.info,
+        }
+        capture.path = self.output_dir / f"{stem}.json"
+        with open(capture.path, 'w') as f:
+            json.dump(summary, f, indent=2, default=str)
+
+        self.captured += 1
+        now = time.monotonic()
+        if self.trace_model and now - self._last_trace >= self.trace_interval:
+            self._last_trace = now
+            self._trace_stem = stem
+        print(f"🐢 Slow {capture.name} ({elapsed_ms:.0f} ms): profile saved to {capture.path}")
+        self._rotate()
+
+    def _rotate(self):
+        """Delete the oldest captures beyond `keep`"""
+        stems = sorted({path.name.split('.')[0] for path in self.output_dir.glob("*.json")})
+        for stem in stems[:max(0, len(stems) - self.keep)]:
+            for path in self.output_dir.glob(f"{stem}.*"):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
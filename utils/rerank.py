@@ -0,0 +1,55 @@
+"""
+Result diversification for similarity search
+Maximal marginal relevance (MMR) re-ranking over an over-fetched candidate set
+"""
+
+import numpy as np
+
+
+def mmr_rerank(candidates: np.ndarray,
+               relevance: np.ndarray,
+               k: int,
+               mmr_lambda: float = 0.7) -> np.ndarray:
+    """
+    Select k diverse candidates with maximal marginal relevance
+
+    Each step picks the candidate maximizing
+    lambda * relevance - (1 - lambda) * max similarity to already picked items.
+    The candidate similarity matrix is computed once with a single matmul and
+    the running max is updated vectorized, so the loop is O(k * n).
+
+    Args:
+        candidates: L2-normalized candidate embeddings (n, D)
+        relevance: Similarity of each candidate to the query (n,)
+        k: Number of items to select
+        mmr_lambda: Trade-off between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        Positions into candidates, in selection order (min(k, n),)
+    """
+    n = len(candidates)
+    k = min(k, n)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    candidates = np.asarray(candidates, dtype='float32')
+    relevance = np.asarray(relevance, dtype='float32')
+    pairwise = candidates @ candidates.T
+
+    selected = np.empty(k, dtype=np.int64)
+    available = np.ones(n, dtype=bool)
+    max_redundancy = np.full(n, -np.inf, dtype='float32')
+
+    for step in range(k):
+        if step == 0:
+            scores = relevance.copy()
+        else:
+            scores = mmr_lambda * relevance - (1 - mmr_lambda) * max_redundancy
+        scores[~available] = -np.inf
+
+        pick = int(np.argmax(scores))
+        selected[step] = pick
+        available[pick] = False
+        np.maximum(max_redundancy, pairwise[pick], out=max_redundancy)
+
+    return selected
@@ -14,13 +14,210 @@ if sys.platform == 'win32':
     except AttributeError:
         pass
 
+import copy
 import faiss
+import json
+import os
 import numpy as np
 import pickle
+import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 import pandas as pd
 
+from .rerank import mmr_rerank
+from .thumbnails import item_key
+from .tombstones import Tombstones
+
+
+class IndexSnapshot:
+    """
+    One immutable, fully loaded version of the index and its metadata
+
+    Searches grab the current snapshot once and use only it, so a reload
+    can swap in a new snapshot (read-copy-update) while in-flight queries
+    finish on the old one. Deletes work the same way: tombstoned() returns
+    a copy sharing the index and vectors, with the deleted positions
+    masked out of every search.
+    """
+
+    def __init__(self, index: faiss.Index, metadata: List[dict],
+                 vectors: np.ndarray = None, version=None, model: dict = None):
+        self.index = index
+        self.metadata = metadata
+        self.vectors = vectors
+        self.version = version
+        self.model = model  # Embedding model fingerprint (None = unknown)
+        self._positions = None
+        self._has_duplicates = None
+        self.clusters = None
+        # Binary codes searched by Hamming distance (see IndexBuilder 'binary')
+        self.binary = isinstance(index, faiss.IndexLSH)
+        # PCA-reduced vectors (see IndexBuilder pca_dim); FAISS projects queries
+        self.reduced = isinstance(index, faiss.IndexPreTransform)
+        # Lossy PQ codes (see IndexBuilder 'ivfpq'), re-ranked like the above
+        ivf = faiss.try_extract_index_ivf(index)
+        self.ivfpq = ivf is not None and isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ)
+        # Tombstoned positions (see tombstoned); None = nothing deleted
+        self.live = None
+        self.n_deleted = 0
+        self.tombstones_revision = None
+        self.selector = None
+        self._origin = None
+
+        # IVF indexes need a direct map before they can reconstruct
+        if ivf is not None and vectors is None and ivf.direct_map.no():
+            ivf.make_direct_map()
+
+    def position_of(self, item_id) -> int:
+        """
+        Index position of a catalog item
+
+        Args:
+            item_id: Item ID (metadata 'item_id' or file stem), or an int
+                index position
+
+        Returns:
+            Index position
+
+        Raises:
+            KeyError: If the item is not in this snapshot
+        """
+        if isinstance(item_id, (int, np.integer)):
+            if not 0 <= item_id < self.index.ntotal:
+                raise KeyError(item_id)
+            position = int(item_id)
+        else:
+            if self._positions is None:
+                # Built on first use; benign race if two threads build it at once
+                self._positions = {item_key(meta): pos
+                                   for pos, meta in enumerate(self.metadata or [])}
+            position = self._positions[str(item_id)]
+
+        if self.live is not None and not self.live[position]:
+            raise KeyError(item_id)  # Deleted
+        return position
+
+    def tombstoned(self, item_ids: Iterable, revision: int = None) -> 'IndexSnapshot':
+        """
+        Copy of this snapshot with items deleted
+
+        Index, metadata and vectors are shared; only a live mask (and, for
+        index types that support it, a FAISS ID selector over it) is new.
+        IDs not in this version are ignored.
+
+        Args:
+            item_ids: Deleted item IDs (the full set, not just new ones)
+            revision: Tombstones revision the set comes from
+
+        Returns:
+            New snapshot
+        """
+        origin = self._origin or self
+        ntotal = origin.index.ntotal
+        positions = []
+        for item_id in item_ids:
+            try:
+                positions.append(origin.position_of(item_id))
+            except KeyError:
+                pass  # Not in this version (e.g. already compacted away)
+
+        snapshot = copy.copy(origin)
+        snapshot._origin = origin
+        snapshot.clusters = None  # Re-filtered on first use
+        snapshot.tombstones_revision = revision
+        snapshot.n_deleted = len(set(positions))
+        snapshot.live = snapshot.selector = None
+        if snapshot.n_deleted:
+            live = np.ones(ntotal, dtype=bool)
+            live[positions] = False
+            snapshot.live = live
+            if not snapshot.binary:  # IndexLSH ignores selectors; post-filtered instead
+                # Bitmap of live positions, kept alive as long as the selector
+                snapshot._live_bits = np.packbits(live, bitorder='little')
+                snapshot.selector = faiss.IDSelectorBitmap(
+                    ntotal, faiss.swig_ptr(snapshot._live_bits))
+        return snapshot
+
+    @property
+    def has_duplicates(self) -> bool:
+        """Whether the metadata carries near-duplicate clusters (dedup build)"""
+        if self._has_duplicates is None:
+            self._has_duplicates = any('cluster_id' in meta for meta in self.metadata or [])
+        return self._has_duplicates
+
+    def live_positions(self) -> np.ndarray:
+        """Index positions not deleted"""
+        if self.live is None:
+            return np.arange(self.index.ntotal, dtype='int64')
+        return np.flatnonzero(self.live)
+
+    @classmethod
+    def load(cls, index_path: Path, metadata_path: Path, vectors_path: Path,
+             nprobe: int = 16, version=None) -> 'IndexSnapshot':
+        """
+        Load index, metadata and optional side vectors from disk
+
+        Args:
+            index_path: Path to FAISS index file
+            metadata_path: Path to metadata pickle
+            vectors_path: Path to .npy side array (used if present)
+            nprobe: IVF cells visited per query (ignored for flat indexes)
+            version: Manifest version this snapshot belongs to
+
+        Returns:
+            Loaded snapshot
+
+        Raises:
+            ValueError: If the metadata doesn't line up with the index
+                (see utils.maintenance.check_index)
+        """
+        print(f"📚 Loading FAISS index from {index_path}...")
+        index = faiss.read_index(str(index_path))
+        print(f"✓ Index loaded | {index.ntotal:,} items indexed")
+
+        # Load metadata
+        if metadata_path.exists():
+            with open(metadata_path, 'rb') as f:
+                metadata = pickle.load(f)
+            if len(metadata) != index.ntotal:
+                # Results would silently show another item's metadata
+                raise ValueError(
+                    f"{metadata_path} has {len(metadata):,} entries but the index has "
+                    f"{index.ntotal:,} vectors. Run 'python maintain_index.py check'"
+                )
+            print(f"✓ Metadata loaded | {len(metadata)} entries")
+        else:
+            print("⚠️  No metadata found, using index-only mode")
+            metadata = [{"image_path": f"item_{i}.jpg"}
+                        for i in range(index.ntotal)]
+
+        # Side array of raw vectors (memory-mapped, not read into RAM)
+        vectors = None
+        if vectors_path is not None and vectors_path.exists():
+            mapped = np.load(vectors_path, mmap_mode='r')
+            if mapped.shape[0] == index.ntotal:
+                vectors = mapped
+                print(f"✓ Vectors mapped | {mapped.shape[0]:,} x {mapped.shape[1]}")
+            else:
+                print(f"⚠️  Ignoring {vectors_path}: {mapped.shape[0]:,} rows "
+                      f"for {index.ntotal:,} indexed items")
+
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = nprobe
+
+        # Fingerprint of the model that embedded the catalog
+        model = None
+        model_path = Path(index_path).with_suffix('.model.json')
+        if model_path.exists():
+            with open(model_path) as f:
+                model = json.load(f)
+
+        return cls(index, metadata, vectors, version, model)
+
 
 class FashionSearchEngine:
     """
@@ -28,112 +225,739 @@ class FashionSearchEngine:
     Uses IndexFlatIP for exact cosine similarity (embeddings are L2-normalized)
     """
 
-    def __init__(self, index_path: str = "embeddings/fashion.index",
-                 metadata_path: str = "embeddings/metadata.pkl"):
+    # Candidates fetched per result when collapsing or diversifying results
+    DEFAULT_FETCH_FACTOR = 4
+
+    # Approximate-pass candidates per result re-ranked with float vectors
+    DEFAULT_RERANK_FACTOR = 8
+
+    DEFAULT_INDEX_PATH = "embeddings/fashion.index"
+    DEFAULT_METADATA_PATH = "embeddings/metadata.pkl"
+    DEFAULT_MANIFEST_PATH = "embeddings/manifest.json"
+
+    def __init__(self, index_path: str = None,
+                 metadata_path: str = None,
+                 vectors_path: str = None,
+                 nprobe: int = 16,
+                 rerank_factor: int = None,
+                 manifest_path: str = None,
+                 clusters_path: str = "embeddings/clusters.npz",
+                 model_fingerprint: dict = None,
+                 tombstones_path: str = None):
         """
         Initialize search engine with pre-built index
 
         Args:
-            index_path: Path to FAISS index file
-            metadata_path: Path to metadata pickle (image paths, etc.)
+            index_path: Path to FAISS index file (default
+                DEFAULT_INDEX_PATH)
+            metadata_path: Path to metadata pickle (image paths, etc.;
+                default DEFAULT_METADATA_PATH)
+            vectors_path: Optional side array of stored embeddings (.npy),
+                memory-mapped and used instead of reconstructing from the index
+                (defaults to <index>.vectors.npy next to the index)
+            nprobe: IVF cells visited per query (ignored for flat indexes)
+            rerank_factor: Binary and PCA-reduced indexes: first-pass
+                candidates per result re-ranked by exact cosine against the
+                side array (defaults to DEFAULT_RERANK_FACTOR)
+            manifest_path: Versioned index manifest written by
+                IndexBuilder.publish; takes precedence over the paths above
+                when it exists and can be watched for hot reloads. Defaults
+                to DEFAULT_MANIFEST_PATH only when neither index_path nor
+                metadata_path is given, so explicit paths are always honored
+            clusters_path: Style clusters written by utils.clusters.build_clusters
+            model_fingerprint: Fingerprint of the embedder producing the
+                queries (FashionEmbedder.fingerprint()); indexes built with
+                a different model are refused on load and reload
+            tombstones_path: Deleted item IDs (utils.tombstones); hidden
+                from every search, re-read by reload() when it changes
+                (defaults to tombstones.json next to the manifest)
         """
-        self.index_path = Path(index_path)
-        self.metadata_path = Path(metadata_path)
-        self.index = None
-        self.metadata = None
+        if manifest_path is None and index_path is None and metadata_path is None:
+            manifest_path = self.DEFAULT_MANIFEST_PATH
+        self.index_path = Path(index_path or self.DEFAULT_INDEX_PATH)
+        self.metadata_path = Path(metadata_path or self.DEFAULT_METADATA_PATH)
+        self.vectors_path = Path(vectors_path or self.index_path.with_suffix('.vectors.npy'))
+        self.nprobe = nprobe
+        self.rerank_factor = rerank_factor or self.DEFAULT_RERANK_FACTOR
+        self.manifest_path = Path(manifest_path) if manifest_path else None
+        self.clusters_path = Path(clusters_path) if clusters_path else None
+        self.model_fingerprint = model_fingerprint
+        if tombstones_path is None and self.manifest_path is not None:
+            tombstones_path = self.manifest_path.parent / "tombstones.json"
+        self.tombstones_path = Path(tombstones_path) if tombstones_path else None
+        self._tombstones_seen = None
+        self._snapshot = None
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self._load_lock = threading.Lock()
+        # Serializes swaps (load, reload, delete_items); searches never take it
+        self._swap_lock = threading.RLock()
         self.loaded = False
 
+    @classmethod
+    def from_index(cls, index: faiss.Index, metadata: List[dict] = None,
+                   vectors: np.ndarray = None) -> 'FashionSearchEngine':
+        """
+        Engine serving an in-memory index (benchmarks, tests, notebooks)
+
+        Args:
+            index: Built FAISS index
+            metadata: Optional metadata aligned with the index
+            vectors: Optional stored embeddings aligned with the index
+
+        Returns:
+            Loaded engine (no manifest, never reloads from disk)
+        """
+        engine = cls()
+        engine.manifest_path = None
+        engine.tombstones_path = None
+        engine._snapshot = IndexSnapshot(index, metadata, vectors)
+        engine.loaded = True
+        return engine
+
+    # Current snapshot's parts (read once per call for a consistent view)
+    @property
+    def index(self) -> faiss.Index:
+        return self._snapshot.index if self._snapshot else None
+
+    @property
+    def metadata(self) -> List[dict]:
+        return self._snapshot.metadata if self._snapshot else None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._snapshot.vectors if self._snapshot else None
+
+    @property
+    def version(self):
+        return self._snapshot.version if self._snapshot else None
+
+    @property
+    def tombstones_revision(self):
+        return self._snapshot.tombstones_revision if self._snapshot else None
+
+    @property
+    def has_duplicates(self) -> bool:
+        """Whether collapse_duplicates has clusters to collapse"""
+        return self._ensure_loaded().has_duplicates
+
+    def _read_manifest(self) -> dict:
+        """Current manifest contents, or None when no manifest is published"""
+        if self.manifest_path is None or not self.manifest_path.exists():
+            return None
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _load_snapshot(self, manifest: dict = None) -> IndexSnapshot:
+        """Load the version named by the manifest (or the fixed paths)"""
+        if manifest is None:
+            if not self.index_path.exists():
+                raise FileNotFoundError(
+                    f"Index not found at {self.index_path}. "
+                    f"Run 'python download_dataset.py' first!"
+                )
+            snapshot = IndexSnapshot.load(self.index_path, self.metadata_path,
+                                          self.vectors_path, self.nprobe)
+        else:
+            root = self.manifest_path.parent
+            vectors = manifest.get('vectors')
+            snapshot = IndexSnapshot.load(
+                root / manifest['index'],
+                root / manifest['metadata'],
+                root / vectors if vectors else None,
+                self.nprobe,
+                version=manifest['version']
+            )
+
+        self._check_model(snapshot)
+        return self._with_tombstones(snapshot)
+
+    def _tombstones_stamp(self):
+        """Cheap change marker of the tombstones file (None = no file)"""
+        if self.tombstones_path is None or not self.tombstones_path.exists():
+            return None
+        stat = self.tombstones_path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _with_tombstones(self, snapshot: IndexSnapshot) -> IndexSnapshot:
+        """Snapshot with the current tombstones applied"""
+        # Stamp first: a write racing with the read is picked up next time
+        self._tombstones_seen = self._tombstones_stamp()
+        if self._tombstones_seen is None:
+            return snapshot
+        tombstones = Tombstones.load(self.tombstones_path)
+        return snapshot.tombstoned(tombstones.items, tombstones.revision)
+
+    def _check_model(self, snapshot: IndexSnapshot):
+        """
+        Refuse an index whose vectors live in a different embedding space
+
+        Raises:
+            ValueError: If the index was built with another model, or its
+                dimension differs from the query embedder's
+        """
+        expected = self.model_fingerprint
+        if expected is None:
+            return
+
+        if snapshot.index.d != expected['embedding_dim']:
+            raise ValueError(
+                f"Index has {snapshot.index.d}-d vectors but {expected['model_name']} "
+                f"embeds to {expected['embedding_dim']}-d. Rebuild the index with "
+                f"'python download_dataset.py --build-index-only --fresh'"
+            )
+
+        if snapshot.model is None:
+            print("⚠️  Index has no model fingerprint (built before fingerprints); "
+                  "assuming it matches the embedder")
+        elif snapshot.model['id'] != expected['id']:
+            raise ValueError(
+                f"Index was built with {snapshot.model['model_name']}"
+                f"/{snapshot.model['pretrained']} ({snapshot.model['id']}) but queries "
+                f"come from {expected['model_name']}/{expected['pretrained']} "
+                f"({expected['id']})"
+            )
+
     def load(self):
         """Load FAISS index and metadata"""
-        if not self.index_path.exists():
-            raise FileNotFoundError(
-                f"Index not found at {self.index_path}. "
-                f"Run 'python download_dataset.py' first!"
-            )
+        with self._swap_lock:
+            self._snapshot = self._load_snapshot(self._read_manifest())
+            self.loaded = True
 
-        print(f"📚 Loading FAISS index from {self.index_path}...")
-        self.index = faiss.read_index(str(self.index_path))
-        print(f"✓ Index loaded | {self.index.ntotal:,} items indexed")
+    def _ensure_loaded(self) -> IndexSnapshot:
+        """Load once, even when many request threads arrive together"""
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load()
+        return self._snapshot
 
-        # Load metadata
-        if self.metadata_path.exists():
-            with open(self.metadata_path, 'rb') as f:
-                self.metadata = pickle.load(f)
-            print(f"✓ Metadata loaded | {len(self.metadata)} entries")
-        else:
-            print("⚠️  No metadata found, using index-only mode")
-            self.metadata = [{"image_path": f"item_{i}.jpg"}
-                           for i in range(self.index.ntotal)]
+    def reload(self) -> bool:
+        """
+        Load the published version if it changed, then swap it in atomically
 
-        self.loaded = True
+        Loading happens on the calling thread while searches keep using the
+        current snapshot; the swap itself is a single reference assignment.
+        A changed tombstones file swaps in a copy of the current snapshot
+        with the new deletes applied (nothing is reloaded from disk).
 
-    def search(self, query_embedding: np.ndarray, k: int = 10) -> List[dict]:
+        Reloads are serialized (the watcher, a Compactor and delete_items
+        may call this concurrently), so a tombstones update never swaps an
+        older version back in over a newer one.
+
+        Returns:
+            True if a new version or new deletes were swapped in
+        """
+        with self._swap_lock:
+            # Read under the lock: another reload may have swapped meanwhile
+            manifest = self._read_manifest()
+            if manifest is not None and manifest['version'] != self.version:
+                snapshot = self._load_snapshot(manifest)
+                self._snapshot = snapshot
+                self.loaded = True
+                print(f"🔄 Index swapped to version {snapshot.version}")
+                return True
+
+            if not self.loaded or self._tombstones_stamp() == self._tombstones_seen:
+                return False
+
+            snapshot = self._with_tombstones(self._snapshot)
+            self._snapshot = snapshot
+            print(f"🪦 Tombstones revision {snapshot.tombstones_revision}: "
+                  f"{snapshot.n_deleted:,} items deleted from version {snapshot.version}")
+            return True
+
+    def delete_items(self, item_ids: Iterable) -> int:
+        """
+        Delete catalog items (tombstones) and hide them from searches now
+
+        Other engines watching the same files pick the deletes up on their
+        next reload; utils.maintenance.compact_index reclaims the space.
+
+        Args:
+            item_ids: Item IDs (metadata 'item_id' or file stem)
+
+        Returns:
+            Number of items newly deleted
+        """
+        if self.tombstones_path is None:
+            raise ValueError("This engine has no tombstones file")
+        with self._swap_lock:
+            added = Tombstones.load(self.tombstones_path).delete(item_ids)
+            if added:
+                self.reload()
+        return added
+
+    def watch(self, interval: float = 5.0):
+        """
+        Poll the manifest in a background thread and hot-swap new versions
+
+        Args:
+            interval: Seconds between manifest checks
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def poll():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    # Keep serving the current version if the new one is broken
+                    print(f"⚠️  Index reload failed: {e}")
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=poll, name="index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop the background manifest watcher"""
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def search(self, query_embedding: np.ndarray, k: int = 10,
+               collapse_duplicates: bool = False,
+               diversify: bool = False,
+               mmr_lambda: float = 0.7,
+               fetch_factor: int = None,
+               nprobe: int = None,
+               rerank_factor: int = None) -> List[dict]:
         """
         Find k most similar items to query
 
         Args:
             query_embedding: L2-normalized embedding vector (512,)
             k: Number of results to return
+            collapse_duplicates: Return at most one item per near-duplicate
+                cluster (uses 'cluster_id' from metadata)
+            diversify: Re-rank candidates with maximal marginal relevance
+            mmr_lambda: MMR trade-off between relevance (1.0) and diversity (0.0)
+            fetch_factor: Candidates fetched per result when collapsing or
+                diversifying (defaults to DEFAULT_FETCH_FACTOR)
+            nprobe: IVF cells visited by this query (defaults to the
+                engine's nprobe; lower is faster and less exact)
+            rerank_factor: Binary/PCA candidates re-ranked per result for
+                this query (defaults to the engine's rerank_factor)
 
         Returns:
             List of dicts with 'image_path', 'similarity', 'rank'
         """
-        if not self.loaded:
-            self.load()
+        return self.search_batch(
+            query_embedding.reshape(1, -1), k,
+            collapse_duplicates=collapse_duplicates,
+            diversify=diversify,
+            mmr_lambda=mmr_lambda,
+            fetch_factor=fetch_factor,
+            nprobe=nprobe,
+            rerank_factor=rerank_factor
+        )[0]
+
+    def search_batch(self, query_embeddings: np.ndarray, k: int = 10,
+                     collapse_duplicates: bool = False,
+                     diversify: bool = False,
+                     mmr_lambda: float = 0.7,
+                     fetch_factor: int = None,
+                     nprobe: int = None,
+                     rerank_factor: int = None) -> List[List[dict]]:
+        """
+        Find k most similar items for several queries with one FAISS call
+
+        FAISS parallelizes a batch across its OpenMP threads, which is much
+        cheaper than the same number of single-query calls competing for
+        cores (see utils.batching.QueryBatcher).
+
+        Args:
+            query_embeddings: L2-normalized embeddings (n, 512)
+            k, collapse_duplicates, diversify, mmr_lambda, fetch_factor,
+                nprobe, rerank_factor: As in search()
+
+        Returns:
+            One result list per query
+        """
+        return self._search(self._ensure_loaded(), query_embeddings, k,
+                            collapse_duplicates, diversify, mmr_lambda, fetch_factor,
+                            nprobe, rerank_factor)
+
+    def _search(self, snapshot: IndexSnapshot, query_embeddings: np.ndarray,
+                k: int, collapse_duplicates: bool = False, diversify: bool = False,
+                mmr_lambda: float = 0.7, fetch_factor: int = None,
+                nprobe: int = None, rerank_factor: int = None) -> List[List[dict]]:
+        """search_batch against one given snapshot"""
+        # Without dedup clusters every item is its own cluster: nothing to collapse
+        collapse_duplicates = collapse_duplicates and snapshot.has_duplicates
+
+        # Over-fetch so collapsing/re-ranking still leaves k good results
+        fetch_k = k
+        if collapse_duplicates or diversify:
+            fetch_k = k * (fetch_factor or self.DEFAULT_FETCH_FACTOR)
+        fetch_k = min(fetch_k, snapshot.index.ntotal)
+
+        all_similarities, all_indices = self._hits(snapshot, query_embeddings, fetch_k,
+                                                   nprobe, rerank_factor)
 
-        # Ensure 2D shape for FAISS
-        if query_embedding.ndim == 1:
-            query_embedding = query_embedding.reshape(1, -1)
+        return [
+            self._rank(snapshot, similarities, indices, k,
+                       collapse_duplicates, diversify, mmr_lambda)
+            for similarities, indices in zip(all_similarities, all_indices)
+        ]
+
+    def _hits(self, snapshot: IndexSnapshot, query_embeddings: np.ndarray,
+              fetch_k: int, nprobe: int = None,
+              rerank_factor: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Raw nearest neighbors of a batch of queries, best first
+
+        Returns:
+            (similarities, indices), each (n, fetch_k), -1 padded like Index.search
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+
+        # Approximate codes plus exact float vectors: over-fetch and re-rank
+        lossy = snapshot.reduced or snapshot.ivfpq
+        if snapshot.binary or (lossy and snapshot.vectors is not None):
+            return self._search_rerank(snapshot, query_embeddings, fetch_k,
+                                       nprobe, rerank_factor)
 
         # Search (returns distances and indices)
         # For normalized vectors with IndexFlatIP, distance = cosine similarity
-        similarities, indices = self.index.search(
-            query_embedding.astype('float32'), k
-        )
+        return self._index_search(snapshot, query_embeddings, fetch_k, nprobe)
+
+    @staticmethod
+    def _index_search(snapshot: IndexSnapshot, queries: np.ndarray, n: int,
+                      nprobe: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Index.search with per-call parameters (thread-safe): nprobe for IVF
+        indexes, and the snapshot's deleted items filtered out inside FAISS
+        """
+        ivf = faiss.try_extract_index_ivf(snapshot.index)
+        selector = snapshot.selector
+        if (nprobe is None or ivf is None) and selector is None:
+            return snapshot.index.search(queries, n)
+
+        if ivf is not None:
+            params = faiss.SearchParametersIVF(nprobe=nprobe or ivf.nprobe)
+        else:
+            params = faiss.SearchParameters()
+        if selector is not None:
+            params.sel = selector
+        if isinstance(snapshot.index, faiss.IndexPreTransform):
+            params = faiss.SearchParametersPreTransform(index_params=params)
+        return snapshot.index.search(queries, n, params=params)
+
+    def _search_rerank(self, snapshot: IndexSnapshot, queries: np.ndarray,
+                       fetch_k: int, nprobe: int = None,
+                       rerank_factor: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate first pass (Hamming, PCA-reduced or PQ), then exact cosine re-rank
+
+        Returns:
+            (similarities, indices), each (n, fetch_k), like Index.search
+        """
+        candidates_k = fetch_k * (rerank_factor or self.rerank_factor)
+        if snapshot.live is not None and snapshot.selector is None:
+            candidates_k += snapshot.n_deleted  # Deleted hits are dropped below
+        candidates_k = min(candidates_k, snapshot.index.ntotal)
+        distances, candidates = self._index_search(snapshot, queries, candidates_k, nprobe)
+
+        valid = candidates >= 0
+        if snapshot.live is not None and snapshot.selector is None:
+            valid &= snapshot.live[np.where(valid, candidates, 0)]
+
+        if snapshot.vectors is None:
+            # Binary without float vectors: estimate cosine from the Hamming distance
+            similarities = np.cos(np.pi * distances / snapshot.index.nbits)
+        else:
+            # Re-rank with the memory-mapped float vectors (padding scores -inf)
+            vectors = self._vectors_of(snapshot, np.where(valid, candidates, 0).ravel())
+            vectors = vectors.reshape(len(queries), candidates_k, -1)
+            similarities = np.einsum('nkd,nd->nk', vectors, queries)
+        similarities[~valid] = -np.inf
+
+        order = np.argsort(-similarities, axis=1, kind='stable')[:, :fetch_k]
+        indices = np.take_along_axis(candidates, order, axis=1)
+        similarities = np.take_along_axis(similarities, order, axis=1)
+        indices[~np.isfinite(similarities)] = -1
+        return similarities, indices
+
+    def _rank(self, snapshot: IndexSnapshot, similarities: np.ndarray,
+              indices: np.ndarray, k: int, collapse_duplicates: bool,
+              diversify: bool, mmr_lambda: float) -> List[dict]:
+        """Turn one query's raw FAISS hits into k result dicts"""
+        # Drop padding (-1) returned when fewer than fetch_k items exist
+        valid = indices >= 0
+        similarities, indices = similarities[valid], indices[valid]
+
+        if collapse_duplicates:
+            keep = []
+            seen_clusters = set()
+            for pos, idx in enumerate(indices):
+                cluster = self._cluster_of(snapshot, int(idx))
+                if cluster not in seen_clusters:
+                    seen_clusters.add(cluster)
+                    keep.append(pos)
+            similarities, indices = similarities[keep], indices[keep]
+
+        if diversify:
+            order = mmr_rerank(self._vectors_of(snapshot, indices), similarities,
+                               k, mmr_lambda)
+            similarities, indices = similarities[order], indices[order]
 
         # Build results
-        results = []
-        for rank, (idx, sim) in enumerate(zip(indices[0], similarities[0])):
-            result = {
-                'rank': rank + 1,
-                'similarity': float(sim),
-                'similarity_pct': f"{float(sim) * 100:.1f}%",
-                'index': int(idx),
-            }
+        return [
+            self._make_result(snapshot, rank + 1, int(idx), sim)
+            for rank, (idx, sim) in enumerate(zip(indices[:k], similarities[:k]))
+        ]
 
-            # Add metadata if available
-            if self.metadata and idx < len(self.metadata):
-                result.update(self.metadata[int(idx)])
-            else:
-                result['image_path'] = f"images_catalog/item_{int(idx)}.jpg"
+    def search_by_id(self, item_id, k: int = 10, exclude_self: bool = True,
+                     **search_options) -> List[dict]:
+        """
+        Find items similar to a catalog item using its stored embedding
+
+        No image is decoded and the model is not run: the vector comes from
+        the side array (or is reconstructed from the index), so "more like
+        this" costs one search.
+
+        Args:
+            item_id: Catalog item ID (or index position)
+            k: Number of results to return
+            exclude_self: Leave the query item out of the results
+            **search_options: collapse_duplicates, diversify, mmr_lambda,
+                fetch_factor (see search)
+
+        Returns:
+            List of result dicts, ranked from 1
+
+        Raises:
+            KeyError: If the item is not in the index
+        """
+        # One snapshot throughout, so the position stays valid across a swap
+        snapshot = self._ensure_loaded()
+        position = snapshot.position_of(item_id)
+        query = self._vectors_of(snapshot, position)
 
-            results.append(result)
+        if not exclude_self:
+            return self._search(snapshot, query, k, **search_options)[0]
 
+        results = [r for r in self._search(snapshot, query, k + 1, **search_options)[0]
+                   if r['index'] != position][:k]
+        for rank, result in enumerate(results, 1):
+            result['rank'] = rank
         return results
 
+    def _clusters_for(self, snapshot: IndexSnapshot):
+        """Style clusters of a snapshot (loaded on first use)"""
+        if snapshot.clusters is None:
+            from .clusters import CatalogClusters
+
+            if self.clusters_path is None or not self.clusters_path.exists():
+                raise FileNotFoundError(
+                    f"No style clusters at {self.clusters_path}. "
+                    f"Run 'python download_dataset.py --build-clusters-only' first!"
+                )
+            clusters = CatalogClusters.load(self.clusters_path)
+            if clusters.ntotal != snapshot.index.ntotal or clusters.version != snapshot.version:
+                raise ValueError(
+                    f"Style clusters were built for index version {clusters.version} "
+                    f"({clusters.ntotal:,} items); rebuild them for the current index"
+                )
+            if snapshot.live is not None:
+                clusters = clusters.without(snapshot.live)
+            snapshot.clusters = clusters
+        return snapshot.clusters
+
+    def list_clusters(self, representatives: int = 4) -> List[dict]:
+        """
+        Browse entry point: all style clusters, largest first
+
+        Args:
+            representatives: Most typical items returned per cluster
+
+        Returns:
+            List of dicts with 'cluster_id', 'size' and 'representatives'
+            (result dicts, similarity = closeness to the cluster center)
+        """
+        snapshot = self._ensure_loaded()
+        clusters = self._clusters_for(snapshot)
+        sizes = clusters.sizes()
+
+        return [
+            {
+                'cluster_id': int(cluster),
+                'size': int(sizes[cluster]),
+                'representatives': [
+                    self._make_result(snapshot, rank + 1, int(idx), clusters.similarity[idx])
+                    for rank, idx in enumerate(clusters.members(cluster, 0, representatives))
+                ],
+            }
+            for cluster in np.argsort(-sizes, kind='stable')
+            if sizes[cluster] > 0
+        ]
+
+    def cluster_members(self, cluster_id: int, page: int = 0,
+                        page_size: int = 20) -> List[dict]:
+        """
+        One page of a style cluster's items, most typical first
+
+        Args:
+            cluster_id: Cluster from list_clusters
+            page: Page number (from 0)
+            page_size: Items per page
+
+        Returns:
+            List of result dicts (empty past the last page)
+        """
+        snapshot = self._ensure_loaded()
+        clusters = self._clusters_for(snapshot)
+        start = page * page_size
+        members = clusters.members(cluster_id, start, start + page_size)
+
+        return [
+            self._make_result(snapshot, start + rank + 1, int(idx), clusters.similarity[idx])
+            for rank, idx in enumerate(members)
+        ]
+
+    def get_vectors(self, indices) -> np.ndarray:
+        """
+        Fetch stored embeddings for index positions
+
+        Reads the memory-mapped side array when available, otherwise
+        reconstructs the vectors from the FAISS index.
+
+        Args:
+            indices: Index positions (int or sequence of ints)
+
+        Returns:
+            Array of embeddings (n, D), float32
+        """
+        return self._vectors_of(self._ensure_loaded(), indices)
+
+    def get_item_vector(self, item_id) -> np.ndarray:
+        """
+        Fetch the stored embedding of a catalog item
+
+        Resolved by item ID on the current snapshot, so it stays correct
+        for results shown before a hot swap or compaction.
+
+        Args:
+            item_id: Item ID (metadata 'item_id' or file stem)
+
+        Returns:
+            Embedding (D,), float32
+
+        Raises:
+            KeyError: If the item is not (or no longer) in the index
+        """
+        snapshot = self._ensure_loaded()
+        return self._vectors_of(snapshot, snapshot.position_of(item_id))[0]
+
+    @staticmethod
+    def _vectors_of(snapshot: IndexSnapshot, indices) -> np.ndarray:
+        """Stored embeddings for index positions of a snapshot"""
+        indices = np.atleast_1d(np.asarray(indices, dtype='int64'))
+
+        if snapshot.vectors is not None:
+            return np.asarray(snapshot.vectors[indices], dtype='float32')
+        return snapshot.index.reconstruct_batch(indices)
+
+    @staticmethod
+    def _cluster_of(snapshot: IndexSnapshot, idx: int):
+        """Near-duplicate cluster key for an index position"""
+        metadata = snapshot.metadata
+        if metadata and idx < len(metadata):
+            cluster = metadata[idx].get('cluster_id')
+            if cluster is not None:
+                return cluster
+        return ('item', idx)
+
+    @staticmethod
+    def _make_result(snapshot: IndexSnapshot, rank: int, idx: int, sim: float) -> dict:
+        """Build a result dict for an index position"""
+        result = {
+            'rank': rank,
+            'similarity': float(sim),
+            'similarity_pct': f"{float(sim) * 100:.1f}%",
+            'index': idx,
+        }
+
+        # Add metadata if available
+        metadata = snapshot.metadata
+        if metadata and idx < len(metadata):
+            result.update(metadata[idx])
+        else:
+            result['image_path'] = f"images_catalog/item_{idx}.jpg"
+
+        return result
+
     def get_stats(self) -> dict:
         """Get index statistics"""
-        if not self.loaded:
-            self.load()
+        snapshot = self._ensure_loaded()
+        index = snapshot.index
 
         return {
-            'total_items': self.index.ntotal,
-            'embedding_dim': self.index.d,
-            'index_type': type(self.index).__name__,
+            'total_items': index.ntotal - snapshot.n_deleted,
+            'deleted': snapshot.n_deleted,
+            'embedding_dim': index.d,
+            'index_type': type(index).__name__,
+            'version': self.version,
+            'model': (snapshot.model or {}).get('model_name'),
         }
 
 
+def _reservoir_update(sample: np.ndarray, seen: int, chunk: np.ndarray,
+                      rng: np.random.Generator) -> int:
+    """
+    Feed one chunk into a uniform reservoir sample (Algorithm R, vectorized)
+
+    Args:
+        sample: Reservoir buffer (capacity, D), updated in place
+        seen: Number of rows streamed before this chunk
+        chunk: Next rows of the stream (n, D)
+        rng: Random generator
+
+    Returns:
+        Updated number of rows seen
+    """
+    capacity = len(sample)
+    n = len(chunk)
+
+    # Fill empty slots first
+    fill = max(0, min(capacity - seen, n))
+    sample[seen:seen + fill] = chunk[:fill]
+
+    # Then row t replaces a random slot with probability capacity / (t + 1)
+    if fill < n:
+        positions = np.arange(seen + fill, seen + n)
+        slots = rng.integers(0, positions + 1)
+        hit = slots < capacity
+        sample[slots[hit]] = chunk[fill:][hit]
+
+    return seen + n
+
+
 class IndexBuilder:
     """
     Utility class to build FAISS index from embeddings
     Used by download_dataset.py
     """
 
+    # Supported index types (FAISS factory strings, filled with nlist / pq_m)
+    INDEX_TYPES = {
+        'flat': "Flat",
+        'ivf': "IVF{nlist},Flat",
+        'ivfpq': "IVF{nlist},PQ{pq_m}",
+        'binary': "LSH{nbits}rt",
+    }
+
     @staticmethod
     def build_index(embeddings: np.ndarray,
                    metadata: List[dict],
                    save_path: str = "embeddings/fashion.index",
-                   metadata_path: str = "embeddings/metadata.pkl"):
+                   metadata_path: str = "embeddings/metadata.pkl",
+                   index_type: str = "flat",
+                   chunk_size: int = 8192,
+                   model: dict = None):
         """
         Build and save FAISS index
 
@@ -142,20 +966,187 @@ class IndexBuilder:
             metadata: List of metadata dicts (image paths, etc.)
             save_path: Where to save index
             metadata_path: Where to save metadata
+            index_type: One of INDEX_TYPES ('flat' = exact cosine similarity)
+            chunk_size: Rows converted/normalized at a time
+            model: Fingerprint of the embedding model (saved next to the index)
         """
         print(f"🔨 Building FAISS index from {len(embeddings):,} embeddings...")
 
-        # Ensure embeddings are normalized and float32
-        embeddings = embeddings.astype('float32')
-        faiss.normalize_L2(embeddings)  # Ensure L2 norm = 1
+        # Stream row slices so the array is never copied as a whole
+        chunks = [embeddings[i:i + chunk_size]
+                  for i in range(0, len(embeddings), chunk_size)]
+        index = IndexBuilder.build_index_streaming(
+            chunks,
+            embeddings.shape[1],
+            index_type=index_type,
+            vectors_path=Path(save_path).with_suffix('.vectors.npy')
+        )
+
+        IndexBuilder.save_index(index, metadata, save_path, metadata_path, model)
+
+        return index
+
+    @staticmethod
+    def build_index_streaming(chunks: Iterable[np.ndarray],
+                              dimension: int,
+                              index_type: str = "flat",
+                              nlist: int = None,
+                              pq_m: int = 32,
+                              nbits: int = 512,
+                              train_size: int = 65536,
+                              vectors_path: str = None,
+                              seed: int = 0,
+                              pca_dim: int = None) -> faiss.Index:
+        """
+        Build FAISS index by streaming embedding chunks (e.g. an EmbeddingStore)
+
+        Only one chunk is converted and normalized at a time, so peak memory
+        is the index itself plus a single chunk (plus the training sample).
+        Trained types (IVF/PQ) take a first pass to draw a reservoir sample,
+        train on it, then add chunks in a second pass. A one-shot iterator is
+        spooled to a temporary EmbeddingStore so it can be read twice.
+
+        Args:
+            chunks: Iterable of embedding arrays (n_i, dimension)
+            dimension: Embedding dimension
+            index_type: One of INDEX_TYPES
+            nlist: IVF cells (default: ~4 * sqrt(N))
+            pq_m: PQ sub-quantizers for 'ivfpq' (must divide dimension)
+            nbits: Bits per item for 'binary' (nbits / 8 bytes of codes)
+            train_size: Reservoir sample size used for training
+            vectors_path: For non-flat types, also write the normalized
+                float32 vectors here (.npy side array for exact re-ranking)
+            seed: Random seed for sampling and training
+            pca_dim: Reduce vectors to this many dimensions with a PCA
+                learned from the training sample (stored in the index as an
+                IndexPreTransform, so queries are projected by FAISS) and
+                re-normalized; any type but 'binary'. The side array keeps
+                the full vectors for exact re-ranking
+
+        Returns:
+            In-memory FAISS index (not saved)
+        """
+        if index_type not in IndexBuilder.INDEX_TYPES:
+            raise ValueError(
+                f"Unknown index type '{index_type}'. "
+                f"Choose from: {', '.join(IndexBuilder.INDEX_TYPES)}"
+            )
+        if pca_dim is not None:
+            if index_type == 'binary':
+                raise ValueError("pca_dim does not apply to 'binary' indexes "
+                                 "(LSH already projects the vectors)")
+            if not 0 < pca_dim < dimension:
+                raise ValueError(f"pca_dim must be between 1 and {dimension - 1}, got {pca_dim}")
+
+        print(f"🔨 Building {index_type} FAISS index from streamed chunks...")
 
-        # Create index (IndexFlatIP for exact cosine similarity)
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatIP(dimension)
+        if index_type == 'flat' and pca_dim is None:
+            # Flat indexes reconstruct exactly, so drop any stale side array
+            if vectors_path is not None and Path(vectors_path).exists():
+                Path(vectors_path).unlink()
+
+            # IndexFlatIP for exact cosine similarity, no training pass
+            index = faiss.IndexFlatIP(dimension)
+            for chunk in chunks:
+                chunk = np.array(chunk, dtype='float32')  # Copy of one chunk only
+                faiss.normalize_L2(chunk)
+                index.add(chunk)
+
+            print(f"✓ Added {index.ntotal:,} vectors to index")
+            return index
+
+        spool = None
+        if iter(chunks) is chunks:
+            from .store import EmbeddingStore
+            spool = tempfile.TemporaryDirectory(prefix="stylishi_spool_")
+            store = EmbeddingStore(spool.name)
+            for chunk in chunks:
+                store.append(chunk, [{}] * len(chunk))
+            store.flush()
+            chunks = store
+
+        try:
+            # Pass 1: reservoir sample for training
+            rng = np.random.default_rng(seed)
+            sample = np.empty((train_size, dimension), dtype='float32')
+            total = 0
+            for chunk in chunks:
+                total = _reservoir_update(sample, total, chunk, rng)
+            sample = sample[:min(total, train_size)]
+            faiss.normalize_L2(sample)
+
+            nlist = nlist or max(1, min(int(4 * np.sqrt(total)), total // 39))
+            factory = IndexBuilder.INDEX_TYPES[index_type].format(
+                nlist=nlist, pq_m=pq_m, nbits=nbits
+            )
+            if pca_dim is not None:
+                # Project, then re-normalize so inner product stays cosine
+                factory = f"PCA{pca_dim},L2norm,{factory}"
+
+            if index_type == 'binary':
+                # Sign bits of a random rotation, per-bit thresholds learned
+                # from the sample; searched by Hamming distance
+                index = faiss.IndexLSH(dimension, nbits, True, True)
+            else:
+                index = faiss.index_factory(dimension, factory, faiss.METRIC_INNER_PRODUCT)
+                ivf = faiss.try_extract_index_ivf(index)
+                if ivf is not None:
+                    ivf.cp.seed = seed
+
+            print(f"🎯 Training {factory} on {len(sample):,} sampled vectors...")
+            index.train(sample)
+            del sample
+
+            # Pass 2: add chunks (and mirror them into the side array)
+            vectors = None
+            if vectors_path is not None:
+                vectors_path = Path(vectors_path)
+                vectors_path.parent.mkdir(parents=True, exist_ok=True)
+                vectors = np.lib.format.open_memmap(
+                    vectors_path, mode='w+', dtype='float32', shape=(total, dimension)
+                )
+
+            offset = 0
+            for chunk in chunks:
+                chunk = np.array(chunk, dtype='float32')
+                faiss.normalize_L2(chunk)
+                index.add(chunk)
+                if vectors is not None:
+                    vectors[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+
+            if vectors is not None:
+                vectors.flush()
+                del vectors
+                print(f"✓ Vectors saved to {vectors_path}")
+        finally:
+            if spool is not None:
+                spool.cleanup()
 
-        # Add vectors
-        index.add(embeddings)
         print(f"✓ Added {index.ntotal:,} vectors to index")
+        return index
+
+    @staticmethod
+    def save_index(index: faiss.Index,
+                   metadata: List[dict],
+                   save_path: str = "embeddings/fashion.index",
+                   metadata_path: str = "embeddings/metadata.pkl",
+                   model: dict = None):
+        """
+        Save FAISS index and metadata
+
+        Args:
+            index: Built FAISS index
+            metadata: List of metadata dicts aligned with the index
+            save_path: Where to save index
+            metadata_path: Where to save metadata
+            model: Fingerprint of the embedding model (FashionEmbedder.
+                fingerprint()), written to <index>.model.json
+        """
+        if len(metadata) != index.ntotal:
+            raise ValueError(
+                f"Metadata has {len(metadata)} entries but index has {index.ntotal:,} vectors"
+            )
 
         # Save index
         save_path = Path(save_path)
@@ -169,7 +1160,80 @@ class IndexBuilder:
             pickle.dump(metadata, f)
         print(f"✓ Metadata saved to {metadata_path}")
 
-        return index
+        if model is not None:
+            with open(save_path.with_suffix('.model.json'), 'w') as f:
+                json.dump(model, f, indent=2)
+
+    @staticmethod
+    def publish(index: faiss.Index,
+                metadata: List[dict],
+                manifest_path: str = "embeddings/manifest.json",
+                vectors_path: str = None,
+                keep: int = 3,
+                model: dict = None) -> int:
+        """
+        Save index and metadata as a new version and point the manifest at it
+
+        Files are written under versioned names (fashion.v<N>.index, ...)
+        and only become visible when the manifest is atomically replaced, so
+        a running FashionSearchEngine.watch() never sees a half-written
+        version and can hot-swap to it without downtime.
+
+        Args:
+            index: Built FAISS index
+            metadata: List of metadata dicts aligned with the index
+            manifest_path: Manifest naming the current version
+            vectors_path: Side array written by build_index_streaming
+                (moved into the version, if it exists)
+            keep: Number of versions kept on disk (older ones are deleted)
+            model: Fingerprint of the embedding model that built the vectors
+
+        Returns:
+            Published version number
+        """
+        manifest_path = Path(manifest_path)
+        root = manifest_path.parent
+        root.mkdir(parents=True, exist_ok=True)
+
+        version = 1
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                version = json.load(f)['version'] + 1
+
+        manifest = {
+            'version': version,
+            'index': f"fashion.v{version}.index",
+            'metadata': f"metadata.v{version}.pkl",
+            'vectors': None,
+            'ntotal': index.ntotal,
+            'model': model,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        IndexBuilder.save_index(index, metadata,
+                                root / manifest['index'], root / manifest['metadata'],
+                                model)
+
+        if vectors_path is not None and Path(vectors_path).exists():
+            manifest['vectors'] = f"fashion.v{version}.vectors.npy"
+            os.replace(vectors_path, root / manifest['vectors'])
+
+        # Commit: readers switch to the new version only from here on
+        tmp = manifest_path.with_suffix('.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, manifest_path)
+        print(f"✓ Published index version {version} ({manifest_path})")
+
+        # Prune old versions (engines still serving them hold them in memory)
+        for path in list(root.glob("fashion.v*")) + list(root.glob("metadata.v*.pkl")):
+            old = path.name.split('.')[1][1:]
+            if old.isdigit() and int(old) <= version - keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass  # Still memory-mapped on Windows; retried next publish
+
+        return version
 
 
 if __name__ == "__main__":
@@ -185,7 +1249,7 @@ if __name__ == "__main__":
         metadata_path="embeddings/test_metadata.pkl"
     )
 
-    # Test search
+    # Test search (explicit paths: the published manifest is not used)
     engine = FashionSearchEngine(
         index_path="embeddings/test.index",
         metadata_path="embeddings/test_metadata.pkl"
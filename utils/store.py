@@ -0,0 +1,258 @@
+"""
+Persistent on-disk embedding store for bulk catalog indexing
+Appends embeddings as memory-mapped .npy chunks with a resumable checkpoint
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+
+class EmbeddingStore:
+    """
+    Append-only chunked embedding store
+
+    Layout of the store directory:
+        chunk_00000.npy        float32 embeddings (rows, D)
+        chunk_00000.json       metadata dicts aligned with the rows
+        checkpoint.json        committed chunks, row count and dimension
+
+    A chunk only counts once the checkpoint lists it, so a crash mid-write
+    loses at most the rows still buffered in memory (< chunk_size).
+    """
+
+    CHECKPOINT = "checkpoint.json"
+
+    def __init__(self, root: str = "embeddings/store", chunk_size: int = 2048):
+        """
+        Open (or create) an embedding store
+
+        Args:
+            root: Store directory
+            chunk_size: Rows buffered in memory before a chunk is flushed
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+
+        self._buffer: List[np.ndarray] = []
+        self._buffer_meta: List[dict] = []
+        self._buffered_rows = 0
+
+        checkpoint = self.root / self.CHECKPOINT
+        if checkpoint.exists():
+            with open(checkpoint) as f:
+                state = json.load(f)
+        else:
+            state = {'num_chunks': 0, 'count': 0, 'dim': None}
+
+        self.num_chunks = state['num_chunks']
+        self.count = state['count']
+        self.dim = state['dim']
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _chunk_path(self, chunk: int, suffix: str) -> Path:
+        return self.root / f"chunk_{chunk:05d}{suffix}"
+
+    def append(self, embeddings: np.ndarray, metadata: List[dict]):
+        """
+        Append embeddings and their metadata (flushed every chunk_size rows)
+
+        Args:
+            embeddings: Array of embeddings (n, D)
+            metadata: List of n metadata dicts
+        """
+        if len(embeddings) != len(metadata):
+            raise ValueError(
+                f"Got {len(embeddings)} embeddings but {len(metadata)} metadata entries"
+            )
+        if len(embeddings) == 0:
+            return
+
+        if self.dim is None:
+            self.dim = int(embeddings.shape[1])
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dim {embeddings.shape[1]} does not match store dim {self.dim}"
+            )
+
+        self._buffer.append(np.asarray(embeddings, dtype='float32'))
+        self._buffer_meta.extend(metadata)
+        self._buffered_rows += len(embeddings)
+
+        if self._buffered_rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as a new chunk and commit the checkpoint"""
+        if self._buffered_rows == 0:
+            return
+
+        chunk = self.num_chunks
+        embeddings = np.vstack(self._buffer)
+
+        # Write data first, then commit it by updating the checkpoint
+        np.save(self._chunk_path(chunk, ".npy"), embeddings)
+        with open(self._chunk_path(chunk, ".json"), 'w') as f:
+            json.dump(self._buffer_meta, f)
+
+        self.num_chunks += 1
+        self.count += len(embeddings)
+        self._write_checkpoint()
+
+        self._buffer, self._buffer_meta, self._buffered_rows = [], [], 0
+
+    def _write_checkpoint(self):
+        """Atomically replace the checkpoint file"""
+        tmp = self.root / (self.CHECKPOINT + ".tmp")
+        with open(tmp, 'w') as f:
+            json.dump({'num_chunks': self.num_chunks,
+                       'count': self.count,
+                       'dim': self.dim}, f)
+        os.replace(tmp, self.root / self.CHECKPOINT)
+
+    def iter_chunks(self) -> Iterator[Tuple[np.ndarray, List[dict]]]:
+        """
+        Iterate over committed chunks
+
+        Yields:
+            (embeddings, metadata) per chunk; embeddings are read-only memmaps
+        """
+        for chunk in range(self.num_chunks):
+            embeddings = np.load(self._chunk_path(chunk, ".npy"), mmap_mode='r')
+            with open(self._chunk_path(chunk, ".json")) as f:
+                metadata = json.load(f)
+            yield embeddings, metadata
+
+    def iter_embeddings(self, rows: np.ndarray = None) -> Iterator[np.ndarray]:
+        """
+        Iterate over committed embedding chunks only
+
+        Args:
+            rows: Optional sorted store positions to keep (others are skipped)
+
+        Yields:
+            Embedding chunks (memmaps, or selected rows when rows is given)
+        """
+        offset = 0
+        for chunk in range(self.num_chunks):
+            embeddings = np.load(self._chunk_path(chunk, ".npy"), mmap_mode='r')
+            start, offset = offset, offset + len(embeddings)
+            if rows is not None:
+                lo, hi = np.searchsorted(rows, [start, offset])
+                embeddings = embeddings[rows[lo:hi] - start]
+            yield embeddings
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """Re-iterable stream of embedding chunks (see iter_embeddings)"""
+        return self.iter_embeddings()
+
+    def metadata(self) -> List[dict]:
+        """Metadata of all committed rows, in store order"""
+        all_metadata = []
+        for chunk in range(self.num_chunks):
+            with open(self._chunk_path(chunk, ".json")) as f:
+                all_metadata.extend(json.load(f))
+        return all_metadata
+
+    def processed_keys(self, key: str = 'image_path') -> set:
+        """Set of metadata[key] values already committed (used to resume)"""
+        return {meta[key] for meta in self.metadata()}
+
+    def reset(self):
+        """Delete all chunks and start an empty store"""
+        for path in self.root.glob("chunk_*"):
+            path.unlink()
+        self.num_chunks, self.count, self.dim = 0, 0, None
+        self._buffer, self._buffer_meta, self._buffered_rows = [], [], 0
+        self._write_checkpoint()
+
+
+class ShardedEmbeddingStore:
+    """
+    Read view over several EmbeddingStores written in parallel
+
+    Each worker process appends to its own shard (root/shard_XX), so no
+    locking is needed. Reads concatenate the shards in shard order and
+    expose the same interface as EmbeddingStore.
+    """
+
+    def __init__(self, root: str = "embeddings/store", chunk_size: int = 2048):
+        """
+        Open (or create) a sharded store
+
+        Args:
+            root: Store directory containing shard_XX subdirectories
+            chunk_size: Rows buffered per shard before a chunk is flushed
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+
+    def shard(self, number: int) -> EmbeddingStore:
+        """Open shard number for appending"""
+        return EmbeddingStore(self.root / f"shard_{number:02d}", self.chunk_size)
+
+    @property
+    def shards(self) -> List[EmbeddingStore]:
+        """All existing shards, in shard order"""
+        return [EmbeddingStore(path, self.chunk_size)
+                for path in sorted(self.root.glob("shard_*")) if path.is_dir()]
+
+    @property
+    def count(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    @property
+    def dim(self) -> int:
+        dims = {shard.dim for shard in self.shards if shard.dim is not None}
+        if len(dims) > 1:
+            raise ValueError(f"Shards have mismatching dims: {sorted(dims)}")
+        return dims.pop() if dims else None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def iter_embeddings(self, rows: np.ndarray = None) -> Iterator[np.ndarray]:
+        """
+        Iterate over committed embedding chunks of all shards
+
+        Args:
+            rows: Optional sorted positions (across shards) to keep
+
+        Yields:
+            Embedding chunks (memmaps, or selected rows when rows is given)
+        """
+        offset = 0
+        for shard in self.shards:
+            start, offset = offset, offset + len(shard)
+            shard_rows = None
+            if rows is not None:
+                lo, hi = np.searchsorted(rows, [start, offset])
+                shard_rows = rows[lo:hi] - start
+            yield from shard.iter_embeddings(rows=shard_rows)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """Re-iterable stream of embedding chunks (see iter_embeddings)"""
+        return self.iter_embeddings()
+
+    def metadata(self) -> List[dict]:
+        """Metadata of all committed rows, in shard order"""
+        all_metadata = []
+        for shard in self.shards:
+            all_metadata.extend(shard.metadata())
+        return all_metadata
+
+    def processed_keys(self, key: str = 'image_path') -> set:
+        """Set of metadata[key] values committed by any shard"""
+        return {meta[key] for meta in self.metadata()}
+
+    def reset(self):
+        """Delete all shards"""
+        for shard in self.shards:
+            shutil.rmtree(shard.root)
@@ -0,0 +1,149 @@
+"""
+Catalog thumbnails for fast result rendering
+Builds small WebP thumbnails keyed by item ID and serves them from an LRU cache
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+from PIL import Image
+from tqdm import tqdm
+
+
+def item_key(meta: dict) -> str:
+    """Stable item ID for a metadata entry (falls back to the file stem)"""
+    if meta.get('item_id'):
+        return str(meta['item_id'])
+    # Indexes built on Windows store backslash paths
+    return Path(str(meta['image_path']).replace('\\', '/')).stem
+
+
+def make_thumbnail(image_path: Path, dest: Path, size: int = 256,
+                   quality: int = 80) -> bool:
+    """
+    Write a thumbnail of one image (aspect ratio kept, long side = size)
+
+    Args:
+        image_path: Source catalog image
+        dest: Output path; the suffix selects the format (.webp / .jpg)
+        size: Longest side of the thumbnail in pixels
+        quality: Encoder quality
+
+    Returns:
+        True if the thumbnail was written
+    """
+    try:
+        with Image.open(image_path) as img:
+            img.draft('RGB', (size, size))  # JPEG DCT-scaled decode
+            img = img.convert('RGB')
+            img.thumbnail((size, size), Image.LANCZOS)
+            options = {'method': 4} if dest.suffix == '.webp' else {'optimize': True}
+            img.save(dest, quality=quality, **options)
+        return True
+    except Exception as e:
+        print(f"Failed to thumbnail {image_path}: {e}")
+        return False
+
+
+def build_thumbnails(metadata: List[dict],
+                     thumbs_dir: str = "embeddings/thumbnails",
+                     base_dir: Path = Path("."),
+                     size: int = 256,
+                     fmt: str = "webp",
+                     workers: int = 8) -> int:
+    """
+    Build thumbnails for every catalog item in parallel (skips existing ones)
+
+    Pillow releases the GIL while decoding, resizing and encoding, so a
+    thread pool scales across cores without extra processes.
+
+    Args:
+        metadata: Index metadata (image_path / item_id per item)
+        thumbs_dir: Output directory, one <item_id>.<fmt> per item
+        base_dir: Directory image paths are relative to
+        size: Longest side of the thumbnails
+        fmt: 'webp' or 'jpg'
+        workers: Thread pool size
+
+    Returns:
+        Number of thumbnails written
+    """
+    thumbs_dir = Path(thumbs_dir)
+    thumbs_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    for meta in metadata:
+        dest = thumbs_dir / f"{item_key(meta)}.{fmt}"
+        if not dest.exists():
+            source = base_dir / str(meta['image_path']).replace('\\', '/')
+            jobs.append((source, dest))
+
+    print(f"🖼️  Building {len(jobs):,} thumbnails ({size}px {fmt}) "
+          f"| {len(metadata) - len(jobs):,} already exist")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        written = list(tqdm(
+            pool.map(lambda job: make_thumbnail(*job, size=size), jobs),
+            total=len(jobs), desc="Thumbnails"
+        ))
+
+    return sum(written)
+
+
+class ThumbnailCache:
+    """
+    In-memory LRU of encoded thumbnail bytes for the result grid
+
+    Results are rendered from small pre-encoded images instead of full
+    resolution catalog files; repeated results are served from memory.
+    """
+
+    def __init__(self, thumbs_dir: str = "embeddings/thumbnails",
+                 max_bytes: int = 64 * 1024 * 1024, fmt: str = "webp"):
+        """
+        Args:
+            thumbs_dir: Directory written by build_thumbnails
+            max_bytes: Memory budget for cached encoded thumbnails
+            fmt: Thumbnail file extension
+        """
+        self.thumbs_dir = Path(thumbs_dir)
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, meta: dict) -> Optional[bytes]:
+        """
+        Encoded thumbnail for a result (None if no thumbnail was built)
+
+        Args:
+            meta: Search result or metadata dict
+
+        Returns:
+            Thumbnail bytes, or None
+        """
+        key = item_key(meta)
+
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+
+        path = self.thumbs_dir / f"{key}.{self.fmt}"
+        if not path.exists():
+            return None
+        data = path.read_bytes()
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = data
+                self._size += len(data)
+                while self._size > self.max_bytes and self._entries:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+
+        return data
@@ -0,0 +1,93 @@
+"""
+Tombstone deletes for long-lived catalogs
+Deleted item IDs, kept in one small JSON file next to the manifest
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterable
+
+
+class Tombstones:
+    """
+    Catalog-level set of deleted item IDs
+
+    Deleting an item only records its ID: searching engines hide it at
+    query time (FashionSearchEngine.reload picks up the change), rebuilds
+    leave it out, and compaction (utils.maintenance.compact_index) later
+    rewrites the index without it. IDs stay listed after compaction, so an
+    item deleted once never comes back from the embedding store.
+
+    File layout: {"revision": int, "updated": str, "items": [item IDs]}
+    """
+
+    def __init__(self, path: str = "embeddings/tombstones.json",
+                 items: Iterable = (), revision: int = 0):
+        self.path = Path(path)
+        self.items = {str(item) for item in items}
+        self.revision = revision
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item_id) -> bool:
+        return str(item_id) in self.items
+
+    @classmethod
+    def load(cls, path: str = "embeddings/tombstones.json") -> 'Tombstones':
+        """Read the tombstones file (empty when it doesn't exist yet)"""
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        with open(path) as f:
+            data = json.load(f)
+        return cls(path, data['items'], data['revision'])
+
+    def save(self):
+        """Write a new revision (atomically replaced, like the manifest)"""
+        self.revision += 1
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({
+                'revision': self.revision,
+                'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'items': sorted(self.items),
+            }, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def delete(self, item_ids: Iterable) -> int:
+        """
+        Tombstone items and save
+
+        Args:
+            item_ids: Item IDs (metadata 'item_id' or file stem)
+
+        Returns:
+            Number of items not deleted before
+        """
+        before = len(self.items)
+        self.items.update(str(item) for item in item_ids)
+        added = len(self.items) - before
+        if added:
+            self.save()
+        return added
+
+    def restore(self, item_ids: Iterable) -> int:
+        """
+        Undo deletes and save (items already compacted away need a rebuild)
+
+        Args:
+            item_ids: Previously deleted item IDs
+
+        Returns:
+            Number of items restored
+        """
+        before = len(self.items)
+        self.items.difference_update(str(item) for item in item_ids)
+        removed = before - len(self.items)
+        if removed:
+            self.save()
+        return removed